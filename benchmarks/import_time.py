@@ -0,0 +1,81 @@
+"""
+Startup benchmark: import-time cost of the server modules.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter (several times, keeping
+the fastest run) and reports the cumulative import time of every `src.*` module and of the
+heaviest third-party packages. The output is JSON so runs can be compared across commits.
+
+Usage:
+    python benchmarks/import_time.py [--module src.main] [--runs 5] [--budget-ms 1500]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Packages that must never be imported just by importing the server
+FORBIDDEN = ("torch",)
+
+
+def measure(module: str) -> dict:
+    """Cumulative import time (ms) of every module imported by `import module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative) / 1000.0
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--module", default="src.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Third-party packages to report")
+    parser.add_argument(
+        "--budget-ms", type=float, default=None, help="Fail if the import takes longer"
+    )
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    best = {name: min(run.get(name, float("inf")) for run in runs) for name in runs[0]}
+
+    top_level = {
+        name: ms for name, ms in best.items() if "." not in name and not name.startswith("_")
+    }
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        "total_ms": round(best[args.module], 1),
+        "src_modules_ms": {
+            name: round(ms, 1) for name, ms in sorted(best.items()) if name.startswith("src.")
+        },
+        "packages_ms": {
+            name: round(ms, 1)
+            for name, ms in sorted(top_level.items(), key=lambda item: -item[1])[: args.top]
+        },
+        "forbidden_imports": [name for name in FORBIDDEN if name in best],
+    }
+    print(json.dumps(report, indent=2))
+
+    if report["forbidden_imports"]:
+        sys.exit(f"Importing {args.module} pulls in {report['forbidden_imports']}")
+    if args.budget_ms is not None and report["total_ms"] > args.budget_ms:
+        sys.exit(f"Import took {report['total_ms']} ms, over the {args.budget_ms} ms budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+End-to-end benchmark: replays WAV files through simulated WebSocket clients.
+
+Starts `src.main:app` with uvicorn in a separate process, either with a stub ASR of fixed cost
+(`--asr stub`, measures the server itself) or with a real Whisper model (`--asr tiny`), then
+connects N clients that stream their file in real time (or `--speed` times faster) as
+1024-sample chunks, like the Python client does. Every final message is matched with the end
+of the utterance it transcribes (detected on the client side from the audio energy), which
+gives the latency from end of speech to text. The server CPU time and resident memory are
+sampled from /proc. The report is JSON, with the commit it ran on, so runs can be compared
+across commits; `--baseline` fails when latency or RTF regress beyond `--tolerance`.
+
+Without `--wav`, a synthetic file (tone bursts separated by pauses) is used.
+
+Usage:
+    python benchmarks/replay.py [--asr stub|tiny] [--clients 8] [--speed 1.0] [--wav a.wav ...]
+        [--output results.json] [--baseline previous.json --tolerance 0.2]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SAMPLE_RATE = 16000
+CHUNK_SIZE = 1024
+# Same defaults as the server's RMS segmentation
+SPEECH_RMS = 200
+PAUSE_SECONDS = 1.0
+# Silence appended to every file so its last utterance is closed by the server
+TRAILING_SILENCE_SECONDS = 1.5
+
+
+# --- Server process ---
+
+
+def serve(args):
+    """Entry point of the server process (`--serve`)."""
+    import uvicorn
+
+    if args.asr == "stub":
+        from stub_asr import StubASRService
+
+        import src.asr_service
+
+        StubASRService.cost_ms = args.stub_cost_ms
+        StubASRService.cost_per_audio_s_ms = args.stub_cost_per_audio_s_ms
+        # `load_model_stack` imports the service lazily, so it picks up the stub
+        src.asr_service.ASRService = StubASRService
+
+    from src.main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, port: int) -> subprocess.Popen:
+    env = dict(os.environ, DEVICE=os.environ.get("DEVICE", "cpu"))
+    if args.asr != "stub":
+        env["MODEL_SIZE"] = args.asr
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--serve",
+        "--asr",
+        args.asr,
+        "--port",
+        str(port),
+        "--stub-cost-ms",
+        str(args.stub_cost_ms),
+        "--stub-cost-per-audio-s-ms",
+        str(args.stub_cost_per_audio_s_ms),
+    ]
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+
+
+def wait_until_ready(port: int, process: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/readyz", timeout=1) as r:
+                if r.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server not ready after {timeout}s")
+
+
+class ProcessSampler:
+    """CPU time and resident memory of a process, read from /proc (Linux)."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.ticks_per_second = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self.peak_rss = 0
+
+    def cpu_seconds(self) -> float:
+        with open(f"/proc/{self.pid}/stat") as f:
+            # Fields after the command name (which may contain spaces); utime and stime
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self.ticks_per_second
+
+    def rss_bytes(self) -> int:
+        with open(f"/proc/{self.pid}/statm") as f:
+            rss = int(f.read().split()[1]) * self.page_size
+        self.peak_rss = max(self.peak_rss, rss)
+        return rss
+
+    async def sample_forever(self, interval=0.2):
+        while True:
+            self.rss_bytes()
+            await asyncio.sleep(interval)
+
+
+# --- Audio ---
+
+
+def load_audio(path: str) -> np.ndarray:
+    """A WAV/FLAC file as 16 kHz mono int16 (resampled like the server would)."""
+    import soundfile as sf
+
+    from src.resampler import PcmConverter
+
+    audio, rate = sf.read(path, dtype="float32", always_2d=True)
+    converter = PcmConverter(rate, audio.shape[1], "float32")
+    pcm = converter.convert(audio.tobytes()) + converter.flush()
+    return np.frombuffer(pcm, dtype=np.int16)
+
+
+def synthetic_audio(utterances=6, speech_seconds=2.0, pause_seconds=1.5) -> np.ndarray:
+    """Tone bursts (speech stand-ins) separated by silent pauses."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(speech_seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    parts = [np.zeros(int(0.5 * SAMPLE_RATE))]
+    for _ in range(utterances):
+        tone = 3000 * np.sin(2 * np.pi * rng.uniform(150, 400) * t)
+        parts += [tone + rng.normal(0, 300, len(t)), np.zeros(int(pause_seconds * SAMPLE_RATE))]
+    return np.concatenate(parts).astype(np.int16)
+
+
+def speech_ends(audio: np.ndarray) -> list:
+    """
+    Sample positions where an utterance ends: the end of the last loud chunk before a pause
+    of at least PAUSE_SECONDS (or the end of the audio).
+    """
+    num_chunks = len(audio) // CHUNK_SIZE
+    chunks = audio[: num_chunks * CHUNK_SIZE].reshape(num_chunks, CHUNK_SIZE).astype(np.float32)
+    loud = np.sqrt(np.mean(chunks**2, axis=1)) >= SPEECH_RMS
+    pause_chunks = int(PAUSE_SECONDS * SAMPLE_RATE / CHUNK_SIZE)
+
+    ends = []
+    last_loud = None
+    for index, is_loud in enumerate(loud):
+        if is_loud:
+            last_loud = index
+        elif last_loud is not None and index - last_loud >= pause_chunks:
+            ends.append((last_loud + 1) * CHUNK_SIZE)
+            last_loud = None
+    if last_loud is not None:
+        ends.append((last_loud + 1) * CHUNK_SIZE)
+    return ends
+
+
+# --- Clients ---
+
+
+async def run_client(port: int, audio: np.ndarray, speed: float, delay: float, drain: float):
+    """Stream one file and collect (latency, server timings) of every final message."""
+    import websockets
+
+    await asyncio.sleep(delay)
+    audio = np.concatenate([audio, np.zeros(int(TRAILING_SILENCE_SECONDS * SAMPLE_RATE), np.int16)])
+    pending_ends = speech_ends(audio)
+    sent_at = {}
+    finals = []
+
+    async with websockets.connect(f"ws://127.0.0.1:{port}/ws/asr?detail=true") as websocket:
+
+        async def receive():
+            while True:
+                message = json.loads(await websocket.recv())
+                if message.get("type") != "final":
+                    continue
+                received = time.perf_counter()
+                segment_end = int(message["end"] * SAMPLE_RATE)
+                # The last utterance end covered by this segment (earlier ones were merged)
+                covered = [end for end in pending_ends if end <= segment_end]
+                latency = None
+                if covered:
+                    del pending_ends[: len(covered)]
+                    chunk = (covered[-1] - 1) // CHUNK_SIZE
+                    latency = received - sent_at[chunk]
+                finals.append({"latency_s": latency, "timings": message["timings"]})
+
+        receiver = asyncio.create_task(receive())
+        started = time.perf_counter()
+        for index, offset in enumerate(range(0, len(audio), CHUNK_SIZE)):
+            # Real-time pacing (scaled by speed); never sends ahead of the schedule
+            target = started + index * CHUNK_SIZE / SAMPLE_RATE / speed
+            await asyncio.sleep(max(0.0, target - time.perf_counter()))
+            await websocket.send(audio[offset : offset + CHUNK_SIZE].tobytes())
+            sent_at[index] = time.perf_counter()
+
+        # Wait for the text of the last utterances
+        deadline = time.perf_counter() + drain
+        while pending_ends and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        receiver.cancel()
+
+    return {"audio_s": len(audio) / SAMPLE_RATE, "finals": finals, "missed": len(pending_ends)}
+
+
+def percentiles(values) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 1),
+        "p95": round(float(p95), 1),
+        "p99": round(float(p99), 1),
+        "max": round(float(max(values)), 1),
+    }
+
+
+def git_commit() -> str:
+    result = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+    )
+    return result.stdout.strip() or None
+
+
+async def benchmark(args, port: int, server: subprocess.Popen) -> dict:
+    files = [load_audio(path) for path in args.wav] or [synthetic_audio()]
+    sampler = ProcessSampler(server.pid)
+    sampling = asyncio.create_task(sampler.sample_forever())
+
+    cpu_before = sampler.cpu_seconds()
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            run_client(
+                port,
+                files[i % len(files)],
+                args.speed,
+                # Clients join evenly over the ramp-up period
+                args.ramp * i / args.clients,
+                args.drain,
+            )
+            for i in range(args.clients)
+        )
+    )
+    wall = time.perf_counter() - started
+    cpu = sampler.cpu_seconds() - cpu_before
+    rss = sampler.rss_bytes()
+    sampling.cancel()
+
+    finals = [final for result in results for final in result["finals"]]
+    audio_seconds = sum(result["audio_s"] for result in results)
+    asr_seconds = sum(final["timings"]["asr_ms"] for final in finals) / 1000.0
+    return {
+        "commit": git_commit(),
+        "asr": args.asr,
+        "stub_cost_ms": args.stub_cost_ms if args.asr == "stub" else None,
+        "clients": args.clients,
+        "speed": args.speed,
+        "files": args.wav or ["<synthetic>"],
+        "audio_s": round(audio_seconds, 1),
+        "wall_s": round(wall, 2),
+        "segments": len(finals),
+        "segments_per_s": round(len(finals) / wall, 2),
+        "missed_utterances": sum(result["missed"] for result in results),
+        # From the end of an utterance to its text; includes the pause that closes the segment
+        "latency_ms": percentiles(
+            [f["latency_s"] * 1000.0 for f in finals if f["latency_s"] is not None]
+        ),
+        # Server-side processing of a closed segment (ASR and text pipeline)
+        "server_ms": percentiles([f["timings"]["total_ms"] for f in finals]),
+        # Decode time per second of audio (includes waiting for a worker or a batch)
+        "rtf": round(asr_seconds / audio_seconds, 4) if audio_seconds else None,
+        "cpu_s": round(cpu, 2),
+        "cpu_percent": round(100.0 * cpu / wall, 1),
+        "rss_mb": {"end": round(rss / 2**20, 1), "peak": round(sampler.peak_rss / 2**20, 1)},
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Metrics that got worse than the baseline by more than `tolerance` (a ratio)."""
+    checks = {
+        "latency_ms.p95": (report["latency_ms"]["p95"], baseline["latency_ms"]["p95"]),
+        "server_ms.p95": (report["server_ms"]["p95"], baseline["server_ms"]["p95"]),
+        "rtf": (report["rtf"], baseline["rtf"]),
+        "rss_mb.peak": (report["rss_mb"]["peak"], baseline["rss_mb"]["peak"]),
+    }
+    return [
+        f"{name}: {value} vs {reference} in {baseline.get('commit')}"
+        for name, (value, reference) in checks.items()
+        if value is not None and reference and value > reference * (1.0 + tolerance)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--asr", default="stub", help="'stub' or a Whisper model (e.g. tiny)")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed (1 = real time)")
+    parser.add_argument("--ramp", type=float, default=1.0, help="Seconds to connect all clients")
+    parser.add_argument("--wav", nargs="*", default=[], help="Files replayed by the clients")
+    parser.add_argument("--drain", type=float, default=30.0, help="Max wait for the last texts")
+    parser.add_argument("--stub-cost-ms", type=float, default=50.0)
+    parser.add_argument("--stub-cost-per-audio-s-ms", type=float, default=10.0)
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="Also write the report to this file")
+    parser.add_argument("--baseline", help="Report of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    # Internal: run the server (used by the benchmark itself)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    port = free_port()
+    server = start_server(args, port)
+    try:
+        wait_until_ready(port, server, args.startup_timeout)
+        report = asyncio.run(benchmark(args, port, server))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            sys.exit("Regressions beyond tolerance:\n  " + "\n  ".join(regressions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Stand-in for `src.asr_service.ASRService` with a fixed, configurable cost.
+
+Decodes sleep instead of running Whisper (releasing the GIL like CTranslate2 does), so the
+replay benchmark measures the server itself: segmentation, scheduling, batching, pipeline and
+WebSocket overhead, independently of the hardware the model would run on.
+"""
+
+import time
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from src.transcription import SegmentResult, TranscriptionResult, WordResult
+
+SAMPLE_RATE = 16000
+
+
+class StubASRService:
+    # Cost of one decode: a fixed part and a part proportional to the audio length
+    cost_ms = 50.0
+    cost_per_audio_s_ms = 10.0
+
+    def __init__(
+        self,
+        model_size="stub",
+        device="cpu",
+        compute_type="int8",
+        num_workers=1,
+        warmup_durations: Sequence[float] = (),
+        warmup_batched=False,
+    ):
+        self.model_size = model_size
+        self.device = device
+        self.warmup_time = 0.0
+        self.decodes = 0
+
+    def _sleep(self, audio_seconds: float):
+        time.sleep((self.cost_ms + self.cost_per_audio_s_ms * audio_seconds) / 1000.0)
+
+    def _result(self, audio_segment: np.ndarray, language=None) -> TranscriptionResult:
+        self.decodes += 1
+        duration = len(audio_segment) / SAMPLE_RATE
+        text = f"segment {self.decodes}"
+        return TranscriptionResult(
+            text=text,
+            segments=[
+                SegmentResult(
+                    start=0.0,
+                    end=duration,
+                    text=text,
+                    avg_logprob=-0.2,
+                    no_speech_prob=0.01,
+                    words=[WordResult(0.0, duration, f" {text}", 0.9)],
+                )
+            ],
+            language=language or "en",
+            language_probability=1.0,
+        )
+
+    def transcribe_audio(self, audio_segment: np.ndarray, **options) -> str:
+        return self.transcribe_detailed(audio_segment, **options).text
+
+    def transcribe_detailed(self, audio_segment: np.ndarray, language=None, **options):
+        self._sleep(len(audio_segment) / SAMPLE_RATE)
+        return self._result(audio_segment, language)
+
+    def detect_language(self, audio_segment: np.ndarray) -> Tuple[str, float]:
+        self._sleep(0.0)
+        return "en", 1.0
+
+    def transcribe_batch(self, audio_segments: List[np.ndarray], **options) -> List[str]:
+        return [result.text for result in self.transcribe_batch_detailed(audio_segments, **options)]
+
+    def transcribe_batch_detailed(
+        self, audio_segments: List[np.ndarray], language=None, **options
+    ) -> List[TranscriptionResult]:
+        # A batch pays the fixed cost once, plus the audio of all its segments
+        self._sleep(sum(len(segment) for segment in audio_segments) / SAMPLE_RATE)
+        return [self._result(segment, language) for segment in audio_segments]
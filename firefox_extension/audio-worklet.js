@@ -0,0 +1,36 @@
+// audio-worklet.js
+// Transmet les échantillons du micro au content script par blocs de 4096,
+// sans rééchantillonnage : le serveur convertit en 16 kHz mono.
+const BLOCK_SIZE = 4096;
+
+class CaptureProcessor extends AudioWorkletProcessor {
+    constructor() {
+        super();
+        this.block = new Float32Array(BLOCK_SIZE);
+        this.length = 0;
+    }
+
+    process(inputs) {
+        const input = inputs[0];
+        if (input.length === 0) return true;
+
+        const samples = input[0];
+        let offset = 0;
+        while (offset < samples.length) {
+            const count = Math.min(samples.length - offset, BLOCK_SIZE - this.length);
+            this.block.set(samples.subarray(offset, offset + count), this.length);
+            this.length += count;
+            offset += count;
+
+            if (this.length === BLOCK_SIZE) {
+                // Le buffer est transféré (pas de copie) puis remplacé
+                this.port.postMessage(this.block, [this.block.buffer]);
+                this.block = new Float32Array(BLOCK_SIZE);
+                this.length = 0;
+            }
+        }
+        return true;
+    }
+}
+
+registerProcessor("capture-processor", CaptureProcessor);
@@ -5,7 +5,7 @@ let audioContext = null;
 let processor = null;
 let isRecording = false;
 
-const TARGET_SAMPLE_RATE = 16000;
+// Le micro est envoyé à sa fréquence native en float32 : le serveur rééchantillonne
 const WEBSOCKET_URL = "ws://127.0.0.1:8000/ws/asr";
 
 // Indicateur visuel (HUD)
@@ -68,24 +68,29 @@ function toggleRecording() {
 
 async function startRecording() {
     try {
+        updateHUD("Micro...", "connecting");
+        try {
+            // Demander l'accès au micro (déclenchera une popup de permission du navigateur)
+            mediaStream = await navigator.mediaDevices.getUserMedia({ audio: true });
+            audioContext = new AudioContext();
+            await audioContext.audioWorklet.addModule(browser.runtime.getURL("audio-worklet.js"));
+        } catch (err) {
+            console.error(err);
+            updateHUD("Erreur Micro: " + err.message, "error");
+            stopRecording();
+            return;
+        }
+
         updateHUD("Connexion...", "connecting");
-        
-        socket = new WebSocket(WEBSOCKET_URL);
-        
-        socket.onopen = async () => {
-            updateHUD("Micro...", "connecting");
-            try {
-                // Demander l'accès au micro (déclenchera une popup de permission du navigateur)
-                mediaStream = await navigator.mediaDevices.getUserMedia({ audio: true });
-                setupAudioProcessing(mediaStream);
-                
-                isRecording = true;
-                updateHUD("🔴 Enregistrement...", "recording");
-            } catch (err) {
-                console.error(err);
-                updateHUD("Erreur Micro: " + err.message, "error");
-                socket.close();
-            }
+        // Le format déclaré à la connexion permet au serveur de convertir en 16 kHz mono
+        socket = new WebSocket(
+            `${WEBSOCKET_URL}?sample_rate=${audioContext.sampleRate}&channels=1&dtype=float32`
+        );
+
+        socket.onopen = () => {
+            setupAudioProcessing(mediaStream);
+            isRecording = true;
+            updateHUD("🔴 Enregistrement...", "recording");
         };
 
         socket.onmessage = (event) => {
@@ -119,6 +124,7 @@ function stopRecording() {
     updateHUD("Arrêté", "idle");
 
     if (processor) {
+        processor.port.onmessage = null;
         processor.disconnect();
         processor = null;
     }
@@ -136,18 +142,15 @@ function stopRecording() {
 }
 
 function setupAudioProcessing(stream) {
-    audioContext = new AudioContext();
     const source = audioContext.createMediaStreamSource(stream);
-    processor = audioContext.createScriptProcessor(4096, 1, 1);
-
+    // L'AudioWorklet (audio-worklet.js) remplace le ScriptProcessor obsolète
+    processor = new AudioWorkletNode(audioContext, "capture-processor");
     source.connect(processor);
-    processor.connect(audioContext.destination);
 
-    processor.onaudioprocess = (e) => {
+    processor.port.onmessage = (e) => {
         if (!isRecording || socket.readyState !== WebSocket.OPEN) return;
-        const inputData = e.inputBuffer.getChannelData(0);
-        const downsampledBuffer = downsampleBuffer(inputData, audioContext.sampleRate, TARGET_SAMPLE_RATE);
-        socket.send(downsampledBuffer);
+        // Échantillons float32 bruts, à la fréquence de l'AudioContext
+        socket.send(e.data.buffer);
     };
 }
 
@@ -212,36 +215,3 @@ function insertTextAtCursor(text) {
         }
     } 
 }
-
-// ... (Fonctions de conversion audio identiques à popup.js)
-function downsampleBuffer(buffer, sampleRate, outSampleRate) {
-    if (outSampleRate === sampleRate) return convertFloat32ToInt16(buffer);
-    const sampleRateRatio = sampleRate / outSampleRate;
-    const newLength = Math.round(buffer.length / sampleRateRatio);
-    const result = new Int16Array(newLength);
-    let offsetResult = 0;
-    let offsetBuffer = 0;
-    while (offsetResult < result.length) {
-        const nextOffsetBuffer = Math.round((offsetResult + 1) * sampleRateRatio);
-        let accum = 0, count = 0;
-        for (let i = offsetBuffer; i < nextOffsetBuffer && i < buffer.length; i++) {
-            accum += buffer[i];
-            count++;
-        }
-        const s = Math.max(-1, Math.min(1, accum / count));
-        result[offsetResult] = s < 0 ? s * 0x8000 : s * 0x7FFF;
-        offsetResult++;
-        offsetBuffer = nextOffsetBuffer;
-    }
-    return result;
-}
-
-function convertFloat32ToInt16(buffer) {
-    let l = buffer.length;
-    let buf = new Int16Array(l);
-    while (l--) {
-        const s = Math.max(-1, Math.min(1, buffer[l]));
-        buf[l] = s < 0 ? s * 0x8000 : s * 0x7FFF;
-    }
-    return buf;
-}
\ No newline at end of file
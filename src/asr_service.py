@@ -1,9 +1,147 @@
+import bisect
+import contextlib
+import threading
+import time
+from typing import List, Optional, Sequence, Tuple, Union
+
 import numpy as np
-from faster_whisper import WhisperModel
+from faster_whisper import BatchedInferencePipeline, WhisperModel
+from faster_whisper.transcribe import get_compression_ratio
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+from src.transcription import TranscriptionResult, segment_from_whisper
+
+SAMPLE_RATE = 16000
+# faster-whisper's default temperature fallback schedule
+DEFAULT_TEMPERATURE = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+# faster-whisper's default thresholds for falling back to the next temperature
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOG_PROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+
+class _PromptedBatchedPipeline(BatchedInferencePipeline):
+    """
+    faster-whisper's batched pipeline with its own decoder prompt for every clip.
+
+    The stock pipeline builds a single prompt for the whole batch from `initial_prompt` and
+    leaves `prefix` out of it, so segments with different contexts or committed prefixes could
+    not share a batch. Within `clip_prompts`, clip i of the batch is decoded with its own
+    (initial_prompt, prefix) pair instead. The prompts are kept per thread, as the inference
+    workers share the pipeline.
+    """
+
+    def __init__(self, model):
+        super().__init__(model=model)
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def clip_prompts(self, prompts: List[Tuple[Optional[str], Optional[str]]]):
+        """(initial_prompt, prefix) of every clip, in order, for the calls made inside."""
+        self._local.prompts = prompts
+        self._local.next_clip = 0
+        try:
+            yield
+        finally:
+            self._local.prompts = None
+
+    def generate_segment_batched(self, features, tokenizer, options):
+        clip_prompts = getattr(self._local, "prompts", None)
+        if not clip_prompts:
+            return super().generate_segment_batched(features, tokenizer, options)
+
+        batch_size = features.shape[0]
+        first = self._local.next_clip
+        self._local.next_clip += batch_size
+        prompts = [
+            self.model.get_prompt(
+                tokenizer,
+                previous_tokens=tokenizer.encode(initial_prompt) if initial_prompt else [],
+                without_timestamps=options.without_timestamps,
+                prefix=prefix,
+                hotwords=options.hotwords,
+            )
+            for initial_prompt, prefix in clip_prompts[first : first + batch_size]
+        ]
+
+        longest = max(len(prompt) for prompt in prompts)
+        if options.max_new_tokens is not None:
+            max_length = min(longest + options.max_new_tokens, self.model.max_length)
+        else:
+            max_length = self.model.max_length
+
+        encoder_output = self.model.encode(features)
+        if options.multilingual:
+            language_tokens = [
+                tokenizer.tokenizer.token_to_id(segment_langs[0][0])
+                for segment_langs in self.model.model.detect_language(encoder_output)
+            ]
+            for prompt, language_token in zip(prompts, language_tokens):
+                prompt[prompt.index(tokenizer.language)] = language_token
+
+        results = self.model.model.generate(
+            encoder_output,
+            prompts,
+            beam_size=options.beam_size,
+            patience=options.patience,
+            length_penalty=options.length_penalty,
+            max_length=max_length,
+            suppress_blank=options.suppress_blank,
+            suppress_tokens=options.suppress_tokens,
+            return_scores=True,
+            return_no_speech_prob=True,
+            sampling_temperature=options.temperatures[0],
+            repetition_penalty=options.repetition_penalty,
+            no_repeat_ngram_size=options.no_repeat_ngram_size,
+        )
+
+        output = []
+        for result in results:
+            seq_len = len(result.sequences_ids[0])
+            cum_logprob = result.scores[0] * (seq_len**options.length_penalty)
+            output.append(
+                dict(
+                    avg_logprob=cum_logprob / (seq_len + 1),
+                    no_speech_prob=result.no_speech_prob,
+                    tokens=result.sequences_ids[0],
+                )
+            )
+        return encoder_output, output
+
+
+def _needs_temperature_fallback(result: TranscriptionResult) -> bool:
+    """
+    faster-whisper's rule for retrying a decode at a higher temperature: the text is too
+    repetitive, or too unlikely without being silence.
+    """
+    if not result.segments:
+        return False
+    if get_compression_ratio(result.text) > COMPRESSION_RATIO_THRESHOLD:
+        return True
+    avg_logprob = sum(s.avg_logprob for s in result.segments) / len(result.segments)
+    no_speech_prob = max(s.no_speech_prob for s in result.segments)
+    return avg_logprob < LOG_PROB_THRESHOLD and no_speech_prob <= NO_SPEECH_THRESHOLD
+
+
+def _per_segment(value, count: int) -> list:
+    """A per-segment option given once for all segments, or as a list with one per segment."""
+    if isinstance(value, (list, tuple)):
+        if len(value) != count:
+            raise ValueError(f"Expected {count} values, got {len(value)}")
+        return list(value)
+    return [value] * count
 
 
 class ASRService:
-    def __init__(self, model_size="small", device="cpu", compute_type="int8"):
+    def __init__(
+        self,
+        model_size="small",
+        device="cpu",
+        compute_type="int8",
+        num_workers=1,
+        warmup_durations: Sequence[float] = (),
+        warmup_batched=False,
+    ):
         """
         Initializes the ASR service with a Faster Whisper model.
 
@@ -11,39 +149,271 @@ class ASRService:
             model_size (str): The size of the Whisper model to use (e.g., "tiny", "base", "small", "medium", "large-v2").
             device (str): The device to run the model on ("cuda" for GPU, "cpu" for CPU).
             compute_type (str): The compute type (e.g., "int8", "float16", "float32").
+            num_workers (int): Number of threads allowed to run `transcribe` in parallel.
+            warmup_durations (Sequence[float]): Lengths (seconds) of the synthetic segments
+                decoded right after loading, so the first real segment does not pay for
+                CTranslate2 initialisation and buffer allocation. Empty to skip the warm-up.
+            warmup_batched (bool): Also warm up the batched pipeline (`transcribe_batch`).
         """
         print(
             f"Loading Whisper model: {model_size} on {device} with {compute_type} compute type..."
         )
-        self.model = WhisperModel(model_size, device=device, compute_type=compute_type)
+        self.model = WhisperModel(
+            model_size, device=device, compute_type=compute_type, num_workers=num_workers
+        )
         print("Whisper model loaded.")
+        self._batched_pipeline = None
+
+        self.warmup_time = 0.0
+        if warmup_durations:
+            self.warmup(warmup_durations, batched=warmup_batched)
+
+    def warmup(self, durations: Sequence[float], batched=False) -> float:
+        """
+        Decodes synthetic audio of the given lengths (seconds) and discards the result.
+
+        Returns:
+            float: The time spent warming up, in seconds.
+        """
+        started = time.perf_counter()
+        rng = np.random.default_rng(0)
+        segments = []
+        for duration in durations:
+            # A tone over low noise, so the decoder actually runs instead of stopping on silence
+            t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+            audio = 0.1 * np.sin(2 * np.pi * 220 * t) + 0.01 * rng.standard_normal(len(t))
+            segments.append(audio.astype(np.float32))
+            self.transcribe_audio(segments[-1])
+        if batched:
+            self.transcribe_batch(segments)
+
+        self.warmup_time = time.perf_counter() - started
+        print(f"Whisper model warmed up in {self.warmup_time:.2f}s ({list(durations)} s of audio).")
+        return self.warmup_time
+
+    def transcribe_audio(self, audio_segment: np.ndarray, **options) -> str:
+        """
+        Transcribes a segment of audio. Accepts the same options as `transcribe_detailed`.
+
+        Returns:
+            str: The transcribed text.
+        """
+        return self.transcribe_detailed(audio_segment, **options).text
 
-    def transcribe_audio(
-        self, audio_segment: np.ndarray, language=None, vad_filter=False
-    ) -> str:
+    def transcribe_detailed(
+        self,
+        audio_segment: np.ndarray,
+        language=None,
+        vad_filter=False,
+        prefix=None,
+        beam_size=5,
+        best_of=5,
+        temperature=DEFAULT_TEMPERATURE,
+        condition_on_previous_text=True,
+        initial_prompt=None,
+        word_timestamps=False,
+    ) -> TranscriptionResult:
         """
-        Transcribes a segment of audio.
+        Transcribes a segment of audio, keeping Whisper's segment metadata.
 
         Args:
             audio_segment (np.ndarray): A NumPy array containing the audio segment (float32, 16kHz).
             language (str, optional): The language of the audio. If None, it will be detected automatically.
             vad_filter (bool): Whether to use Voice Activity Detection to filter out silence.
+            prefix (str, optional): Text already known to start the segment. It is forced as the
+                beginning of the decode and is not part of the returned text.
+            beam_size (int): Beam size used for decoding (1 for greedy decoding).
+            best_of (int): Number of candidates sampled when decoding with a non-zero temperature.
+            temperature (float or Sequence[float]): Temperature, or the fallback schedule used
+                when a decode fails the compression ratio or log probability thresholds.
+            condition_on_previous_text (bool): Whether each window is conditioned on the text
+                of the previous one.
+            initial_prompt (str, optional): Context given to the decoder as previous text
+                (e.g. the end of the session transcript and custom vocabulary).
+            word_timestamps (bool): Whether to compute the timestamp of every word.
 
         Returns:
-            str: The transcribed text.
+            TranscriptionResult: The text with its segments (timestamps, avg_logprob,
+                no_speech_prob, words) and the language.
         """
         if audio_segment.dtype != np.float32:
             audio_segment = audio_segment.astype(np.float32)
+        if isinstance(temperature, (list, tuple)):
+            temperature = list(temperature)
 
         segments, info = self.model.transcribe(
-            audio_segment, language=language, beam_size=5, vad_filter=vad_filter
+            audio_segment,
+            language=language,
+            beam_size=beam_size,
+            best_of=best_of,
+            temperature=temperature,
+            condition_on_previous_text=condition_on_previous_text,
+            vad_filter=vad_filter,
+            prefix=prefix,
+            initial_prompt=initial_prompt,
+            word_timestamps=word_timestamps,
         )
 
         transcribed_text = ""
+        results = []
         for segment in segments:
             transcribed_text += segment.text
+            results.append(segment_from_whisper(segment))
+
+        return TranscriptionResult(
+            text=transcribed_text.strip(),
+            segments=results,
+            language=getattr(info, "language", None),
+            language_probability=getattr(info, "language_probability", None),
+        )
+
+    def detect_language(self, audio_segment: np.ndarray) -> Tuple[str, float]:
+        """
+        Detects the spoken language of a segment (first 30 seconds).
+
+        Returns:
+            Tuple[str, float]: The language code and its probability.
+        """
+        if audio_segment.dtype != np.float32:
+            audio_segment = audio_segment.astype(np.float32)
+        language, probability, _ = self.model.detect_language(audio_segment)
+        return language, probability
+
+    def transcribe_batch(self, audio_segments: List[np.ndarray], **options) -> List[str]:
+        """
+        Transcribes several independent segments in a single batched decode.
+        Accepts the same options as `transcribe_batch_detailed`.
+
+        Returns:
+            List[str]: The transcribed text of each segment, in input order.
+        """
+        results = self.transcribe_batch_detailed(audio_segments, **options)
+        return [result.text for result in results]
+
+    def transcribe_batch_detailed(
+        self,
+        audio_segments: List[np.ndarray],
+        language=None,
+        vad_filter=False,
+        beam_size=5,
+        best_of=5,
+        temperature=DEFAULT_TEMPERATURE,
+        condition_on_previous_text=True,
+        initial_prompt: Union[str, Sequence[Optional[str]], None] = None,
+        prefix: Union[str, Sequence[Optional[str]], None] = None,
+        word_timestamps=False,
+    ) -> List[TranscriptionResult]:
+        """
+        Transcribes several independent segments in a single batched decode.
+
+        The segments are laid end to end and handed to faster-whisper's batched pipeline as
+        explicit clips, so each one is padded to a full window and decoded in the same batch.
+
+        Args:
+            audio_segments (List[np.ndarray]): Segments to transcribe (float32, 16kHz, < 30s each).
+            language (str, optional): The language shared by all segments. If None, it is
+                detected once for the whole batch, and that language is reported in every
+                result (with `multilingual`, each clip is still decoded in its own language).
+            vad_filter (bool): Whether to drop non-speech regions of each segment before decoding.
+            beam_size (int): Beam size used for decoding.
+            best_of (int): Number of candidates sampled when decoding with a non-zero temperature.
+            temperature (float or Sequence[float]): Temperature or fallback schedule. The batch
+                is decoded at the first temperature; segments failing faster-whisper's quality
+                checks (compression ratio, log probability) are then decoded again on their
+                own with the rest of the schedule.
+            condition_on_previous_text (bool): Whether each window is conditioned on the text
+                of the previous one (in those re-decodes; a clip of the batch is one window).
+            initial_prompt (str or Sequence[str], optional): Context given to the decoder as
+                previous text, shared by all segments or one per segment (None for none).
+            prefix (str or Sequence[str], optional): Text already known to start the segment,
+                shared or one per segment; it is not part of the returned text.
+            word_timestamps (bool): Whether to compute the timestamp of every word.
+
+        Returns:
+            List[TranscriptionResult]: The result of each segment, in input order, with
+                timestamps relative to the start of that segment.
+        """
+        if self._batched_pipeline is None:
+            self._batched_pipeline = _PromptedBatchedPipeline(model=self.model)
+        initial_prompts = _per_segment(initial_prompt, len(audio_segments))
+        prefixes = _per_segment(prefix, len(audio_segments))
+
+        clips = []  # (start, end) in samples within the concatenated audio
+        owners = []  # index of the input segment each clip belongs to
+        offsets = []  # start of each input segment within the concatenated audio
+        offset = 0
+        for index, segment in enumerate(audio_segments):
+            offsets.append(offset)
+            segment = segment.astype(np.float32, copy=False)
+            if vad_filter:
+                regions = get_speech_timestamps(segment, VadOptions())
+            else:
+                regions = [{"start": 0, "end": len(segment)}]
+            for region in regions:
+                clips.append((offset + region["start"], offset + region["end"]))
+                owners.append(index)
+            offset += len(segment)
+
+        results = [TranscriptionResult("") for _ in audio_segments]
+        if not clips:
+            return results
+
+        audio = np.concatenate(audio_segments).astype(np.float32, copy=False)
+        if isinstance(temperature, (list, tuple)):
+            temperature = list(temperature)
+        # Each clip is decoded with the prompt and prefix of the segment it belongs to
+        clip_prompts = [(initial_prompts[owner], prefixes[owner]) for owner in owners]
+        with self._batched_pipeline.clip_prompts(clip_prompts):
+            segments, info = self._batched_pipeline.transcribe(
+                audio,
+                language=language,
+                multilingual=language is None,
+                beam_size=beam_size,
+                best_of=best_of,
+                temperature=temperature,
+                condition_on_previous_text=condition_on_previous_text,
+                word_timestamps=word_timestamps,
+                batch_size=len(clips),
+                clip_timestamps=[
+                    {"start": start / SAMPLE_RATE, "end": end / SAMPLE_RATE}
+                    for start, end in clips
+                ],
+            )
+            # Segments are decoded lazily, while they are iterated
+            segments = list(segments)
+
+        # Route every decoded segment back to the clip (and input segment) it starts in
+        clip_starts = [start / SAMPLE_RATE for start, _ in clips]
+        for segment in segments:
+            clip_index = max(bisect.bisect_right(clip_starts, segment.start + 0.01) - 1, 0)
+            owner = owners[clip_index]
+            results[owner].text += segment.text
+            results[owner].segments.append(
+                segment_from_whisper(segment, offset=-offsets[owner] / SAMPLE_RATE)
+            )
+
+        for result in results:
+            result.text = result.text.strip()
+            result.language = getattr(info, "language", None)
+            result.language_probability = getattr(info, "language_probability", None)
 
-        return transcribed_text.strip()
+        # Temperature fallback, like the unbatched path, for the segments that need it
+        if isinstance(temperature, list) and len(temperature) > 1:
+            for index, result in enumerate(results):
+                if _needs_temperature_fallback(result):
+                    results[index] = self.transcribe_detailed(
+                        audio_segments[index],
+                        language=language,
+                        vad_filter=vad_filter,
+                        prefix=prefixes[index],
+                        beam_size=beam_size,
+                        best_of=best_of,
+                        temperature=temperature[1:],
+                        condition_on_previous_text=condition_on_previous_text,
+                        initial_prompt=initial_prompts[index],
+                        word_timestamps=word_timestamps,
+                    )
+        return results
 
 
 if __name__ == "__main__":
@@ -0,0 +1,145 @@
+import asyncio
+import importlib.util
+from typing import List
+
+import numpy as np
+
+from src.protocol import (
+    FORMAT_NAMES,
+    FORMAT_OPUS,
+    FORMAT_PCM_F32LE,
+    FORMAT_PCM_S16LE,
+    SAMPLE_TYPES,
+    Frame,
+    ProtocolError,
+)
+from src.resampler import PcmConverter
+
+SAMPLE_RATE = 16000
+
+
+def opus_available() -> bool:
+    """Whether PyAV (installed with faster-whisper) is there to encode/decode Opus."""
+    return importlib.util.find_spec("av") is not None
+
+
+def supported_formats() -> List[str]:
+    """Names of the frame formats this side can handle, advertised in the `hello` message."""
+    formats = [FORMAT_NAMES[FORMAT_PCM_S16LE], FORMAT_NAMES[FORMAT_PCM_F32LE]]
+    if opus_available():
+        formats.append(FORMAT_NAMES[FORMAT_OPUS])
+    return formats
+
+
+class OpusDecoder:
+    """
+    Streaming decoder for the Opus packets of one stream (one packet per frame).
+    Opus is stateful across packets, so a stream needs its own decoder, fed in order.
+    """
+
+    def __init__(self, channels=1, sample_rate=SAMPLE_RATE):
+        """
+        Args:
+            channels (int): Channels of the encoded stream.
+            sample_rate (int): Rate of the decoded PCM (mono int16).
+        """
+        import av
+
+        self._av = av
+        self.codec = av.CodecContext.create("opus", "r")
+        self.codec.layout = "stereo" if channels == 2 else "mono"
+        # Opus always decodes at 48 kHz; downmix and resample to what AudioProcessor expects
+        self.resampler = av.AudioResampler(format="s16", layout="mono", rate=sample_rate)
+
+    def decode(self, packet: bytes) -> bytes:
+        """Decode one packet into mono int16 PCM bytes (may be empty while priming)."""
+        try:
+            frames = self.codec.decode(self._av.Packet(packet))
+        except self._av.error.FFmpegError as e:
+            raise ProtocolError(f"Invalid Opus packet: {e}") from e
+
+        pcm = []
+        for frame in frames:
+            for resampled in self.resampler.resample(frame):
+                pcm.append(resampled.to_ndarray().tobytes())
+        return b"".join(pcm)
+
+
+class OpusEncoder:
+    """Client-side encoder turning int16 chunks of any size into 20 ms Opus packets."""
+
+    def __init__(self, sample_rate=SAMPLE_RATE, bitrate=24000, frame_duration_ms=20):
+        """
+        Args:
+            sample_rate (int): Rate of the recorded int16 mono audio.
+            bitrate (int): Target bitrate in bit/s (24 kbit/s is transparent for speech).
+            frame_duration_ms (int): Audio per packet (2.5, 5, 10, 20, 40 or 60 ms).
+        """
+        import av
+
+        self._av = av
+        self.sample_rate = sample_rate
+        self.codec = av.CodecContext.create("libopus", "w")
+        self.codec.sample_rate = sample_rate
+        self.codec.layout = "mono"
+        self.codec.format = "s16"
+        self.codec.bit_rate = bitrate
+        self.codec.options = {"application": "voip", "frame_duration": str(frame_duration_ms)}
+        self.codec.open()
+
+    def encode(self, audio_chunk: np.ndarray) -> List[bytes]:
+        """Encode int16 samples; returns the packets completed so far (the rest is buffered)."""
+        frame = self._av.AudioFrame.from_ndarray(
+            np.ascontiguousarray(audio_chunk, dtype=np.int16).reshape(1, -1),
+            format="s16",
+            layout="mono",
+        )
+        frame.sample_rate = self.sample_rate
+        return [bytes(packet) for packet in self.codec.encode(frame)]
+
+
+class FrameDecoder:
+    """
+    Turns the frames of one session into 16 kHz mono int16 PCM for `AudioProcessor`.
+
+    PCM frames of any rate, channel count and sample type are converted inline by a streaming
+    `PcmConverter` (cheap, vectorized). Opus packets are decoded on `executor` (a thread pool
+    shared by all sessions) so decoding never runs on the event loop; frames of a session are
+    decoded one after the other, which keeps the decoder state in order.
+    """
+
+    def __init__(self, executor=None):
+        """
+        Args:
+            executor (concurrent.futures.Executor, optional): Pool used for Opus decoding
+                (the default executor of the event loop if None).
+        """
+        self.executor = executor
+        self._opus = None
+        self._converter = None
+
+    async def decode(self, frame: Frame) -> bytes:
+        if frame.format != FORMAT_OPUS:
+            return self._pcm_converter(frame).convert(frame.payload)
+
+        if self._opus is None:
+            if not opus_available():
+                raise ProtocolError("Opus frames are not supported by this server")
+            self._opus = OpusDecoder(channels=frame.channels)
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self._opus.decode, frame.payload
+        )
+
+    def flush(self) -> bytes:
+        """PCM still held back by the resampler, once the client ended the stream."""
+        return self._converter.flush() if self._converter else b""
+
+    def _pcm_converter(self, frame: Frame) -> PcmConverter:
+        """The converter for the frame's format, recreated if the client changes format."""
+        declared = (frame.sample_rate, frame.channels, SAMPLE_TYPES[frame.format])
+        if self._converter is None or self._converter.format != declared:
+            try:
+                self._converter = PcmConverter(*declared, output_rate=SAMPLE_RATE)
+            except ValueError as e:
+                raise ProtocolError(str(e)) from e
+        return self._converter
@@ -1,10 +1,14 @@
 import collections
-import time
+import functools
+from abc import ABC, abstractmethod
 from enum import Enum
-from typing import Optional
+from typing import List, Optional
 
 import numpy as np
 
+from src.ring_buffer import RingBuffer
+from src.segmenter import find_cut_point
+
 
 class VadState(Enum):
     IDLE = 1
@@ -12,11 +16,290 @@ class VadState(Enum):
     COOLDOWN = 3
 
 
+class VadBackend(ABC):
+    """
+    Interface for the speech detector used by `AudioProcessor`.
+    A backend instance belongs to a single audio stream and may keep state between chunks.
+    """
+
+    # Whether batched evaluation is heavy enough to be moved off the event loop
+    offload = False
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """The name used to select this backend in the configuration."""
+        pass
+
+    @abstractmethod
+    def is_speech(self, audio_chunk: np.ndarray) -> bool:
+        """Return True if the chunk (int16 samples) contains speech."""
+        pass
+
+    def stats(self) -> dict:
+        """Current detector state, reported per session."""
+        return {"backend": self.name}
+
+    @classmethod
+    def is_speech_batch(
+        cls, backends: List["VadBackend"], audio_chunks: List[np.ndarray]
+    ) -> List[bool]:
+        """
+        Evaluate one chunk for each of several streams using backends of this class.
+        Subclasses override this to score every chunk in a single vectorized call.
+        """
+        return [backend.is_speech(chunk) for backend, chunk in zip(backends, audio_chunks)]
+
+
+class RmsVad(VadBackend):
+    """Energy detector: a chunk is speech when its RMS is above a fixed threshold."""
+
+    def __init__(self, threshold=200):
+        self.threshold = threshold
+
+    @property
+    def name(self) -> str:
+        return "rms"
+
+    def is_speech(self, audio_chunk: np.ndarray) -> bool:
+        rms = np.sqrt(np.mean(audio_chunk.astype(np.float32) ** 2))
+        return self.decide(float(rms))
+
+    def decide(self, rms: float) -> bool:
+        """Speech decision for a chunk of the given RMS energy."""
+        return rms >= self.threshold
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "threshold": self.threshold}
+
+    @classmethod
+    def is_speech_batch(cls, backends, audio_chunks):
+        # Stack every chunk into one zero-padded 2-D array; padding adds no energy
+        lengths = np.array([len(chunk) for chunk in audio_chunks])
+        frames = np.zeros((len(audio_chunks), lengths.max()), dtype=np.float32)
+        for row, chunk in zip(frames, audio_chunks):
+            row[: len(chunk)] = chunk
+
+        rms = np.sqrt(np.einsum("ij,ij->i", frames, frames) / np.maximum(lengths, 1))
+        return [backend.decide(energy) for backend, energy in zip(backends, rms.tolist())]
+
+
+class AdaptiveRmsVad(RmsVad):
+    """
+    Energy detector with thresholds derived from the session's own noise floor.
+
+    The noise floor is a low percentile of the RMS energies of the recent chunks, so it tracks
+    the background level of each microphone. Speech starts when a chunk exceeds
+    `start_ratio` times the floor and only stops once chunks fall below `stop_ratio` times the
+    floor (hysteresis), which keeps short dips inside words from fragmenting segments.
+    """
+
+    def __init__(
+        self,
+        initial_threshold=200,
+        start_ratio=3.0,
+        stop_ratio=2.0,
+        percentile=15,
+        history_chunks=150,
+        min_history_chunks=10,
+        min_threshold=30,
+    ):
+        """
+        Args:
+            initial_threshold (float): Start threshold used until enough history is collected.
+            start_ratio (float): Start threshold as a multiple of the noise floor.
+            stop_ratio (float): Stop threshold as a multiple of the noise floor.
+            percentile (float): Percentile of recent chunk energies taken as the noise floor.
+            history_chunks (int): Number of recent chunks the estimate is based on.
+            min_history_chunks (int): Chunks needed before the estimate is used.
+            min_threshold (float): Lower bound for both thresholds (digital silence).
+        """
+        super().__init__(threshold=initial_threshold)
+        self.start_ratio = start_ratio
+        self.stop_ratio = stop_ratio
+        self.percentile = percentile
+        self.min_history_chunks = min_history_chunks
+        self.min_threshold = min_threshold
+
+        self.energies = collections.deque(maxlen=history_chunks)
+        self.noise_floor = initial_threshold / start_ratio
+        self.in_speech = False
+
+    @property
+    def name(self) -> str:
+        return "adaptive"
+
+    @property
+    def start_threshold(self) -> float:
+        return max(self.min_threshold, self.noise_floor * self.start_ratio)
+
+    @property
+    def stop_threshold(self) -> float:
+        return max(self.min_threshold, self.noise_floor * self.stop_ratio)
+
+    def decide(self, rms: float) -> bool:
+        self.energies.append(rms)
+        if len(self.energies) >= self.min_history_chunks:
+            self.noise_floor = float(np.percentile(self.energies, self.percentile))
+
+        self.threshold = self.stop_threshold if self.in_speech else self.start_threshold
+        self.in_speech = rms >= self.threshold
+        return self.in_speech
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "noise_floor": round(self.noise_floor, 1),
+            "start_threshold": round(self.start_threshold, 1),
+            "stop_threshold": round(self.stop_threshold, 1),
+            "in_speech": self.in_speech,
+        }
+
+
+class SileroVadModel:
+    """
+    CPU ONNX Silero VAD model (the one bundled with faster-whisper), shared by all sessions.
+    The model is recurrent: each stream keeps its own `SileroVadState` between calls.
+    """
+
+    WINDOW_SIZE = 512
+    CONTEXT_SIZE = 64
+
+    def __init__(self):
+        from faster_whisper.vad import get_vad_model
+
+        self._session = get_vad_model().session
+
+    def speech_probs(self, state: "SileroVadState", audio: np.ndarray) -> np.ndarray:
+        """
+        Feed float32 audio to one stream and return the speech probability of every complete
+        512-sample window. Samples that do not fill a window are kept for the next call.
+        """
+        samples = np.concatenate([state.pending, audio])
+        num_windows = len(samples) // self.WINDOW_SIZE
+        state.pending = samples[num_windows * self.WINDOW_SIZE :]
+        if num_windows == 0:
+            return np.empty(0, dtype=np.float32)
+
+        # Every window is preceded by the last samples of the previous one
+        with_context = np.concatenate([state.context, samples[: num_windows * self.WINDOW_SIZE]])
+        windows = np.lib.stride_tricks.sliding_window_view(
+            with_context, self.WINDOW_SIZE + self.CONTEXT_SIZE
+        )[:: self.WINDOW_SIZE]
+        probs, state.h, state.c = self._session.run(
+            None, {"input": np.ascontiguousarray(windows), "h": state.h, "c": state.c}
+        )
+        state.context = with_context[-self.CONTEXT_SIZE :]
+        return probs
+
+    def speech_probs_batch(
+        self, states: List["SileroVadState"], chunks: List[np.ndarray]
+    ) -> List[np.ndarray]:
+        """
+        Evaluate chunks from several streams in one call.
+        The bundled graph carries a single recurrent state, so streams are run one after the
+        other; batching them still lets a scheduler pay the dispatch overhead once per tick.
+        """
+        return [self.speech_probs(state, chunk) for state, chunk in zip(states, chunks)]
+
+
+class SileroVadState:
+    """Recurrent state of one stream for `SileroVadModel`."""
+
+    def __init__(self):
+        self.h = np.zeros((1, 1, 128), dtype=np.float32)
+        self.c = np.zeros((1, 1, 128), dtype=np.float32)
+        self.context = np.zeros(SileroVadModel.CONTEXT_SIZE, dtype=np.float32)
+        self.pending = np.zeros(0, dtype=np.float32)
+        self.last_prob = 0.0
+
+
+@functools.lru_cache(maxsize=1)
+def get_silero_model() -> SileroVadModel:
+    """Load the Silero model once per process."""
+    print("Loading Silero VAD model (ONNX, CPU)...")
+    return SileroVadModel()
+
+
+class SileroVad(VadBackend):
+    """Neural detector: a chunk is speech when a window's Silero probability is above threshold."""
+
+    offload = True
+
+    def __init__(self, threshold=0.5, model: SileroVadModel = None):
+        self.threshold = threshold
+        self.model = model or get_silero_model()
+        self.state = SileroVadState()
+
+    @property
+    def name(self) -> str:
+        return "silero"
+
+    def is_speech(self, audio_chunk: np.ndarray) -> bool:
+        probs = self.model.speech_probs(self.state, audio_chunk.astype(np.float32) / 32768.0)
+        return self._decide(probs)
+
+    def _decide(self, probs: np.ndarray) -> bool:
+        if len(probs):
+            self.state.last_prob = float(probs.max())
+        return self.state.last_prob >= self.threshold
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "threshold": self.threshold,
+            "speech_prob": round(self.state.last_prob, 3),
+        }
+
+    @classmethod
+    def is_speech_batch(cls, backends, audio_chunks):
+        # All backends share the process-wide model
+        all_probs = backends[0].model.speech_probs_batch(
+            [backend.state for backend in backends],
+            [chunk.astype(np.float32) / 32768.0 for chunk in audio_chunks],
+        )
+        return [backend._decide(probs) for backend, probs in zip(backends, all_probs)]
+
+
+def create_vad_backend(name="rms", silence_threshold=200, speech_threshold=0.5) -> VadBackend:
+    """
+    Build a VAD backend by name.
+
+    Args:
+        name (str): "rms" (fixed energy threshold), "adaptive" (energy thresholds following
+            the session's noise floor) or "silero" (neural, ONNX on CPU).
+        silence_threshold (float): RMS threshold (int16 scale) used by the "rms" backend, and
+            as the initial start threshold of the "adaptive" backend.
+        speech_threshold (float): Speech probability threshold used by the "silero" backend.
+    """
+    if name == "rms":
+        return RmsVad(threshold=silence_threshold)
+    if name == "adaptive":
+        return AdaptiveRmsVad(initial_threshold=silence_threshold)
+    if name == "silero":
+        return SileroVad(threshold=speech_threshold)
+    raise ValueError(f"Unknown VAD backend '{name}'. Available: rms, adaptive, silero")
+
+
 class AudioProcessor:
     """
     Manages the audio stream buffering and Voice Activity Detection (VAD).
     It accumulates audio chunks and returns a complete segment when silence is detected
     or a max duration is reached.
+
+    All timing is measured on the audio itself (count of samples consumed) rather than the
+    wall clock, so segmentation does not depend on how fast or regularly chunks arrive.
+
+    Audio is stored once, as normalized float32, in a preallocated ring buffer sized from
+    `max_accumulate_duration`. The pre-roll history and the segment in progress are both
+    windows of that ring, so per-session memory is fixed and length tracking is O(1).
+
+    When `cut_search_duration` is set, a segment reaching the max duration is cut at the
+    quietest point of its last `cut_search_duration` seconds instead of at the limit, and the
+    next segment starts `cut_overlap_duration` seconds before the cut so no word is lost.
+    `last_segment_overlap` tells how many samples of the returned segment repeat the previous one.
+    `last_segment_bounds` gives the (start, end) sample positions of the returned segment in
+    the stream.
     """
 
     def __init__(
@@ -26,53 +309,146 @@ class AudioProcessor:
         silence_pause_duration=1.0,
         max_accumulate_duration=10,
         history_buffer_chunks=8,
+        vad_backend: VadBackend = None,
+        cut_search_duration=0.0,
+        cut_overlap_duration=0.0,
     ):
         self.sample_rate = sample_rate
         self.silence_threshold = silence_threshold
+        self.vad = vad_backend or RmsVad(threshold=silence_threshold)
         self.silence_pause_duration = silence_pause_duration
         self.max_accumulate_duration = max_accumulate_duration
+        self.cut_search_samples = int(cut_search_duration * sample_rate)
+        self.cut_overlap_samples = int(cut_overlap_duration * sample_rate)
 
         # State
         self.state = VadState.IDLE
-        self.silence_start_time = None
+        self.silence_start_sample = None
+
+        # Sample clock: number of samples consumed since the stream started
+        self.samples_consumed = 0
 
-        # Buffers
-        self.main_buffer = []  # Stores int16 chunks
-        self.history_buffer = collections.deque(
+        # Buffers: one ring holds the pre-roll history and the segment in progress.
+        # One extra second of headroom covers the pre-roll and the chunk that crosses the limit.
+        self.ring_buffer = RingBuffer(int(sample_rate * (max_accumulate_duration + 1)))
+        self.segment_start_sample = None  # Start of the segment in progress (absolute sample)
+        self._segment_overlap = 0  # Samples the segment in progress shares with the previous one
+        self.last_segment_overlap = 0
+        self.last_segment_bounds = None
+        self.history_starts = collections.deque(
             maxlen=history_buffer_chunks
-        )  # Stores int16 chunks (pre-roll)
+        )  # Start positions of the last chunks (pre-roll)
+
+    @property
+    def stream_time(self) -> float:
+        """Position in the audio stream, in seconds."""
+        return self.samples_consumed / self.sample_rate
 
     def is_silent(self, audio_chunk: np.ndarray) -> bool:
-        """Check if an audio chunk is silent based on RMS energy."""
-        rms = np.sqrt(np.mean(audio_chunk.astype(np.float32) ** 2))
-        return rms < self.silence_threshold
+        """Check if an audio chunk is silent according to the VAD backend."""
+        return not self.vad.is_speech(audio_chunk)
+
+    def stats(self) -> dict:
+        """Segmentation state of this session."""
+        return {
+            "state": self.state.name,
+            "stream_time": round(self.stream_time, 3),
+            "buffered_seconds": round(len(self.main_buffer) / self.sample_rate, 3),
+            "vad": self.vad.stats(),
+        }
+
+    @property
+    def main_buffer(self) -> np.ndarray:
+        """View of the audio accumulated for the segment in progress (empty when idle)."""
+        if self.segment_start_sample is None:
+            return self.ring_buffer.view(self.ring_buffer.end)
+        return self.ring_buffer.view(self.segment_start_sample)
+
+    def _write(self, audio_chunk: np.ndarray):
+        """Append a chunk to the ring, growing it only if a chunk would not fit."""
+        oldest_needed = self.segment_start_sample
+        if oldest_needed is None and self.history_starts:
+            oldest_needed = self.history_starts[0]
+        if oldest_needed is not None:
+            required = self.ring_buffer.end + len(audio_chunk) - oldest_needed
+            if required > self.ring_buffer.capacity:
+                capacity = max(required, self.ring_buffer.capacity * 3 // 2)
+                print(f"AudioProcessor: growing ring buffer to {capacity} samples.")
+                self.ring_buffer.resize(capacity)
+
+        self.ring_buffer.write(audio_chunk.astype(np.float32) / 32768.0)
 
     def _prepare_segment(self) -> np.ndarray:
-        """Concatenates the main buffer and converts to float32 normalized audio."""
-        if not self.main_buffer:
+        """Returns the finished segment as float32 normalized audio and closes it."""
+        if self.segment_start_sample is None:
             return None
 
-        full_audio_int16 = np.concatenate(self.main_buffer)
-        # Clear buffer immediately after consuming
-        self.main_buffer = []
+        # One copy: the ring keeps being written while the segment is decoded
+        segment = self.ring_buffer.view(self.segment_start_sample).copy()
+        self.last_segment_bounds = (self.segment_start_sample, self.ring_buffer.end)
+        self.segment_start_sample = None
+        self.last_segment_overlap = self._segment_overlap
+        self._segment_overlap = 0
+        return segment
+
+    def _cut_segment(self) -> np.ndarray:
+        """
+        Returns the segment up to its quietest point near the end, and keeps the rest
+        (plus an overlap before the cut) as the beginning of the next segment.
+        """
+        buffered = self.main_buffer
+        cut = find_cut_point(buffered, len(buffered) - self.cut_search_samples, len(buffered))
+        segment = buffered[:cut].copy()
+        self.last_segment_bounds = (self.segment_start_sample, self.segment_start_sample + cut)
 
-        # Convert to float32 and normalize
-        full_audio_float32 = full_audio_int16.astype(np.float32) / 32768.0
-        return full_audio_float32
+        overlap = min(self.cut_overlap_samples, cut)
+        self.segment_start_sample += cut - overlap
+        self.last_segment_overlap = self._segment_overlap
+        self._segment_overlap = overlap
+        return segment
 
-    def process(self, audio_bytes: bytes) -> Optional[np.ndarray]:
+    def peek_segment(self) -> Optional[np.ndarray]:
+        """
+        Returns the speech accumulated so far for the segment in progress (float32 normalized),
+        without consuming it. Returns None when no segment is being recorded.
+        The returned array is a view of the ring buffer and must not be modified.
+        """
+        if self.state == VadState.IDLE or self.segment_start_sample is None:
+            return None
+        return self.main_buffer
+
+    def flush(self) -> Optional[np.ndarray]:
+        """
+        Ends the stream: returns the segment in progress, if any, and goes back to IDLE.
+        """
+        result = None
+        if self.state != VadState.IDLE:
+            result = self._prepare_segment()
+        self.state = VadState.IDLE
+        self.silence_start_sample = None
+        return result
+
+    def process(self, audio_bytes: bytes, chunk_is_silent: bool = None) -> Optional[np.ndarray]:
         """
         Process incoming raw audio bytes (int16).
         Returns a float32 numpy array if a speech segment is complete and ready for processing.
         Returns None if more audio is needed.
+
+        `chunk_is_silent` can be given when the chunk was already scored elsewhere (e.g. by a
+        `VadScheduler` batching all sessions); otherwise the VAD backend is run here.
         """
         audio_chunk = np.frombuffer(audio_bytes, dtype=np.int16)
 
-        # Update history buffer (always keep the last N chunks)
-        self.history_buffer.append(audio_chunk)
+        if chunk_is_silent is None:
+            chunk_is_silent = self.is_silent(audio_chunk)
+        chunk_start_sample = self.samples_consumed
 
-        chunk_is_silent = self.is_silent(audio_chunk)
-        current_time = time.time()
+        # Every chunk goes into the ring; the state decides which window of it matters
+        self._write(audio_chunk)
+        self.samples_consumed += len(audio_chunk)
+
+        # Update history (always remember where the last N chunks start)
+        self.history_starts.append(chunk_start_sample)
 
         result = None
 
@@ -80,37 +456,38 @@ class AudioProcessor:
             if not chunk_is_silent:
                 # Speech detected!
                 self.state = VadState.SPEAKING
-                # Dump history (pre-roll) into main buffer to catch the start of the word
-                self.main_buffer.extend(list(self.history_buffer))
-                self.history_buffer.clear()
+                # Start the segment at the oldest history chunk (pre-roll) to catch the word onset
+                self.segment_start_sample = self.history_starts[0]
+                self.history_starts.clear()
 
         elif self.state == VadState.SPEAKING:
-            self.main_buffer.append(audio_chunk)
-
             if chunk_is_silent:
                 # Speech paused, enter cooldown
                 self.state = VadState.COOLDOWN
-                self.silence_start_time = current_time
+                self.silence_start_sample = chunk_start_sample
             else:
                 # Check max duration
-                # Assuming chunk size is somewhat constant or we can just sum lengths
-                current_duration_samples = sum(len(c) for c in self.main_buffer)
+                current_duration_samples = self.samples_consumed - self.segment_start_sample
                 if (
                     current_duration_samples
                     >= self.sample_rate * self.max_accumulate_duration
                 ):
-                    # Force process
-                    result = self._prepare_segment()
-                    self.state = VadState.IDLE
+                    if self.cut_search_samples:
+                        # Cut at a quiet point and keep speaking into the next segment
+                        result = self._cut_segment()
+                    else:
+                        # Force process
+                        result = self._prepare_segment()
+                        self.state = VadState.IDLE
 
         elif self.state == VadState.COOLDOWN:
-            self.main_buffer.append(audio_chunk)
-
             if not chunk_is_silent:
                 # Speech resumed
                 self.state = VadState.SPEAKING
-                self.silence_start_time = None
-            elif (current_time - self.silence_start_time) > self.silence_pause_duration:
+                self.silence_start_sample = None
+            elif (
+                self.samples_consumed - self.silence_start_sample
+            ) / self.sample_rate > self.silence_pause_duration:
                 # Silence has lasted long enough, segment is complete
                 result = self._prepare_segment()
                 self.state = VadState.IDLE
@@ -0,0 +1,168 @@
+import asyncio
+import collections
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# Decoding options that may differ within a batch: passed with one value per segment
+PER_SEGMENT_OPTIONS = ("initial_prompt", "prefix")
+
+
+@dataclass
+class _BatchJob:
+    audio: np.ndarray
+    language: str
+    options: dict
+    segment_options: dict
+    detailed: bool
+    future: asyncio.Future = field(repr=False)
+
+
+class BatchScheduler:
+    """
+    Groups segments coming from many sessions into batched decodes.
+
+    The first segment to arrive opens a collection window of `max_wait_ms`. Every segment
+    received before the window closes (up to `max_batch_size`) is decoded together with
+    `ASRService.transcribe_batch` on the inference executor, and each result is routed back
+    to the caller that submitted it. Segments are only batched with others that share the
+    same language and decoding options, except for the options of `PER_SEGMENT_OPTIONS`
+    (the session prompt and the decoder `prefix` of streaming partials), which are passed per
+    segment.
+    """
+
+    def __init__(self, asr_service, executor, max_batch_size=8, max_wait_ms=30):
+        """
+        Args:
+            asr_service (ASRService): Service providing `transcribe_batch`.
+            executor (InferenceExecutor): Worker pool the batched decodes run on.
+            max_batch_size (int): Maximum number of segments decoded together.
+            max_wait_ms (float): How long to wait for more segments once one is pending.
+        """
+        self.asr_service = asr_service
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = asyncio.Queue()
+        self._collector_task = None
+        self._batch_tasks = set()
+
+        # Metrics
+        self.batches_total = 0
+        self.segments_total = 0
+        self.batch_size_histogram = collections.Counter()
+
+    async def transcribe(self, audio_segment: np.ndarray, language=None, **options) -> str:
+        """Queue a segment for the next batch and wait for its transcription."""
+        return await self._enqueue(audio_segment, language, options, detailed=False)
+
+    async def transcribe_detailed(self, audio_segment: np.ndarray, language=None, **options):
+        """Like `transcribe`, returning a `TranscriptionResult` with segment metadata."""
+        return await self._enqueue(audio_segment, language, options, detailed=True)
+
+    async def _enqueue(self, audio_segment, language, options, detailed):
+        if self._collector_task is None or self._collector_task.done():
+            self._collector_task = asyncio.create_task(self._collect_loop())
+
+        segment_options = {
+            name: options.pop(name) for name in PER_SEGMENT_OPTIONS if name in options
+        }
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(
+            _BatchJob(audio_segment, language, options, segment_options, detailed, future)
+        )
+        return await future
+
+    async def detect_language(self, audio_segment: np.ndarray):
+        """Language detection is not batched; it runs directly on the executor."""
+        return await self.executor.detect_language(audio_segment)
+
+    async def _collect_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            groups = collections.defaultdict(list)
+            for job in batch:
+                groups[(job.language, job.detailed, _options_key(job.options))].append(job)
+
+            # Decode in the background so the next window can start collecting right away
+            for jobs in groups.values():
+                task = asyncio.create_task(self._run_batch(jobs))
+                self._batch_tasks.add(task)
+                task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, jobs):
+        self.batches_total += 1
+        self.segments_total += len(jobs)
+        self.batch_size_histogram[len(jobs)] += 1
+
+        transcribe_batch = (
+            self.asr_service.transcribe_batch_detailed
+            if jobs[0].detailed
+            else self.asr_service.transcribe_batch
+        )
+        # One value per segment, for the per-segment options any job of the batch uses
+        segment_options = {
+            name: [job.segment_options.get(name) for job in jobs]
+            for name in PER_SEGMENT_OPTIONS
+            if any(job.segment_options.get(name) for job in jobs)
+        }
+        try:
+            results = await self.executor.submit(
+                transcribe_batch,
+                [job.audio for job in jobs],
+                language=jobs[0].language,
+                **jobs[0].options,
+                **segment_options,
+            )
+        except Exception as e:
+            for job in jobs:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            return
+
+        for job, result in zip(jobs, results):
+            if not job.future.done():
+                job.future.set_result(result)
+
+    def stats(self) -> dict:
+        """Achieved batching so far."""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches_total,
+            "segments": self.segments_total,
+            "mean_batch_size": (
+                self.segments_total / self.batches_total if self.batches_total else 0.0
+            ),
+            "batch_size_histogram": dict(sorted(self.batch_size_histogram.items())),
+            "queued": self._queue.qsize(),
+        }
+
+    def close(self):
+        """Stop collecting new batches (batches already running complete normally)."""
+        if self._collector_task is not None:
+            self._collector_task.cancel()
+            self._collector_task = None
+
+
+def _options_key(options: dict) -> tuple:
+    """Hashable form of a set of decoding options, used to group compatible segments."""
+    return tuple(
+        sorted(
+            (name, tuple(value) if isinstance(value, list) else value)
+            for name, value in options.items()
+        )
+    )
@@ -1,17 +1,49 @@
 import asyncio
+import collections
+import json
 import threading
 
 import pyperclip
 import websockets
 from pynput import keyboard
 
+from src.audio_codec import OpusEncoder, opus_available
 from src.audio_recorder import AudioRecorder
+from src.protocol import FORMAT_NAMES, FORMAT_OPUS, FORMAT_PCM_S16LE, Frame, encode_frame
 
 # Shared state
 transcription_history = []
 sequence_start_index = 0
 history_lock = threading.Lock()
 
+# Audio kept locally while the server withholds credits; older frames are dropped beyond it
+MAX_BACKLOG_SECONDS = 6.0
+# Audio per frame: one recorder chunk for PCM, one packet for Opus
+PCM_FRAME_SECONDS = 1024 / 16000
+OPUS_FRAME_SECONDS = 0.02
+
+
+class FlowState:
+    """Credits granted by the server and whether it asked us to pause."""
+
+    def __init__(self, frame_seconds=PCM_FRAME_SECONDS):
+        self.credits = 0
+        self.paused = False
+        self.backlog = collections.deque(maxlen=int(MAX_BACKLOG_SECONDS / frame_seconds))
+
+    def can_send(self) -> bool:
+        return self.credits > 0 and not self.paused
+
+    def handle(self, message: dict):
+        if message["type"] == "credit":
+            self.credits += message["credits"]
+        elif message["type"] == "pause":
+            self.paused = True
+        elif message["type"] == "resume":
+            self.paused = False
+        elif message["type"] == "drop":
+            print(f"\n[Server dropped frame {message['sequence']}]")
+
 
 def on_press(key):
     global sequence_start_index
@@ -58,15 +90,39 @@ async def send_audio_and_receive_transcriptions(uri):
             # For our current server, it accumulates based on seconds, not chunk_size.
             channels=1,
         )
+        # The server lists the frame formats it accepts; compress with Opus when both sides can
+        hello = json.loads(await websocket.recv())
+        encoder = None
+        if FORMAT_NAMES[FORMAT_OPUS] in hello["formats"] and opus_available():
+            encoder = OpusEncoder(sample_rate=16000)
+            print("Sending Opus-compressed audio.")
+        frame_format = FORMAT_OPUS if encoder else FORMAT_PCM_S16LE
+        flow = FlowState(OPUS_FRAME_SECONDS if encoder else PCM_FRAME_SECONDS)
+
         recorder.start_recording()
 
         try:
             # Task to send audio
             async def send_audio():
                 print("Sending audio... (Press Ctrl+C to stop)")
+                sequence = 0
                 for audio_chunk_int16 in recorder.get_audio_chunk():
-                    # Send raw bytes of the int16 numpy array
-                    await websocket.send(audio_chunk_int16.tobytes())
+                    if encoder:
+                        flow.backlog.extend(encoder.encode(audio_chunk_int16))
+                    else:
+                        flow.backlog.append(audio_chunk_int16.tobytes())
+                    # Only send what the server granted credits for, keep the rest for later
+                    while flow.backlog and flow.can_send():
+                        frame = Frame(
+                            sequence=sequence,
+                            payload=flow.backlog.popleft(),
+                            format=frame_format,
+                            sample_rate=16000,
+                            channels=1,
+                        )
+                        await websocket.send(encode_frame(frame))
+                        flow.credits -= 1
+                        sequence += 1
                     await asyncio.sleep(
                         0.01
                     )  # Small delay to prevent overwhelming the network/CPU
@@ -75,8 +131,14 @@ async def send_audio_and_receive_transcriptions(uri):
             async def receive_transcriptions():
                 print("Transcription:")
                 while True:
-                    transcription = await websocket.recv()
-                    text = transcription.strip()
+                    message = json.loads(await websocket.recv())
+                    if message["type"] == "error":
+                        print(f"\n[Server error]: {message['message']}")
+                        continue
+                    if message["type"] != "final":
+                        flow.handle(message)
+                        continue
+                    text = message["text"].strip()
                     if text:
                         with history_lock:
                             transcription_history.append(text)
@@ -98,7 +160,8 @@ async def send_audio_and_receive_transcriptions(uri):
 
 
 if __name__ == "__main__":
-    websocket_uri = "ws://127.0.0.1:8000/ws/asr"  # Assuming server is running locally
+    # Assuming server is running locally
+    websocket_uri = "ws://127.0.0.1:8000/ws/asr?protocol=framed"
     try:
         asyncio.run(send_audio_and_receive_transcriptions(websocket_uri))
     except KeyboardInterrupt:
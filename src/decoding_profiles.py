@@ -0,0 +1,72 @@
+from typing import Dict
+
+# Decoding options a profile may set (forwarded to `ASRService.transcribe_audio`)
+PROFILE_OPTIONS = (
+    "beam_size",
+    "best_of",
+    "temperature",
+    "condition_on_previous_text",
+    "vad_filter",
+)
+
+DEFAULT_PROFILES = {
+    # Greedy decoding, no temperature fallback and no internal VAD: highest throughput
+    "fast": {
+        "beam_size": 1,
+        "best_of": 1,
+        "temperature": [0.0],
+        "condition_on_previous_text": False,
+        "vad_filter": False,
+    },
+    # The previous fixed behaviour (the internal VAD follows the `vad_filter` setting)
+    "balanced": {
+        "beam_size": 5,
+        "best_of": 5,
+        "temperature": [0.0, 0.2, 0.4, 0.6, 0.8, 1.0],
+        "condition_on_previous_text": True,
+    },
+    # Wider beam and more samples on fallback
+    "accurate": {
+        "beam_size": 8,
+        "best_of": 8,
+        "temperature": [0.0, 0.2, 0.4, 0.6, 0.8, 1.0],
+        "condition_on_previous_text": True,
+        "vad_filter": True,
+    },
+}
+
+
+def load_profiles(
+    profiles_from_config: Dict[str, dict] = None, vad_filter=True
+) -> Dict[str, dict]:
+    """
+    Builds the decoding profiles clients can select.
+
+    Profiles from the configuration are merged over the built-in ones (a profile with a known
+    name only needs to list the options it changes). Profiles that do not set `vad_filter`
+    use the global `vad_filter` setting.
+
+    Raises:
+        ValueError: If a profile sets an unknown option.
+    """
+    profiles = {name: dict(options) for name, options in DEFAULT_PROFILES.items()}
+    for name, options in (profiles_from_config or {}).items():
+        unknown = set(options) - set(PROFILE_OPTIONS)
+        if unknown:
+            raise ValueError(
+                f"Decoding profile '{name}' has unknown options: {', '.join(sorted(unknown))}"
+            )
+        profiles.setdefault(name, {}).update(options)
+
+    for options in profiles.values():
+        options.setdefault("vad_filter", vad_filter)
+    return profiles
+
+
+def get_profile(profiles: Dict[str, dict], name: str) -> dict:
+    """Decoding options of a profile, raising ValueError for unknown names."""
+    if name not in profiles:
+        raise ValueError(
+            f"Unknown decoding profile '{name}'. Available: {', '.join(sorted(profiles))}"
+        )
+    return dict(profiles[name])
@@ -0,0 +1,328 @@
+import asyncio
+import collections
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+
+from src.resampler import PcmConverter
+from src.segmenter import remove_overlap, transcribe_chunked
+
+SAMPLE_RATE = 16000
+# Frames read from the file per block, the same size clients stream
+BLOCK_SIZE = 1024
+
+
+@dataclass
+class FileSegment:
+    start: float
+    end: float
+    audio: np.ndarray = field(repr=False)
+    overlaps_previous: bool = False
+
+
+def iter_audio_file_segments(source, processor) -> Iterator[FileSegment]:
+    """
+    Decodes a WAV/FLAC file block by block, converts it to 16 kHz mono (streaming resampler)
+    and cuts it into speech segments with the same `AudioProcessor` segmentation used for live
+    sessions. Segments are yielded as soon as they close, so only the audio of the segment in
+    progress is held; once exhausted, `processor.stream_time` is the duration of the file.
+
+    Args:
+        source: A path or a file-like object.
+        processor (AudioProcessor): A fresh processor used for this file only.
+    """
+
+    def collect(audio_segment):
+        if audio_segment is None:
+            return []
+        start, end = processor.last_segment_bounds
+        return [
+            FileSegment(
+                start=start / SAMPLE_RATE,
+                end=end / SAMPLE_RATE,
+                audio=audio_segment,
+                overlaps_previous=processor.last_segment_overlap > 0,
+            )
+        ]
+
+    with sf.SoundFile(source) as audio_file:
+        if audio_file.samplerate == SAMPLE_RATE:
+            converter = PcmConverter(SAMPLE_RATE, audio_file.channels, "int16")
+        else:
+            converter = PcmConverter(audio_file.samplerate, audio_file.channels, "float32")
+        # Blocks of the same duration as the chunks clients stream
+        blocksize = BLOCK_SIZE * audio_file.samplerate // SAMPLE_RATE
+
+        for block in audio_file.blocks(blocksize=blocksize, dtype=converter.dtype, always_2d=True):
+            yield from collect(processor.process(converter.convert(block.tobytes())))
+
+    tail = converter.flush()
+    if tail:
+        yield from collect(processor.process(tail))
+    yield from collect(processor.flush())
+
+
+def segment_audio_file(source, processor) -> Tuple[List[FileSegment], float]:
+    """
+    All the segments of a file at once (see `iter_audio_file_segments`).
+
+    Returns:
+        A tuple with the list of segments and the duration of the file in seconds.
+    """
+    segments = list(iter_audio_file_segments(source, processor))
+    return segments, processor.stream_time
+
+
+def resolve_input_path(input_dir: str, path: str) -> str:
+    """
+    Resolves a file requested by a client (relative to `input_dir`, or absolute) and makes sure
+    it lies inside `input_dir`, after following symlinks and `..` components.
+
+    Raises:
+        ValueError: If no input directory is configured or the path points outside of it.
+    """
+    if not input_dir:
+        raise ValueError("Server-side files are disabled (no input directory configured).")
+    root = os.path.realpath(input_dir)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"Path outside of the input directory: {path}")
+    return resolved
+
+
+@dataclass
+class TranscriptionJob:
+    id: str
+    status: str = "queued"  # queued, running, done, failed
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    segments_total: int = 0
+    segments_done: int = 0
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": {
+                "segments_done": self.segments_done,
+                "segments_total": self.segments_total,
+            },
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class FileTranscriber:
+    """
+    Offline transcription of audio files on the shared ASR stack.
+
+    Files are segmented like a live stream while they are read, up to `max_concurrency`
+    segments are transcribed concurrently through the transcriber of the selected model (so
+    the inference executor and batching apply), and the texts go through the text `Pipeline`
+    in order. Memory stays bounded whatever the file length. Long files can be processed as
+    background
+    jobs that are polled; finished jobs are kept for `job_ttl` seconds (at most
+    `max_finished_jobs` of them).
+    """
+
+    def __init__(
+        self,
+        models,
+        pipeline,
+        processor_factory,
+        language=None,
+        parallel_chunk_duration=30.0,
+        cut_search_duration=1.0,
+        cut_overlap_duration=0.2,
+        job_ttl=3600.0,
+        max_finished_jobs=100,
+        max_concurrency=4,
+    ):
+        """
+        Args:
+            models (ModelRegistry): Registry providing the model (with its `transcriber`) used
+                for each file.
+            pipeline (Pipeline): Text pipeline applied to every segment.
+            processor_factory: Callable returning a new `AudioProcessor`.
+            language (str, optional): Language passed to the ASR.
+            parallel_chunk_duration (float): Segments longer than this are split and decoded
+                in parallel.
+            cut_search_duration (float): Search window for quiet cut points when splitting.
+            cut_overlap_duration (float): Overlap kept around such cuts.
+            job_ttl (float): Seconds a finished job stays available for polling.
+            max_finished_jobs (int): Finished jobs kept at most, the oldest are evicted first.
+            max_concurrency (int): Segments of a file decoded at the same time (also the
+                number of segments read ahead).
+        """
+        self.models = models
+        self.pipeline = pipeline
+        self.processor_factory = processor_factory
+        self.language = language
+        self.parallel_chunk_duration = parallel_chunk_duration
+        self.cut_search_duration = cut_search_duration
+        self.cut_overlap_duration = cut_overlap_duration
+        self.job_ttl = job_ttl
+        self.max_finished_jobs = max_finished_jobs
+        self.max_concurrency = max(1, max_concurrency)
+
+        self.jobs = {}
+        self._job_tasks = set()
+
+    async def transcribe(
+        self,
+        source,
+        job: TranscriptionJob = None,
+        model: str = None,
+        decode_options: dict = None,
+    ) -> dict:
+        """
+        Transcribes a file (path or file-like object) with the given model (default if None)
+        and decoding options (e.g. a decoding profile; internal VAD only by default).
+
+        Returns:
+            dict: The full text, per-segment timestamps and texts, and timing information.
+        """
+        started = time.perf_counter()
+        model = self.models.resolve(model)
+        processor = self.processor_factory()
+        # Segments read ahead of the decodes; the reading thread waits while it is full
+        segments = asyncio.Queue(maxsize=self.max_concurrency)
+        stop = threading.Event()
+        reader = asyncio.ensure_future(
+            asyncio.to_thread(
+                self._read_segments, source, processor, segments, stop, asyncio.get_running_loop()
+            )
+        )
+
+        results = []
+        previous_text = ""
+        # Decodes in flight, oldest first: results are handled in file order
+        decoding = collections.deque()
+        try:
+            async with self.models.use(model) as asr_model:
+                while True:
+                    segment = await segments.get()
+                    if segment is not None:
+                        if job:
+                            job.segments_total += 1
+                        decode = self._transcribe_segment(
+                            asr_model.transcriber, segment, job, decode_options
+                        )
+                        decoding.append((segment, asyncio.ensure_future(decode)))
+                    while decoding and (segment is None or len(decoding) >= self.max_concurrency):
+                        done_segment, decode = decoding.popleft()
+                        raw_text = await decode
+                        if done_segment.overlaps_previous:
+                            raw_text = remove_overlap(previous_text, raw_text)
+                        previous_text = raw_text
+                        if raw_text:
+                            results.append(await self._finish_segment(done_segment, raw_text))
+                    if segment is None:
+                        break
+        finally:
+            stop.set()
+            for _, decode in decoding:
+                decode.cancel()
+            # Unblock the reading thread if it waits for room
+            while not segments.empty():
+                segments.get_nowait()
+        await reader
+        duration = processor.stream_time
+
+        processing_time = time.perf_counter() - started
+        return {
+            "duration": round(duration, 3),
+            "language": self.language,
+            "model": model,
+            "text": " ".join(r["text"] for r in results if r["text"]),
+            "segments": results,
+            "processing_time": round(processing_time, 3),
+            "realtime_factor": round(processing_time / duration, 4) if duration else None,
+        }
+
+    def _read_segments(self, source, processor, segments: asyncio.Queue, stop, loop):
+        """Reading thread: queues the segments of the file, then None (also on errors)."""
+        try:
+            for segment in iter_audio_file_segments(source, processor):
+                if stop.is_set():
+                    return
+                asyncio.run_coroutine_threadsafe(segments.put(segment), loop).result()
+        finally:
+            if not stop.is_set():
+                asyncio.run_coroutine_threadsafe(segments.put(None), loop).result()
+
+    async def _finish_segment(self, segment: FileSegment, raw_text: str) -> dict:
+        """Text pipeline of a transcribed segment, and its entry in the result."""
+        context = {"language": self.language}
+        text = await self.pipeline.run(raw_text, context)
+        return {
+            "start": round(segment.start, 3),
+            "end": round(segment.end, 3),
+            "text": text,
+            "raw_text": raw_text,
+        }
+
+    async def _transcribe_segment(
+        self, transcriber, segment: FileSegment, job, decode_options=None
+    ) -> str:
+        text = await transcribe_chunked(
+            transcriber,
+            segment.audio,
+            max_duration=self.parallel_chunk_duration,
+            search_duration=self.cut_search_duration,
+            overlap_duration=self.cut_overlap_duration,
+            **{"language": self.language, "vad_filter": True, **(decode_options or {})},
+        )
+        if job:
+            job.segments_done += 1
+        return text
+
+    def submit_job(
+        self, source, model: str = None, decode_options: dict = None
+    ) -> TranscriptionJob:
+        """Start transcribing a file in the background and return the job to poll."""
+        self._prune_jobs()
+        job = TranscriptionJob(id=uuid.uuid4().hex)
+        self.jobs[job.id] = job
+
+        task = asyncio.create_task(self._run_job(job, source, model, decode_options))
+        self._job_tasks.add(task)
+        task.add_done_callback(self._job_tasks.discard)
+        return job
+
+    async def _run_job(self, job: TranscriptionJob, source, model, decode_options):
+        job.status = "running"
+        try:
+            job.result = await self.transcribe(source, job, model, decode_options)
+            job.status = "done"
+        except Exception as e:
+            print(f"Transcription job {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+    def get_job(self, job_id: str) -> Optional[TranscriptionJob]:
+        self._prune_jobs()
+        return self.jobs.get(job_id)
+
+    def _prune_jobs(self):
+        """Evicts finished jobs older than `job_ttl`, then the oldest beyond `max_finished_jobs`."""
+        now = time.time()
+        finished = sorted(
+            (job for job in self.jobs.values() if job.finished_at is not None),
+            key=lambda job: job.finished_at,
+        )
+        expired = [job for job in finished if now - job.finished_at > self.job_ttl]
+        kept = finished[len(expired):]
+        expired += kept[: max(0, len(kept) - self.max_finished_jobs)]
+        for job in expired:
+            del self.jobs[job.id]
@@ -0,0 +1,87 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class InferenceExecutor:
+    """
+    Runs blocking ASR work off the event loop.
+
+    Jobs are submitted to a bounded pool of worker threads. CTranslate2 releases the GIL
+    while decoding, so threads give real parallelism as long as the underlying
+    `WhisperModel` was created with a matching `num_workers`.
+    The number of jobs that may be queued or running at once is capped by `max_queue_size`;
+    further callers wait for a free slot instead of piling up unbounded work.
+    """
+
+    def __init__(self, asr_service, num_workers=1, max_queue_size=32):
+        """
+        Args:
+            asr_service (ASRService): The service that performs the actual transcription.
+            num_workers (int): Number of worker threads running inference jobs.
+            max_queue_size (int): Maximum number of jobs queued or running at once.
+        """
+        self.asr_service = asr_service
+        self.num_workers = num_workers
+        self.max_queue_size = max(max_queue_size, num_workers)
+
+        self._pool = ThreadPoolExecutor(
+            max_workers=num_workers, thread_name_prefix="asr-worker"
+        )
+        self._slots = asyncio.Semaphore(self.max_queue_size)
+        self._pending = 0
+        self._running = 0
+        self._running_lock = threading.Lock()
+
+    async def submit(self, fn, *args, **kwargs):
+        """
+        Run `fn(*args, **kwargs)` on a worker thread and await its result.
+        Waits for a free queue slot first, so callers are throttled when the pool is saturated.
+        """
+        loop = asyncio.get_running_loop()
+        self._pending += 1
+        try:
+            async with self._slots:
+                future = loop.run_in_executor(
+                    self._pool, functools.partial(self._run_job, fn, *args, **kwargs)
+                )
+                return await future
+        finally:
+            self._pending -= 1
+
+    def _run_job(self, fn, *args, **kwargs):
+        with self._running_lock:
+            self._running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._running_lock:
+                self._running -= 1
+
+    async def transcribe(self, audio_segment: np.ndarray, **kwargs) -> str:
+        """Transcribe a segment on the worker pool. Accepts the same options as `ASRService`."""
+        return await self.submit(self.asr_service.transcribe_audio, audio_segment, **kwargs)
+
+    async def transcribe_detailed(self, audio_segment: np.ndarray, **kwargs):
+        """Like `transcribe`, returning a `TranscriptionResult` with segment metadata."""
+        return await self.submit(self.asr_service.transcribe_detailed, audio_segment, **kwargs)
+
+    async def detect_language(self, audio_segment: np.ndarray):
+        """Detect the language of a segment on the worker pool: (language, probability)."""
+        return await self.submit(self.asr_service.detect_language, audio_segment)
+
+    def stats(self) -> dict:
+        """Current load of the executor."""
+        return {
+            "workers": self.num_workers,
+            "max_queue_size": self.max_queue_size,
+            "pending": self._pending,
+            "running": self._running,
+        }
+
+    def shutdown(self, wait=True):
+        """Stop the worker threads."""
+        self._pool.shutdown(wait=wait)
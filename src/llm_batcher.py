@@ -0,0 +1,165 @@
+import asyncio
+import collections
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+
+@dataclass
+class _CorrectionJob:
+    text: str
+    on_delta: Optional[Callable]
+    future: asyncio.Future = field(repr=False)
+
+
+class CorrectionBatcher:
+    """
+    Groups the corrections requested by many sessions into fewer LLM requests.
+
+    The first text to arrive opens a collection window of `max_wait_ms`; every text received
+    before it closes (up to `max_batch_size`) forms a batch, and each result is routed back
+    to the caller that submitted it. In "prompt" mode a batch is corrected by a single request
+    holding all its texts (`LLMService.correct_batch`); when the answer cannot be split back
+    into one correction per text, the texts are corrected one by one. In "parallel" mode
+    every text gets its own request, sent together so a server with several slots (e.g.
+    `OLLAMA_NUM_PARALLEL`) runs them side by side. Either way, at most `max_concurrency`
+    requests are in flight at once, so a single LLM server is never flooded.
+    """
+
+    MODES = ("prompt", "parallel")
+
+    def __init__(
+        self, llm_service, mode="prompt", max_batch_size=8, max_wait_ms=50, max_concurrency=2
+    ):
+        """
+        Args:
+            llm_service (LLMService): Service sending the requests.
+            mode (str): "prompt" (one multi-item request per batch) or "parallel".
+            max_batch_size (int): Maximum number of texts corrected together.
+            max_wait_ms (float): How long to wait for more texts once one is pending.
+            max_concurrency (int): Maximum number of LLM requests in flight.
+
+        Raises:
+            ValueError: If the mode is unknown.
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown LLM batching mode '{mode}', expected one of {self.MODES}")
+        self.llm_service = llm_service
+        self.mode = mode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_concurrency = max_concurrency
+
+        self._queue = asyncio.Queue()
+        self._collector_task = None
+        self._batch_tasks = set()
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+        # Metrics
+        self.batches_total = 0
+        self.texts_total = 0
+        self.requests_total = 0
+        self.requests_in_flight = 0
+        self.split_failures = 0
+        self.batch_size_histogram = collections.Counter()
+
+    async def correct(self, text: str, on_delta=None) -> str:
+        """
+        Queue a text for the next batch and wait for its correction.
+
+        Returns:
+            str: The cleaned correction ("" if the LLM gave nothing usable).
+
+        Raises:
+            Exception: The error of the request that corrected the text.
+        """
+        if self._collector_task is None or self._collector_task.done():
+            self._collector_task = asyncio.create_task(self._collect_loop())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_CorrectionJob(text, on_delta, future))
+        return await future
+
+    async def _collect_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Correct in the background so the next window can start collecting right away
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, jobs):
+        self.batches_total += 1
+        self.texts_total += len(jobs)
+        self.batch_size_histogram[len(jobs)] += 1
+
+        if self.mode == "prompt" and len(jobs) > 1:
+            try:
+                async with self._slots:
+                    results = await self._request(
+                        self.llm_service.correct_batch, [job.text for job in jobs]
+                    )
+            except ValueError as e:
+                self.split_failures += 1
+                print(f"[LLM Batch] {e}, correcting the {len(jobs)} texts separately")
+            except Exception as e:
+                for job in jobs:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                return
+            else:
+                for job, result in zip(jobs, results):
+                    if not job.future.done():
+                        job.future.set_result(result)
+                return
+
+        await asyncio.gather(*(self._run_one(job) for job in jobs))
+
+    async def _run_one(self, job: _CorrectionJob):
+        try:
+            async with self._slots:
+                result = await self._request(self.llm_service.correct, job.text, job.on_delta)
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+            return
+        if not job.future.done():
+            job.future.set_result(result)
+
+    async def _request(self, method, *args):
+        self.requests_total += 1
+        self.requests_in_flight += 1
+        try:
+            return await method(*args)
+        finally:
+            self.requests_in_flight -= 1
+
+    def stats(self) -> dict:
+        """Achieved batching so far."""
+        return {
+            "mode": self.mode,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_concurrency": self.max_concurrency,
+            "batches": self.batches_total,
+            "texts": self.texts_total,
+            "requests": self.requests_total,
+            "requests_in_flight": self.requests_in_flight,
+            "split_failures": self.split_failures,
+            "mean_batch_size": (
+                self.texts_total / self.batches_total if self.batches_total else 0.0
+            ),
+            "batch_size_histogram": dict(sorted(self.batch_size_histogram.items())),
+            "queued": self._queue.qsize(),
+        }
@@ -1,3 +1,11 @@
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
 from openai import APIConnectionError, APITimeoutError, AsyncOpenAI
 
 # Default system prompt if none is provided
@@ -6,6 +14,354 @@ Your task is to fix grammar, punctuation, and capitalization.
 Do not change the meaning. Do not add conversational filler. 
 Return ONLY the corrected text."""
 
+# Appended to the system prompt of batched requests (see `LLMService.correct_batch`)
+BATCH_INSTRUCTIONS = """
+
+You will receive a JSON array of {count} independent transcriptions. Correct each one separately.
+CRITICAL: Answer with ONLY a JSON array of the {count} corrected texts, in the same order."""
+
+# Words that give away a header line such as "Voici le texte corrigé :"
+HEADER_KEYWORDS = ["correct", "output", "transcription", "résultat", "texte", "voici"]
+
+
+def is_header_line(line: str) -> bool:
+    """Whether a line is an LLM preamble (e.g. "Corrected text:") rather than the answer."""
+    line = line.strip().lower()
+    return line.endswith(":") and any(kw in line for kw in HEADER_KEYWORDS)
+
+
+def clean_llm_output(raw_content: str) -> str:
+    """
+    Extract the corrected text from a complete LLM answer: the content of the [[TEXT]] tags,
+    without header line or surrounding quotes. Returns "" if nothing is left.
+    """
+    raw_content = raw_content.strip()
+
+    # --- Robust Extraction ---
+    # Match [[TEXT]]content[[TEXT]] OR [[content]]
+    match = re.search(r"\[\[(?:TEXT)?\]\](.*?)\[\[(?:TEXT)?\]\]", raw_content, re.DOTALL)
+
+    if match:
+        cleaned_text = match.group(1).strip()
+    else:
+        # Fallback: Check if the whole string is wrapped in [[...]] without the TEXT label
+        if raw_content.startswith("[[") and raw_content.endswith("]]"):
+            cleaned_text = raw_content[2:-2].strip()
+        else:
+            cleaned_text = raw_content
+
+    # --- Manual Cleanup of LLM Headers (Safety Net) ---
+    lines = cleaned_text.split("\n")
+    if len(lines) > 1 and is_header_line(lines[0]):
+        cleaned_text = "\n".join(lines[1:]).strip()
+
+    # Remove leading/trailing quotes often added by LLMs
+    if cleaned_text.startswith('"') and cleaned_text.endswith('"'):
+        cleaned_text = cleaned_text[1:-1].strip()
+
+    # Final scrub of potential remaining brackets if the regex missed them
+    if cleaned_text.startswith("[[") and cleaned_text.endswith("]]"):
+        cleaned_text = cleaned_text[2:-2].strip()
+
+    return cleaned_text
+
+
+class TextStreamExtractor:
+    """
+    Incremental counterpart of `clean_llm_output` for a streamed answer.
+
+    A small state machine over the received tokens:
+    - "preamble": text before the answer, dropped up to the `[[TEXT]]` (or bare `[[`) opening
+      tag. Without a tag after `MAX_PREAMBLE` characters, the answer is taken as untagged.
+    - "header": the first line of the answer, held back until it is known not to be a header
+      such as "Corrected text:".
+    - "text": forwarded as it arrives, except trailing whitespace and what may be the start of
+      the closing tag, held back until the next tokens tell.
+    - "done": the closing tag was seen, the rest of the stream is ignored.
+
+    `clean_llm_output` of the whole answer stays the authoritative text (it also removes
+    surrounding quotes, which cannot be known before the end of the stream).
+    """
+
+    # Characters without opening tag after which the answer is taken as untagged
+    MAX_PREAMBLE = 80
+    # Longest first line that may still be a header
+    MAX_HEADER = 48
+
+    def __init__(self):
+        self.state = "preamble"
+        self._buffer = ""
+        self._closing_tag = "[["
+        self._emitted = False
+
+    def feed(self, token: str) -> str:
+        """Add the next streamed token; returns the text that can be forwarded now."""
+        self._buffer += token
+        return self._advance(final=False)
+
+    def finish(self) -> str:
+        """End of the stream; returns the text still held back."""
+        return self._advance(final=True)
+
+    def _advance(self, final: bool) -> str:
+        output = []
+        while True:
+            if self.state == "preamble":
+                progressed = self._skip_preamble(final)
+            elif self.state == "header":
+                progressed = self._skip_header(final)
+            elif self.state == "text":
+                output.append(self._take_text(final))
+                progressed = False
+            else:
+                self._buffer = ""
+                progressed = False
+            if not progressed:
+                return "".join(output)
+
+    def _skip_preamble(self, final: bool) -> bool:
+        start = self._buffer.find("[[")
+        if start < 0:
+            # A lone "[" may be the start of the opening tag
+            if not final and (
+                len(self._buffer) <= self.MAX_PREAMBLE or self._buffer.endswith("[")
+            ):
+                return False
+            self.state = "header"
+            return True
+
+        tag = self._buffer[start:]
+        match = re.match(r"\[\[(?:TEXT)?\]\]", tag)
+        if match:
+            self._buffer = tag[match.end() :]
+        elif not final and any(full.startswith(tag) for full in ("[[TEXT]]", "[[]]")):
+            return False
+        else:
+            # [[content]]
+            self._buffer = tag[2:]
+            self._closing_tag = "]]"
+        self.state = "header"
+        return True
+
+    def _skip_header(self, final: bool) -> bool:
+        self._buffer = self._buffer.lstrip()
+        newline = self._buffer.find("\n")
+        if newline >= 0:
+            if is_header_line(self._buffer[:newline]):
+                self._buffer = self._buffer[newline + 1 :]
+        elif (
+            not final
+            and self._closing_tag not in self._buffer
+            and len(self._buffer) <= self.MAX_HEADER
+        ):
+            return False
+        self.state = "text"
+        return True
+
+    def _take_text(self, final: bool) -> str:
+        if not self._emitted:
+            self._buffer = self._buffer.lstrip()
+
+        end = self._buffer.find(self._closing_tag)
+        if end >= 0:
+            text = self._buffer[:end].rstrip()
+            self._buffer = ""
+            self.state = "done"
+        elif final:
+            text = self._buffer.rstrip()
+            self._buffer = ""
+        else:
+            text = self._buffer.rstrip()
+            if text.endswith(self._closing_tag[0]):
+                text = text[:-1].rstrip()
+            self._buffer = self._buffer[len(text) :]
+
+        if text:
+            self._emitted = True
+        return text
+
+
+def normalize_text(text: str) -> str:
+    """Case and whitespace insensitive form of an input, so "Okay " and "okay" share a key."""
+    return " ".join(text.casefold().split())
+
+
+class CorrectionCache:
+    """
+    Corrections of recently seen inputs, so repeated short segments ("yes", "next line",
+    sign-offs...) skip the LLM round trip.
+
+    Entries are keyed by the normalized input, the model and a hash of the system prompt, so a
+    prompt or model change never serves stale corrections. The cache keeps the `max_entries`
+    most recently used entries, each for `ttl` seconds. With `path`, entries are also written
+    to a SQLite database and reloaded on restart.
+    """
+
+    def __init__(self, max_entries=1024, ttl=86400.0, path: Optional[str] = None):
+        """
+        Args:
+            max_entries (int): Entries kept; the least recently used are evicted beyond it.
+            ttl (float): Seconds an entry stays valid (0 for no expiry).
+            path (str, optional): SQLite file persisting the cache across restarts.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (corrected text, creation time), least recently used first
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS corrections "
+                "(key TEXT PRIMARY KEY, text TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._load()
+
+    @staticmethod
+    def key(text: str, model: str, system_prompt: str) -> str:
+        prompt_hash = hashlib.sha256(system_prompt.encode()).hexdigest()
+        return hashlib.sha256(
+            "\0".join((model, prompt_hash, normalize_text(text))).encode()
+        ).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """The cached correction, or None (counted as a miss)."""
+        entry = self._entries.get(key)
+        if entry is not None and self._expired(entry):
+            self._remove(key)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: str, text: str):
+        created = time.time()
+        self._entries[key] = (text, created)
+        self._entries.move_to_end(key)
+        if self._db:
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO corrections VALUES (?, ?, ?)", (key, text, created)
+                )
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "persistent": self._db is not None,
+        }
+
+    def close(self):
+        if self._db:
+            self._db.close()
+            self._db = None
+
+    def _expired(self, entry) -> bool:
+        return self.ttl > 0 and time.time() - entry[1] > self.ttl
+
+    def _remove(self, key: str):
+        del self._entries[key]
+        if self._db:
+            with self._db:
+                self._db.execute("DELETE FROM corrections WHERE key = ?", (key,))
+
+    def _load(self):
+        """Reload the most recent valid entries of the database (oldest first, as in LRU order)."""
+        with self._db:
+            if self.ttl > 0:
+                self._db.execute(
+                    "DELETE FROM corrections WHERE created < ?", (time.time() - self.ttl,)
+                )
+            rows = self._db.execute(
+                "SELECT key, text, created FROM corrections ORDER BY created DESC LIMIT ?",
+                (self.max_entries,),
+            ).fetchall()
+        for key, text, created in reversed(rows):
+            self._entries[key] = (text, created)
+        print(f"Loaded {len(rows)} cached LLM corrections")
+
+
+class CircuitBreaker:
+    """
+    Stops calling an LLM that keeps timing out.
+
+    After `failure_threshold` consecutive failures the breaker opens: calls are skipped for
+    `cooldown` seconds. Then a single trial call is let through; the breaker closes if it
+    succeeds and opens for another cool-down if it fails.
+    """
+
+    def __init__(self, failure_threshold=3, cooldown=30.0):
+        """
+        Args:
+            failure_threshold (int): Consecutive failures opening the breaker.
+            cooldown (float): Seconds calls are skipped once it opened.
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.trips = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._trial or time.monotonic() - self._opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go through now (claims the trial call once the cool-down ended)."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    def release(self):
+        """Give back the trial call without an outcome (the call was abandoned)."""
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial or self.failures >= self.failure_threshold:
+            if self._opened_at is None or self._trial:
+                self.trips += 1
+            self._opened_at = time.monotonic()
+            self._trial = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "trips": self.trips}
+
 
 class LLMService:
     def __init__(
@@ -15,92 +371,188 @@ class LLMService:
         model="llama3",
         system_prompt=None,
         enabled=False,
+        streaming=False,
+        cache: Optional[CorrectionCache] = None,
+        timeout=None,
     ):
         self.enabled = enabled
         self.model = model
         self.system_prompt = system_prompt or DEFAULT_SYSTEM_PROMPT
+        # Consume the answer as a token stream and forward the corrected text as it arrives
+        self.streaming = streaming
+        # Corrections of inputs seen before (None disables caching)
+        self.cache = cache
+        # Optional `CorrectionBatcher` grouping the requests of concurrent sessions
+        self.batcher = None
 
         if self.enabled:
             print(f"Initializing LLM Service connected to: {base_url} (Model: {model})")
-            self.client = AsyncOpenAI(base_url=base_url, api_key=api_key)
+            # timeout (seconds) bounds every request, None keeps the client's default
+            client_options = {"timeout": timeout} if timeout else {}
+            self.client = AsyncOpenAI(base_url=base_url, api_key=api_key, **client_options)
         else:
             self.client = None
 
-    async def process_text(self, text: str) -> str:
+    def stats(self) -> dict:
+        return {
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "batching": self.batcher.stats() if self.batcher is not None else None,
+        }
+
+    def _messages(self, text: str):
+        return [
+            {
+                "role": "system",
+                "content": self.system_prompt
+                + "\n\nCRITICAL: Wrap your final answer in [[TEXT]] tags. Example: [[TEXT]]Your cleaned transcription here[[TEXT]]",
+            },
+            {"role": "user", "content": f"Input text to correct:\n{text}"},
+        ]
+
+    async def process_text(self, text: str, on_delta=None, on_error=None) -> str:
         """
         Send text to LLM for post-processing.
+
+        Args:
+            text (str): Text to correct.
+            on_delta (Callable[[str], Awaitable], optional): In streaming mode, awaited with
+                each piece of corrected text as soon as it is received.
+            on_error (Callable[[Exception], None], optional): Called with the error when the
+                LLM request fails and the original text is returned instead.
+
         Returns the processed text, or the original text if LLM fails or is disabled.
+        Pieces already forwarded to `on_delta` are a preview: the returned text is authoritative.
         """
         if not self.enabled or not text or not text.strip():
             return text
 
-        try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": self.system_prompt
-                        + "\n\nCRITICAL: Wrap your final answer in [[TEXT]] tags. Example: [[TEXT]]Your cleaned transcription here[[TEXT]]",
-                    },
-                    {"role": "user", "content": f"Input text to correct:\n{text}"},
-                ],
-                temperature=0.1,  # Minimal temperature
-                max_tokens=1024,
-            )
-
-            raw_content = response.choices[0].message.content.strip()
-
-            # --- Robust Extraction ---
-            # Try to find content between [[TEXT]] tags or just [[ ]]
-            import re
+        cached = self.cached_correction(text)
+        if cached is not None:
+            if self.streaming and on_delta is not None:
+                await on_delta(cached)
+            return cached
+        return await self.request_correction(text, on_delta, on_error)
 
-            # Match [[TEXT]]content[[TEXT]] OR [[content]]
-            match = re.search(
-                r"\[\[(?:TEXT)?\]\](.*?)\[\[(?:TEXT)?\]\]", raw_content, re.DOTALL
-            )
+    def cached_correction(self, text: str) -> Optional[str]:
+        """The cached correction of `text`, or None if it is not cached (or caching is off)."""
+        if self.cache is None:
+            return None
+        return self.cache.get(CorrectionCache.key(text, self.model, self.system_prompt))
 
-            if match:
-                cleaned_text = match.group(1).strip()
+    async def request_correction(self, text: str, on_delta=None, on_error=None) -> str:
+        """
+        Like `process_text`, without the cache lookup: always asks the LLM, caches the
+        correction and falls back to the original text if the request fails.
+        """
+        try:
+            if self.batcher is not None:
+                cleaned_text = await self.batcher.correct(text, on_delta)
             else:
-                # Fallback: Check if the whole string is wrapped in [[...]] without the TEXT label
-                if raw_content.startswith("[[") and raw_content.endswith("]]"):
-                    cleaned_text = raw_content[2:-2].strip()
-                else:
-                    cleaned_text = raw_content
-
-            # --- Manual Cleanup of LLM Headers (Safety Net) ---
-            lines = cleaned_text.split("\n")
-            if len(lines) > 1 and lines[0].strip().endswith(":"):
-                potential_header = lines[0].strip().lower()
-                headers_keywords = [
-                    "correct",
-                    "output",
-                    "transcription",
-                    "résultat",
-                    "texte",
-                    "voici",
-                ]
-                if any(kw in potential_header for kw in headers_keywords):
-                    cleaned_text = "\n".join(lines[1:]).strip()
-
-            # Remove leading/trailing quotes often added by LLMs
-            if cleaned_text.startswith('"') and cleaned_text.endswith('"'):
-                cleaned_text = cleaned_text[1:-1].strip()
-
-            # Final scrub of potential remaining brackets if the regex missed them
-            if cleaned_text.startswith("[[") and cleaned_text.endswith("]]"):
-                cleaned_text = cleaned_text[2:-2].strip()
+                cleaned_text = await self.correct(text, on_delta)
 
             # Sanity check: if LLM returns empty string for non-empty input, fallback
             if not cleaned_text:
                 return text
 
+            # Only actual corrections are cached, never fallbacks
+            if self.cache is not None:
+                self.cache.put(
+                    CorrectionCache.key(text, self.model, self.system_prompt), cleaned_text
+                )
             return cleaned_text
 
         except (APIConnectionError, APITimeoutError) as e:
             print(f"[LLM Error] Connection failed: {e}")
+            if on_error is not None:
+                on_error(e)
             return text  # Fallback to original
         except Exception as e:
             print(f"[LLM Error] Unexpected error: {e}")
+            if on_error is not None:
+                on_error(e)
             return text  # Fallback to original
+
+    async def correct(self, text: str, on_delta=None) -> str:
+        """
+        One request correcting `text`, without cache nor fallback.
+
+        Returns:
+            str: The cleaned correction ("" if the LLM gave nothing usable).
+        """
+        if self.streaming:
+            raw_content = await self._stream_completion(text, on_delta)
+        else:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=self._messages(text),
+                temperature=0.1,  # Minimal temperature
+                max_tokens=1024,
+            )
+            raw_content = response.choices[0].message.content
+        return clean_llm_output(raw_content or "")
+
+    async def correct_batch(self, texts: List[str]) -> List[str]:
+        """
+        One request correcting several independent texts, sent as a JSON array.
+
+        Returns:
+            List[str]: The cleaned correction of every text, in order ("" where unusable).
+
+        Raises:
+            ValueError: If the answer is not an array with one correction per text.
+        """
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": self.system_prompt + BATCH_INSTRUCTIONS.format(count=len(texts)),
+                },
+                {
+                    "role": "user",
+                    "content": "Input texts to correct:\n" + json.dumps(texts, ensure_ascii=False),
+                },
+            ],
+            temperature=0.1,
+            max_tokens=1024 * len(texts),
+        )
+        content = response.choices[0].message.content or ""
+        # The array may come after a header line or inside [[TEXT]] tags: try every "["
+        decoder = json.JSONDecoder()
+        for start in (match.start() for match in re.finditer(r"\[", content)):
+            try:
+                items, _ = decoder.raw_decode(content, start)
+            except json.JSONDecodeError:
+                continue
+            if (
+                isinstance(items, list)
+                and len(items) == len(texts)
+                and all(isinstance(item, str) for item in items)
+            ):
+                return [clean_llm_output(item) for item in items]
+        raise ValueError(f"Batched answer does not hold {len(texts)} corrections")
+
+    async def _stream_completion(self, text: str, on_delta=None) -> str:
+        """Stream the answer, forwarding its extracted text; returns the complete raw answer."""
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(text),
+            temperature=0.1,
+            max_tokens=1024,
+            stream=True,
+        )
+        extractor = TextStreamExtractor()
+        parts = []
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content or ""
+            parts.append(token)
+            delta = extractor.feed(token)
+            if delta and on_delta is not None:
+                await on_delta(delta)
+
+        delta = extractor.finish()
+        if delta and on_delta is not None:
+            await on_delta(delta)
+        return "".join(parts)
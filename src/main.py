@@ -26,17 +26,44 @@ def fix_library_paths():
             "NVIDIA libraries not found in python environment. proceeding without adding paths."
         )
 
-fix_library_paths()
 
+import asyncio
+import contextlib
+import functools
+import io
 import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+
+from src.audio_codec import FrameDecoder, supported_formats
+from src.audio_processor import AudioProcessor, create_vad_backend, get_silero_model
+from src.batch_scheduler import BatchScheduler
+from src.decoding_profiles import get_profile, load_profiles
+from src.file_transcriber import FileTranscriber, resolve_input_path
+from src.inference_executor import InferenceExecutor
+from src.model_registry import ModelRegistry, ModelStack
+from src.pipeline import Pipeline
+from src.protocol import END_OF_STREAM, VERSION, FlowController, ProtocolError, decode_frame
+from src.resampler import PcmConverter
+from src.segmenter import remove_overlap, transcribe_chunked
+from src.session_context import SessionContext
+from src.streaming import StreamingDecoder
+from src.vad_scheduler import VadScheduler
 
-import torch
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 
-from src.asr_service import ASRService
-from src.audio_processor import AudioProcessor
-from src.pipeline import Pipeline
-from src.steps.llm_step import LLMCorrectionStep
+def detect_device() -> str:
+    """Returns "cuda" if CTranslate2 sees a GPU and "cpu" otherwise, without importing torch."""
+    import ctranslate2
+
+    try:
+        return "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+    except RuntimeError:
+        return "cpu"
 
 
 # --- Configuration Loading ---
@@ -50,35 +77,242 @@ def get_config():
 
     # 2. Get config from environment variables
     model_size_env = os.environ.get("MODEL_SIZE")
+    available_models_env = os.environ.get("AVAILABLE_MODELS")
+    model_memory_budget_mb_env = os.environ.get("MODEL_MEMORY_BUDGET_MB")
+    warmup_durations_env = os.environ.get("WARMUP_DURATIONS")
     language_env = os.environ.get("LANGUAGE")
-    vad_filter_env = os.environ.get("VAD_FILTER", "true")
+    vad_filter_env = os.environ.get("VAD_FILTER")
+    default_profile_env = os.environ.get("DEFAULT_PROFILE")
+    context_words_env = os.environ.get("CONTEXT_WORDS")
+    max_pending_frames_env = os.environ.get("MAX_PENDING_FRAMES")
+    decode_workers_env = os.environ.get("DECODE_WORKERS")
+    stage_queue_size_env = os.environ.get("STAGE_QUEUE_SIZE")
     device_env = os.environ.get("DEVICE")
     compute_type_gpu_env = os.environ.get("COMPUTE_TYPE_GPU")
     compute_type_cpu_env = os.environ.get("COMPUTE_TYPE_CPU")
+    asr_workers_env = os.environ.get("ASR_WORKERS")
+    asr_queue_size_env = os.environ.get("ASR_QUEUE_SIZE")
+    batching_enabled_env = os.environ.get("BATCHING_ENABLED")
+    batch_max_size_env = os.environ.get("BATCH_MAX_SIZE")
+    batch_max_wait_ms_env = os.environ.get("BATCH_MAX_WAIT_MS")
+    partial_interval_env = os.environ.get("PARTIAL_INTERVAL")
+    vad_backend_env = os.environ.get("VAD_BACKEND")
+    silence_threshold_env = os.environ.get("SILENCE_THRESHOLD")
+    vad_speech_threshold_env = os.environ.get("VAD_SPEECH_THRESHOLD")
+    vad_batching_env = os.environ.get("VAD_BATCHING")
+    vad_tick_ms_env = os.environ.get("VAD_TICK_MS")
+    max_segment_duration_env = os.environ.get("MAX_SEGMENT_DURATION")
+    cut_search_duration_env = os.environ.get("CUT_SEARCH_DURATION")
+    cut_overlap_duration_env = os.environ.get("CUT_OVERLAP_DURATION")
+    parallel_chunk_duration_env = os.environ.get("PARALLEL_CHUNK_DURATION")
+    input_dir_env = os.environ.get("INPUT_DIR")
+    job_ttl_env = os.environ.get("JOB_TTL")
+    max_finished_jobs_env = os.environ.get("MAX_FINISHED_JOBS")
+    file_max_concurrency_env = os.environ.get("FILE_MAX_CONCURRENCY")
+    max_upload_mb_env = os.environ.get("MAX_UPLOAD_MB")
 
     # LLM Config
     llm_enabled_env = os.environ.get("LLM_ENABLED", "false")
     llm_url_env = os.environ.get("LLM_URL")
     llm_model_env = os.environ.get("LLM_MODEL")
+    llm_streaming_env = os.environ.get("LLM_STREAMING")
+    llm_cache_size_env = os.environ.get("LLM_CACHE_SIZE")
+    llm_cache_ttl_env = os.environ.get("LLM_CACHE_TTL")
+    llm_cache_path_env = os.environ.get("LLM_CACHE_PATH")
+    llm_timeout_env = os.environ.get("LLM_TIMEOUT")
+    llm_budget_ms_env = os.environ.get("LLM_BUDGET_MS")
+    llm_late_replace_env = os.environ.get("LLM_LATE_REPLACE")
+    llm_breaker_failures_env = os.environ.get("LLM_BREAKER_FAILURES")
+    llm_breaker_cooldown_env = os.environ.get("LLM_BREAKER_COOLDOWN")
+    llm_batching_env = os.environ.get("LLM_BATCHING")
+    llm_batch_mode_env = os.environ.get("LLM_BATCH_MODE")
+    llm_batch_max_size_env = os.environ.get("LLM_BATCH_MAX_SIZE")
+    llm_batch_max_wait_ms_env = os.environ.get("LLM_BATCH_MAX_WAIT_MS")
+    llm_max_concurrency_env = os.environ.get("LLM_MAX_CONCURRENCY")
 
     # 3. Determine final config
     config = {
         "model_size": model_size_env or config_from_file.get("model_size", "small"),
+        # Other models clients may select per session (?model=), loaded on first use
+        "available_models": (
+            [m.strip() for m in available_models_env.split(",") if m.strip()]
+            if available_models_env
+            else config_from_file.get("available_models", [])
+        ),
+        # Memory the loaded models may use (0: no limit)
+        "model_memory_budget_mb": float(
+            model_memory_budget_mb_env or config_from_file.get("model_memory_budget_mb", 4096)
+        ),
+        # Seconds of synthetic audio decoded after loading a model, one decode per value
+        "warmup_durations": (
+            [float(d) for d in warmup_durations_env.split(",") if d.strip()]
+            if warmup_durations_env is not None
+            else config_from_file.get("warmup_durations", [2.0, 10.0])
+        ),
         "language": language_env or config_from_file.get("language", "en"),
-        "vad_filter": vad_filter_env.lower() == "true",
+        "vad_filter": (
+            vad_filter_env.lower() == "true"
+            if vad_filter_env
+            else config_from_file.get("vad_filter", True)
+        ),
+        # Audio frames a session may have received but not processed yet (flow control)
+        "max_pending_frames": int(
+            max_pending_frames_env or config_from_file.get("max_pending_frames", 64)
+        ),
+        # Items each session stage (segments, texts, outgoing messages) may queue for the next
+        "stage_queue_size": int(
+            stage_queue_size_env or config_from_file.get("stage_queue_size", 4)
+        ),
+        # Threads decoding compressed (Opus) audio frames for all sessions
+        "decode_workers": int(decode_workers_env or config_from_file.get("decode_workers", 2)),
+        # Previous words of the session given to the decoder as prompt (0 disables)
+        "context_words": int(context_words_env or config_from_file.get("context_words", 32)),
+        # Decoding profile used when a client does not pick one (?profile=)
+        "default_profile": (
+            default_profile_env or config_from_file.get("default_profile", "balanced")
+        ),
         "device": device_env or config_from_file.get("device", "auto"),
         "compute_type_gpu": compute_type_gpu_env or config_from_file.get("compute_type_gpu", "float16"),
         "compute_type_cpu": compute_type_cpu_env or config_from_file.get("compute_type_cpu", "int8"),
+        # Inference executor
+        "asr_workers": int(asr_workers_env or config_from_file.get("asr_workers", 1)),
+        "asr_queue_size": int(asr_queue_size_env or config_from_file.get("asr_queue_size", 32)),
+        # Cross-session batching
+        "batching_enabled": (
+            batching_enabled_env.lower() == "true"
+            if batching_enabled_env
+            else config_from_file.get("batching_enabled", False)
+        ),
+        "batch_max_size": int(batch_max_size_env or config_from_file.get("batch_max_size", 8)),
+        "batch_max_wait_ms": float(
+            batch_max_wait_ms_env or config_from_file.get("batch_max_wait_ms", 30)
+        ),
+        # Segmentation VAD: "rms" (energy), "adaptive" (noise floor) or "silero" (neural)
+        "vad_backend": vad_backend_env or config_from_file.get("vad_backend", "rms"),
+        "silence_threshold": float(
+            silence_threshold_env or config_from_file.get("silence_threshold", 200)
+        ),
+        "vad_speech_threshold": float(
+            vad_speech_threshold_env or config_from_file.get("vad_speech_threshold", 0.5)
+        ),
+        # Score the chunks of all sessions together, once per tick
+        "vad_batching": (
+            vad_batching_env.lower() == "true"
+            if vad_batching_env
+            else config_from_file.get("vad_batching", True)
+        ),
+        "vad_tick_ms": float(vad_tick_ms_env or config_from_file.get("vad_tick_ms", 0)),
+        # Long segments: cut at the quietest point near the limit, with a small overlap
+        "max_segment_duration": float(
+            max_segment_duration_env or config_from_file.get("max_segment_duration", 10)
+        ),
+        "cut_search_duration": float(
+            cut_search_duration_env or config_from_file.get("cut_search_duration", 1.0)
+        ),
+        "cut_overlap_duration": float(
+            cut_overlap_duration_env or config_from_file.get("cut_overlap_duration", 0.2)
+        ),
+        # Segments longer than this are split and decoded in parallel (0: never split;
+        # unset: see below)
+        "parallel_chunk_duration": (
+            float(parallel_chunk_duration_env)
+            if parallel_chunk_duration_env
+            else config_from_file.get("parallel_chunk_duration")
+        ),
+        # Directory whose files POST /v1/transcribe?path= may read (empty: ?path= disabled)
+        "input_dir": (
+            input_dir_env if input_dir_env is not None else config_from_file.get("input_dir", "")
+        ),
+        # Finished transcription jobs are kept this many seconds, and at most this many
+        "job_ttl": float(job_ttl_env or config_from_file.get("job_ttl", 3600)),
+        "max_finished_jobs": int(
+            max_finished_jobs_env or config_from_file.get("max_finished_jobs", 100)
+        ),
+        # Segments of a file decoded at the same time (and read ahead)
+        "file_max_concurrency": int(
+            file_max_concurrency_env or config_from_file.get("file_max_concurrency", 4)
+        ),
+        # Largest file accepted as a request body
+        "max_upload_mb": float(max_upload_mb_env or config_from_file.get("max_upload_mb", 200)),
+        # Streaming mode: seconds of new audio between two partial decodes
+        "partial_interval": float(
+            partial_interval_env or config_from_file.get("partial_interval", 1.0)
+        ),
         # LLM Defaults
         "llm_enabled": llm_enabled_env.lower() == "true",
         "llm_url": llm_url_env or config_from_file.get("llm_url", "http://localhost:11434/v1"),
         "llm_model": llm_model_env or config_from_file.get("llm_model", "llama3"),
         "llm_api_key": os.environ.get("LLM_API_KEY", "ollama"),
+        # Stream the LLM answer and forward the correction to JSON clients as it arrives
+        "llm_streaming": (
+            llm_streaming_env.lower() == "true"
+            if llm_streaming_env
+            else config_from_file.get("llm_streaming", False)
+        ),
+        # Corrections of repeated inputs are served from a cache (0 disables it)
+        "llm_cache_size": int(llm_cache_size_env or config_from_file.get("llm_cache_size", 1024)),
+        "llm_cache_ttl": float(llm_cache_ttl_env or config_from_file.get("llm_cache_ttl", 86400)),
+        # SQLite file keeping the cache across restarts (empty: memory only)
+        "llm_cache_path": (
+            llm_cache_path_env
+            if llm_cache_path_env is not None
+            else config_from_file.get("llm_cache_path", "")
+        ),
+        # Seconds before an LLM request is abandoned
+        "llm_timeout": float(llm_timeout_env or config_from_file.get("llm_timeout", 30)),
+        # Time a segment may wait for its correction before the raw text is sent (0: no limit)
+        "llm_budget_ms": float(llm_budget_ms_env or config_from_file.get("llm_budget_ms", 0)),
+        # Corrections arriving after the budget are sent to JSON clients as `replace` messages
+        "llm_late_replace": (
+            llm_late_replace_env.lower() == "true"
+            if llm_late_replace_env
+            else config_from_file.get("llm_late_replace", True)
+        ),
+        # Overruns or failed requests in a row after which the LLM is skipped for a cool-down (s)
+        "llm_breaker_failures": int(
+            llm_breaker_failures_env or config_from_file.get("llm_breaker_failures", 3)
+        ),
+        "llm_breaker_cooldown": float(
+            llm_breaker_cooldown_env or config_from_file.get("llm_breaker_cooldown", 30)
+        ),
+        # Group the corrections of concurrent sessions into fewer LLM requests
+        "llm_batching": (
+            llm_batching_env.lower() == "true"
+            if llm_batching_env
+            else config_from_file.get("llm_batching", False)
+        ),
+        # "prompt": one multi-item request per batch, "parallel": concurrent single requests
+        "llm_batch_mode": llm_batch_mode_env or config_from_file.get("llm_batch_mode", "prompt"),
+        "llm_batch_max_size": int(
+            llm_batch_max_size_env or config_from_file.get("llm_batch_max_size", 8)
+        ),
+        "llm_batch_max_wait_ms": float(
+            llm_batch_max_wait_ms_env or config_from_file.get("llm_batch_max_wait_ms", 50)
+        ),
+        "llm_max_concurrency": int(
+            llm_max_concurrency_env or config_from_file.get("llm_max_concurrency", 2)
+        ),
     }
 
+    # Splitting only pays off when the chunks of a segment are decoded concurrently (several
+    # inference workers or batching); on a single worker it only adds a decode per segment
+    if config["parallel_chunk_duration"] is None:
+        concurrent = config["asr_workers"] > 1 or config["batching_enabled"]
+        config["parallel_chunk_duration"] = 6.0 if concurrent else 0.0
+
+    # "auto": detect the language once per session
+    if config["language"] in ("", "auto"):
+        config["language"] = None
+
+    # Named decoding profiles (beam size, best_of, temperature fallback, internal VAD...)
+    config["decoding_profiles"] = load_profiles(
+        config_from_file.get("decoding_profiles"), vad_filter=config["vad_filter"]
+    )
+    get_profile(config["decoding_profiles"], config["default_profile"])
+
     # 4. Auto-detect device
     if config["device"] == "auto":
-        config["device"] = "cuda" if torch.cuda.is_available() else "cpu"
+        config["device"] = detect_device()
 
     # 5. Select compute type
     config["compute_type"] = (
@@ -91,74 +325,655 @@ def get_config():
 
 config = get_config()
 
-# --- FastAPI App ---
-app = FastAPI()
-
-# Initialize ASR Service
-print(f"Initializing ASR service with model: {config['model_size']}")
-print(f"Using device: {config['device']} ({config['compute_type']})")
-print(f"Internal VAD filter enabled: {config['vad_filter']}")
-asr_service = ASRService(
-    model_size=config["model_size"],
-    device=config["device"],
-    compute_type=config["compute_type"],
+
+def load_model_stack(model_size: str) -> ModelStack:
+    """Load a Whisper model with its own inference executor (and batch scheduler)."""
+    # Imported here: faster-whisper and CTranslate2 are only needed once a model loads
+    from src.asr_service import ASRService
+
+    asr_service = ASRService(
+        model_size=model_size,
+        device=config["device"],
+        compute_type=config["compute_type"],
+        num_workers=config["asr_workers"],
+        warmup_durations=config["warmup_durations"],
+        warmup_batched=config["batching_enabled"],
+    )
+
+    # Inference runs on a dedicated worker pool so a long decode never blocks the event loop
+    print(
+        f"Inference executor for '{model_size}': {config['asr_workers']} worker(s), "
+        f"queue size {config['asr_queue_size']}"
+    )
+    inference_executor = InferenceExecutor(
+        asr_service,
+        num_workers=config["asr_workers"],
+        max_queue_size=config["asr_queue_size"],
+    )
+
+    # Optionally group segments from concurrent sessions into batched decodes
+    if config["batching_enabled"]:
+        print(
+            f"Batching enabled: up to {config['batch_max_size']} segments "
+            f"within {config['batch_max_wait_ms']} ms"
+        )
+        transcriber = BatchScheduler(
+            asr_service,
+            inference_executor,
+            max_batch_size=config["batch_max_size"],
+            max_wait_ms=config["batch_max_wait_ms"],
+        )
+    else:
+        transcriber = inference_executor
+
+    return ModelStack(asr_service, inference_executor, transcriber)
+
+
+# Models are loaded on first use and idle ones are unloaded beyond the memory budget
+model_registry = ModelRegistry(
+    load_model_stack,
+    default_model=config["model_size"],
+    available_models=config["available_models"],
+    memory_budget_mb=config["model_memory_budget_mb"],
 )
 
+# Compressed audio frames are decoded off the event loop, on threads shared by all sessions
+decode_pool = ThreadPoolExecutor(
+    max_workers=config["decode_workers"], thread_name_prefix="audio-decode"
+)
+
+# Segmentation VAD (shared neural model is loaded at startup, state is per session)
+vad_scheduler = VadScheduler(tick_ms=config["vad_tick_ms"]) if config["vad_batching"] else None
+
+
+def create_audio_processor() -> AudioProcessor:
+    """Audio stream processor (segmentation) for one session or file."""
+    return AudioProcessor(
+        sample_rate=16000,
+        silence_threshold=config["silence_threshold"],
+        silence_pause_duration=1.0,
+        max_accumulate_duration=config["max_segment_duration"],
+        vad_backend=create_vad_backend(
+            config["vad_backend"],
+            silence_threshold=config["silence_threshold"],
+            speech_threshold=config["vad_speech_threshold"],
+        ),
+        cut_search_duration=config["cut_search_duration"],
+        cut_overlap_duration=config["cut_overlap_duration"],
+    )
+
+
 # --- Initialize Pipeline ---
-# 1. Create Pipeline
+# 1. Create Pipeline (its steps are added at startup, see `setup_pipeline`)
 text_pipeline = Pipeline()
 
-# 2. Add Standard Steps (LLM)
-# We wrap the LLM logic in a standard ProcessingStep
-llm_step = LLMCorrectionStep(config)
-text_pipeline.add_step(llm_step)
 
-# 3. Load Dynamic Plugins
-# Developers can drop .py files in the 'plugins/' directory
-print("Loading external plugins from 'plugins/'...")
-text_pipeline.load_plugins_from_folder("plugins")
+def setup_pipeline():
+    # 2. Add Standard Steps (LLM)
+    # We wrap the LLM logic in a standard ProcessingStep
+    from src.steps.llm_step import LLMCorrectionStep
+
+    llm_step = LLMCorrectionStep(config)
+    text_pipeline.add_step(llm_step)
+
+    # 3. Load Dynamic Plugins
+    # Developers can drop .py files in the 'plugins/' directory
+    print("Loading external plugins from 'plugins/'...")
+    text_pipeline.load_plugins_from_folder("plugins")
+
+
+# Offline transcription of files, on the same ASR stack and pipeline
+file_transcriber = FileTranscriber(
+    model_registry,
+    text_pipeline,
+    create_audio_processor,
+    language=config["language"],
+    parallel_chunk_duration=config["parallel_chunk_duration"],
+    cut_search_duration=config["cut_search_duration"],
+    cut_overlap_duration=config["cut_overlap_duration"],
+    job_ttl=config["job_ttl"],
+    max_finished_jobs=config["max_finished_jobs"],
+    max_concurrency=config["file_max_concurrency"],
+)
+
+# Startup progress, reported by /readyz
+startup_state = {"status": "starting", "error": None, "startup_time_s": None}
+
+
+def load_models():
+    """Blocking startup work: load and warm up the default model (and the neural VAD)."""
+    started = time.perf_counter()
+    print(f"Initializing ASR service with model: {config['model_size']}")
+    print(f"Using device: {config['device']} ({config['compute_type']})")
+    print(f"Internal VAD filter enabled: {config['vad_filter']}")
+    if config["device"] == "cuda":
+        fix_library_paths()
+
+    # The default model is loaded (and warmed up) before the server reports ready
+    model_registry.load()
+
+    print(f"Segmentation VAD backend: {config['vad_backend']}")
+    if config["vad_backend"] == "silero":
+        get_silero_model()
+    return time.perf_counter() - started
+
+
+async def startup():
+    startup_state["status"] = "loading"
+    try:
+        startup_state["startup_time_s"] = round(await asyncio.to_thread(load_models), 3)
+    except Exception as e:
+        print(f"Startup failed: {e}")
+        startup_state["status"] = "failed"
+        startup_state["error"] = str(e)
+        return
+    startup_state["status"] = "ready"
+    print(f"Server ready in {startup_state['startup_time_s']}s.")
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The server accepts connections right away; models load in the background
+    setup_pipeline()
+    startup_task = asyncio.create_task(startup())
+    yield
+    startup_task.cancel()
+    model_registry.close()
+
+
+# --- FastAPI App ---
+app = FastAPI(lifespan=lifespan)
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: 200 while the process is healthy, 503 if startup failed."""
+    status_code = 503 if startup_state["status"] == "failed" else 200
+    return JSONResponse(status_code=status_code, content={"status": startup_state["status"]})
+
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness: 200 once the default model is loaded and warmed up, 503 before that (or if
+    loading failed), so load balancers only route traffic to warm instances.
+    """
+    status_code = 200 if startup_state["status"] == "ready" else 503
+    return JSONResponse(status_code=status_code, content=startup_state)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Runtime metrics of the inference stack."""
+    return {
+        "models": model_registry.stats(),
+        "vad": vad_scheduler.stats() if vad_scheduler else None,
+        "pipeline": {
+            step.name: step.stats() for step in text_pipeline.steps if hasattr(step, "stats")
+        },
+    }
+
+
+async def read_upload(request: Request, max_bytes: int) -> bytes:
+    """Request body, refused with 413 beyond `max_bytes` (checked while it is received)."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"File larger than {max_bytes} bytes.")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"File larger than {max_bytes} bytes.")
+    return bytes(body)
+
+
+@app.post("/v1/transcribe")
+async def transcribe_file(
+    request: Request,
+    path: str = None,
+    job: bool = False,
+    model: str = None,
+    profile: str = None,
+):
+    """
+    Transcribe a WAV or FLAC file sent as the request body, or a file on the server (?path=,
+    only inside the configured input directory).
+    With ?job=true the file is processed in the background; poll GET /v1/jobs/{job_id}.
+    ?model= selects the Whisper model and ?profile= the decoding profile (defaults otherwise).
+    """
+    try:
+        model = model_registry.resolve(model)
+        decode_options = get_profile(
+            config["decoding_profiles"], profile or config["default_profile"]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if path:
+        try:
+            source = resolve_input_path(config["input_dir"], path)
+        except ValueError as e:
+            raise HTTPException(status_code=403, detail=str(e))
+        if not os.path.isfile(source):
+            raise HTTPException(status_code=404, detail=f"File not found: {path}")
+    else:
+        body = await read_upload(request, int(config["max_upload_mb"] * 1024 * 1024))
+        if not body:
+            raise HTTPException(status_code=400, detail="Send a WAV/FLAC body or a ?path=.")
+        source = io.BytesIO(body)
+
+    if job:
+        transcription_job = file_transcriber.submit_job(
+            source, model=model, decode_options=decode_options
+        )
+        return JSONResponse(status_code=202, content=transcription_job.to_dict())
+
+    try:
+        return await file_transcriber.transcribe(
+            source, model=model, decode_options=decode_options
+        )
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/v1/jobs/{job_id}")
+async def get_transcription_job(job_id: str):
+    """Status, progress and (once done) result of a background transcription job."""
+    transcription_job = file_transcriber.get_job(job_id)
+    if transcription_job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return transcription_job.to_dict()
+
+
+# State of the connected sessions, by session id
+active_sessions = {}
+
+
+@app.get("/sessions")
+async def sessions():
+    """
+    Per-session model, decoding profile, decoder context (language, prompt) and segmentation
+    state (VAD state, noise floor and thresholds).
+    """
+    return {
+        session_id: {
+            "model": session["model"],
+            "profile": session["profile"],
+            "context": session["context"].stats(),
+            "flow": session["flow"].stats(),
+            # Items waiting in front of each stage (audio pending is in `flow`)
+            "stages": {
+                name: {"depth": queue.qsize(), "max": queue.maxsize}
+                for name, queue in session.get("stages", {}).items()
+            },
+            **session["processor"].stats(),
+        }
+        for session_id, session in active_sessions.items()
+    }
+
+
+def build_final_message(
+    final_text: str, raw_text: str, result, segment_bounds, stage_times: dict
+) -> dict:
+    """
+    `final` message of the detailed protocol. Timestamps are seconds since the start of the
+    stream; `timings` are in milliseconds per stage (VAD/segmentation, ASR, text pipeline).
+    """
+    start, end = (bound / 16000 for bound in segment_bounds)
+    details = result.shifted(start).to_dict()
+    timings = {f"{stage}_ms": round(seconds * 1000.0, 1) for stage, seconds in stage_times.items()}
+    timings["total_ms"] = round(sum(stage_times.values()) * 1000.0, 1)
+    return {
+        "type": "final",
+        "text": final_text,
+        "raw_text": raw_text,
+        "language": details["language"],
+        "language_probability": details["language_probability"],
+        "start": round(start, 3),
+        "end": round(end, 3),
+        "segments": details["segments"],
+        "timings": timings,
+    }
+
 
 @app.websocket("/ws/asr")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     print("WebSocket connected.")
 
-    # Initialize the Audio Stream Processor
-    processor = AudioProcessor(
-        sample_rate=16000,
-        silence_threshold=200,
-        silence_pause_duration=1.0,
-        max_accumulate_duration=10,
+    # Streaming mode (?stream=true): send JSON `partial` messages while speaking,
+    # then a `final` message once the segment closes.
+    streaming = websocket.query_params.get("stream", "false").lower() in ("1", "true")
+    # Detailed results (?detail=true): JSON `final` messages carrying segment and word
+    # timestamps, confidences, the raw ASR text and per-stage timings.
+    detailed = websocket.query_params.get("detail", "false").lower() in ("1", "true")
+    # Framed protocol (?protocol=framed): versioned binary frames with sequence numbers and
+    # credit-based flow control; every server message is JSON (see src/protocol.py).
+    framed = websocket.query_params.get("protocol", "raw").lower() == "framed"
+
+    # Model selection (?model=tiny): loaded on first use, held for the whole session.
+    # Decoding profile (?profile=fast): beam size, temperature fallback, internal VAD...
+    try:
+        model_name = model_registry.resolve(websocket.query_params.get("model"))
+        profile_name = websocket.query_params.get("profile") or config["default_profile"]
+        decode_options = get_profile(config["decoding_profiles"], profile_name)
+        # Raw audio format (?sample_rate=48000&channels=2&dtype=float32), converted to the
+        # 16 kHz mono int16 the segmentation expects. Framed sessions declare it per frame.
+        pcm_converter = PcmConverter(
+            sample_rate=int(websocket.query_params.get("sample_rate", 16000)),
+            channels=int(websocket.query_params.get("channels", 1)),
+            dtype=websocket.query_params.get("dtype", "int16"),
+        )
+    except ValueError as e:
+        print(f"WebSocket rejected: {e}")
+        await websocket.close(code=1008, reason=str(e))
+        return
+
+    # Decoder context: previous words as prompt, cached language and client vocabulary
+    # (?vocabulary=Kubernetes,FastAPI)
+    vocabulary = websocket.query_params.get("vocabulary")
+    session_context = SessionContext(
+        language=config["language"],
+        max_prompt_words=config["context_words"],
+        vocabulary=vocabulary.split(",") if vocabulary else None,
     )
 
-    try:
+    # Initialize the Audio Stream Processor
+    processor = create_audio_processor()
+    # Audio received but not processed yet: bounded, the client is slowed down beyond it
+    flow = FlowController(max_pending=config["max_pending_frames"])
+    frame_decoder = FrameDecoder(decode_pool)
+    session_id = uuid.uuid4().hex[:8]
+    # Stages of the session, each a task, connected by bounded queues so they overlap:
+    # receive -> segment (VAD) -> transcribe (ASR) -> correct (text pipeline) -> send.
+    # Every stage handles its items in order, which keeps the output order strict; a full
+    # queue blocks the stage before it, down to the flow control of the received audio.
+    stage_queues = {
+        name: asyncio.Queue(maxsize=config["stage_queue_size"])
+        for name in ("segments", "texts", "outgoing")
+    }
+    segments_queue, texts_queue, outgoing_queue = stage_queues.values()
+    # Segments closed so far: JSON messages (partial, correction, final, replace) carry the
+    # index of the segment they belong to
+    segments_closed = 0
+    # LLM corrections that missed the latency budget, delivered as `replace` messages
+    late_corrections = set()
+
+    async def receive_audio():
+        """Receive audio as fast as it arrives, so flow control reacts while we decode."""
+        try:
+            if framed:
+                # Lets the client pick a format (Opus when both sides support it)
+                await websocket.send_json(
+                    {"type": "hello", "version": VERSION, "formats": supported_formats()}
+                )
+                for message in flow.initial_messages():
+                    await websocket.send_json(message)
+            while True:
+                message = await websocket.receive_bytes()
+                if not framed:
+                    # No credits: wait for room, which stops reading (backpressure)
+                    await flow.put(pcm_converter.convert(message))
+                    continue
+
+                frame = decode_frame(message)
+                messages = flow.offer(await frame_decoder.decode(frame), frame.sequence)
+                if any(m["type"] == "drop" for m in messages) and flow.frames_dropped % 100 == 1:
+                    print(f"Session {session_id} sends beyond its credits: dropping audio.")
+                if frame.end_of_stream:
+                    tail = frame_decoder.flush()
+                    if tail:
+                        messages += flow.offer(tail)
+                    messages += flow.offer(END_OF_STREAM)
+                for control_message in messages:
+                    await websocket.send_json(control_message)
+        except ProtocolError as e:
+            print(f"Session {session_id} protocol error: {e}")
+            await websocket.send_json({"type": "error", "message": str(e)})
+            await websocket.close(code=1003, reason=str(e))
+            raise
+        finally:
+            flow.close()
+
+    async def segment_audio():
+        """VAD and segmentation of the received chunks; sends partials in streaming mode."""
+        nonlocal segments_closed
+        # Time spent on VAD and segmentation since the last segment closed
+        segmentation_time = 0.0
         while True:
-            # 1. Receive raw audio bytes
-            data = await websocket.receive_bytes()
-
-            # 2. Process audio chunk (VAD logic)
-            audio_segment = processor.process(data)
-
-            # 3. If we have a complete segment, run the pipeline
-            if audio_segment is not None:
-                # --- Pipeline Step A: ASR (Source) ---
-                transcription = asr_service.transcribe_audio(
-                    audio_segment, language=config["language"], vad_filter=True
+            # Next received chunk (raw int16 audio bytes)
+            data, control_messages = await flow.take()
+            if data is FlowController.CLOSED:
+                await segments_queue.put(None)
+                return
+            if framed:
+                for control_message in control_messages:
+                    await websocket.send_json(control_message)
+            if not data:
+                # Nothing decoded yet (codec or resampler priming)
+                continue
+
+            chunk_started = time.perf_counter()
+            if data is END_OF_STREAM:
+                # The client stopped sending: close the segment in progress
+                audio_segment = processor.flush()
+            else:
+                chunk_is_silent = None
+                if vad_scheduler:
+                    # Scored together with the chunks of every other session
+                    chunk_is_silent = await vad_scheduler.is_silent(
+                        processor.vad, np.frombuffer(data, dtype=np.int16)
+                    )
+                audio_segment = processor.process(data, chunk_is_silent=chunk_is_silent)
+            segmentation_time += time.perf_counter() - chunk_started
+
+            if audio_segment is None:
+                # Streaming mode: re-decode the segment in progress, even while the previous
+                # segments are still transcribed or corrected (their finals may come after,
+                # the `segment` index tells them apart)
+                if streaming:
+                    partial = await decoder.partial(processor.peek_segment())
+                    if partial:
+                        await outgoing_queue.put({**partial, "segment": segments_closed})
+                continue
+
+            await segments_queue.put(
+                {
+                    "index": segments_closed,
+                    "audio": audio_segment,
+                    "bounds": processor.last_segment_bounds,
+                    "overlap": processor.last_segment_overlap,
+                    "committed": decoder.close_segment() if streaming else None,
+                    "timings": {"vad": segmentation_time},
+                }
+            )
+            segmentation_time = 0.0
+            segments_closed += 1
+
+    async def transcribe_segments():
+        """ASR of the closed segments, one at a time (each one is prompted with the last)."""
+        previous_transcription = ""
+        while (segment := await segments_queue.get()) is not None:
+            # Awaited on the inference executor so other sessions keep streaming meanwhile
+            asr_started = time.perf_counter()
+            audio_segment = segment["audio"]
+            language = session_context.language
+            if language is None:
+                # Detected until one segment is confident, then cached for the session
+                language = session_context.observe_language(
+                    *await transcriber.detect_language(audio_segment)
+                )
+            segment_options = {**decode_options, **session_context.decode_options(language)}
+            if detailed:
+                segment_options["word_timestamps"] = True
+
+            if streaming:
+                result = await decoder.final(
+                    audio_segment,
+                    detailed=detailed,
+                    committed=segment["committed"],
+                    **segment_options,
+                )
+            else:
+                result = await transcribe_chunked(
+                    transcriber,
+                    audio_segment,
+                    max_duration=config["parallel_chunk_duration"],
+                    search_duration=config["cut_search_duration"],
+                    overlap_duration=config["cut_overlap_duration"],
+                    detailed=detailed,
+                    **segment_options,
+                )
+            segment["timings"]["asr"] = time.perf_counter() - asr_started
+            transcription = result.text if detailed else result
+
+            # Segments cut while speaking overlap the previous one: drop repeated words
+            if segment["overlap"]:
+                transcription = remove_overlap(previous_transcription, transcription)
+            previous_transcription = transcription
+            session_context.commit(transcription)
+            if streaming:
+                decoder.decode_options.update(session_context.decode_options())
+
+            segment.update(result=result, raw_text=transcription, language=language)
+            await texts_queue.put(segment)
+        await texts_queue.put(None)
+
+    async def forward_correction(delta: str, segment_index: int):
+        """Forward a piece of LLM correction to the client before the segment's final."""
+        await outgoing_queue.put({"type": "correction", "segment": segment_index, "delta": delta})
+
+    async def replace_late_correction(correction, step_name, segment_index, raw_text, language):
+        """
+        Send a correction that missed the latency budget once it arrives, after the steps
+        following the one that produced it (plugins), like the final it replaces.
+        """
+        corrected = await correction
+        if not corrected or corrected == raw_text:
+            return
+        corrected = await text_pipeline.run(corrected, {"language": language}, after=step_name)
+        if corrected:
+            await outgoing_queue.put(
+                {"type": "replace", "segment": segment_index, "text": corrected}
+            )
+
+    def watch_late_correction(
+        correction, step_name: str, segment_index: int, raw_text: str, language: str
+    ):
+        task = asyncio.create_task(
+            replace_late_correction(correction, step_name, segment_index, raw_text, language)
+        )
+        late_corrections.add(task)
+        task.add_done_callback(late_corrections.discard)
+
+    async def correct_texts():
+        """Text pipeline (LLM correction, plugins) and formatting of the final messages."""
+        while (segment := await texts_queue.get()) is not None:
+            transcription = segment["raw_text"]
+            final_text = None
+            if transcription:
+                # Pass the text through the chain of plugins (LLM -> Custom -> ...)
+                context = {"language": segment["language"]}
+                if streaming or framed or detailed:
+                    context["on_delta"] = functools.partial(
+                        forward_correction, segment_index=segment["index"]
+                    )
+                    context["on_late_correction"] = functools.partial(
+                        watch_late_correction,
+                        segment_index=segment["index"],
+                        raw_text=transcription,
+                        language=segment["language"],
+                    )
+                pipeline_started = time.perf_counter()
+                final_text = await text_pipeline.run(transcription, context)
+                segment["timings"]["pipeline"] = time.perf_counter() - pipeline_started
+
+            if not final_text:
+                continue
+            if detailed:
+                message = build_final_message(
+                    final_text,
+                    transcription,
+                    segment["result"],
+                    segment["bounds"],
+                    segment["timings"],
                 )
+                message["segment"] = segment["index"]
+            elif streaming or framed:
+                message = {"type": "final", "segment": segment["index"], "text": final_text}
+            else:
+                message = final_text
+            await outgoing_queue.put(message)
+        if late_corrections:
+            await asyncio.wait(set(late_corrections))
+        await outgoing_queue.put(None)
+
+    async def send_results():
+        """Send partials and finals in the order they were produced."""
+        while (message := await outgoing_queue.get()) is not None:
+            if isinstance(message, str):
+                print(f" [Sent]: {message}")
+                await websocket.send_text(message)
+            else:
+                if message["type"] == "final":
+                    print(f" [Sent]: {message['text']}")
+                await websocket.send_json(message)
 
-                # --- Pipeline Step B: Processing Pipeline ---
-                if transcription:
-                    # Pass the text through the chain of plugins (LLM -> Custom -> ...)
-                    context = {"language": config["language"]}
-                    final_text = await text_pipeline.run(transcription, context)
+    try:
+        asr_model = await model_registry.acquire(model_name)
+    except Exception as e:
+        # e.g. a download error: the model stays unused, nothing to release
+        print(f"Session {session_id}: model '{model_name}' failed to load: {e}")
+        with contextlib.suppress(Exception):
+            await websocket.close(code=1011, reason=f"Model '{model_name}' failed to load.")
+        return
+
+    stages = []
+    try:
+        transcriber = asr_model.transcriber
+        decoder = (
+            StreamingDecoder(
+                transcriber,
+                partial_interval=config["partial_interval"],
+                **decode_options,
+                **session_context.decode_options(),
+            )
+            if streaming
+            else None
+        )
+        active_sessions[session_id] = {
+            "model": model_name,
+            "profile": profile_name,
+            "context": session_context,
+            "processor": processor,
+            "flow": flow,
+            "stages": stage_queues,
+        }
+        stages = [
+            asyncio.create_task(stage())
+            for stage in (
+                receive_audio,
+                segment_audio,
+                transcribe_segments,
+                correct_texts,
+                send_results,
+            )
+        ]
 
-                    if final_text:
-                        print(f" [Sent]: {final_text}")
-                        await websocket.send_text(final_text)
+        # The session ends when a stage fails, including the disconnect seen by the receiver
+        done, _ = await asyncio.wait(stages, return_when=asyncio.FIRST_EXCEPTION)
+        for stage in done:
+            stage.result()
 
     except WebSocketDisconnect:
         print("WebSocket disconnected.")
     except Exception as e:
         print(f"WebSocket error: {e}")
+        with contextlib.suppress(Exception):
+            await websocket.close(code=1011)
     finally:
+        for task in [*stages, *late_corrections]:
+            task.cancel()
+        active_sessions.pop(session_id, None)
+        model_registry.release(model_name)
         print("WebSocket connection closed.")
@@ -0,0 +1,231 @@
+import asyncio
+import contextlib
+import resource
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+
+def current_rss_bytes() -> int:
+    """Resident memory of this process (falls back to the peak RSS where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Memory the loaded models may use by default, enough for a few small/medium models
+DEFAULT_MEMORY_BUDGET_MB = 4096
+
+
+@dataclass
+class ModelStack:
+    """One loaded Whisper model with the executor (and batch scheduler) that serve it."""
+
+    service: object
+    executor: object
+    transcriber: object
+
+    def stats(self) -> dict:
+        return {
+            "warmup_time_s": round(self.service.warmup_time, 3) if self.service else None,
+            "executor": self.executor.stats() if self.executor else None,
+            "batching": (
+                self.transcriber.stats() if self.transcriber is not self.executor else None
+            ),
+        }
+
+    def close(self):
+        if self.transcriber is not self.executor:
+            self.transcriber.close()
+        if self.executor:
+            self.executor.shutdown(wait=False)
+
+
+@dataclass
+class _ModelEntry:
+    name: str
+    model: object = None
+    users: int = 0
+    last_used: float = 0.0
+    load_time: float = 0.0
+    rss_bytes: int = 0
+    loads: int = 0
+    evictions: int = 0
+
+
+class ModelRegistry:
+    """
+    Lazily loaded set of ASR models, selectable per session.
+
+    A model is loaded the first time a session asks for it and is kept while sessions use it.
+    When the estimated memory of the loaded models exceeds `memory_budget_mb`, the least
+    recently used models that no session holds are unloaded. The size of a model is measured
+    as the growth of the process RSS while loading it.
+
+    Only the default model is served unless more are listed in `available_models`.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], object],
+        default_model: str,
+        available_models: Optional[List[str]] = None,
+        memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB,
+    ):
+        """
+        Args:
+            loader: Callable building a model (e.g. a `ModelStack`) from its name. Blocking;
+                it runs on a worker thread. Models exposing `close()` get it called on eviction.
+            default_model (str): Model used when a session does not ask for one.
+            available_models (List[str], optional): Other model names clients may select
+                (opt-in). By default, only `default_model` is available.
+            memory_budget_mb (float): Memory the loaded models may use; 0 means no limit.
+        """
+        self.loader = loader
+        self.default_model = default_model
+        self.available_models = [default_model] + [
+            name for name in available_models or [] if name != default_model
+        ]
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+
+        self._entries: Dict[str, _ModelEntry] = {}
+        # Guards the entries; loading itself happens under a per-model lock
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def resolve(self, name: Optional[str]) -> str:
+        """Name of the model to use for a request, raising ValueError for unknown models."""
+        name = name or self.default_model
+        if name not in self.available_models:
+            raise ValueError(
+                f"Unknown model '{name}'. Available: {', '.join(self.available_models)}"
+            )
+        return name
+
+    def load(self, name: str = None):
+        """Load a model if needed and return it (blocking). Does not mark it as in use."""
+        name = self.resolve(name)
+        with self._lock:
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                entry = self._entries.setdefault(name, _ModelEntry(name))
+                if entry.model is not None:
+                    return entry.model
+                self._evict(keep=name, incoming=entry.rss_bytes)
+
+            print(f"Model registry: loading '{name}'...")
+            rss_before = current_rss_bytes()
+            started = time.perf_counter()
+            model = self.loader(name)
+            load_time = time.perf_counter() - started
+            rss_bytes = max(current_rss_bytes() - rss_before, 0)
+            print(
+                f"Model registry: '{name}' loaded in {load_time:.2f}s "
+                f"(+{rss_bytes / 1024 / 1024:.0f} MB resident)"
+            )
+
+            with self._lock:
+                entry.model = model
+                entry.load_time = load_time
+                entry.rss_bytes = rss_bytes
+                entry.loads += 1
+                entry.last_used = time.monotonic()
+                self._evict(keep=name)
+            return model
+
+    def _evict(self, keep: str, incoming: int = 0):
+        """Unload idle models, least recently used first, until the budget fits. Holds _lock."""
+        if not self.memory_budget:
+            return
+
+        loaded = [e for e in self._entries.values() if e.model is not None]
+        used = sum(e.rss_bytes for e in loaded) + incoming
+        idle = sorted(
+            (e for e in loaded if e.users == 0 and e.name != keep), key=lambda e: e.last_used
+        )
+        for entry in idle:
+            if used <= self.memory_budget:
+                break
+            print(f"Model registry: evicting idle model '{entry.name}'")
+            model, entry.model = entry.model, None
+            entry.evictions += 1
+            used -= entry.rss_bytes
+            if hasattr(model, "close"):
+                model.close()
+
+        if used > self.memory_budget:
+            print(
+                f"Model registry: {used / 1024 / 1024:.0f} MB loaded exceeds the budget of "
+                f"{self.memory_budget / 1024 / 1024:.0f} MB (remaining models are in use)"
+            )
+
+    async def acquire(self, name: str = None):
+        """Load the model off the event loop if needed and hold it until `release`."""
+        name = self.resolve(name)
+        while True:
+            model = await asyncio.to_thread(self.load, name)
+            with self._lock:
+                entry = self._entries[name]
+                # It may have been evicted again between loading and here
+                if entry.model is model:
+                    entry.users += 1
+                    entry.last_used = time.monotonic()
+                    return model
+
+    def release(self, name: str = None):
+        """Mark one user of the model as gone; idle models become candidates for eviction."""
+        name = self.resolve(name)
+        with self._lock:
+            entry = self._entries[name]
+            entry.users = max(entry.users - 1, 0)
+            entry.last_used = time.monotonic()
+
+    @contextlib.asynccontextmanager
+    async def use(self, name: str = None):
+        """`async with registry.use(name) as model:` holds the model for the block."""
+        model = await self.acquire(name)
+        try:
+            yield model
+        finally:
+            self.release(name)
+
+    def close(self):
+        """Unload every model (at shutdown)."""
+        with self._lock:
+            for entry in self._entries.values():
+                model, entry.model = entry.model, None
+                if hasattr(model, "close"):
+                    model.close()
+
+    def stats(self) -> dict:
+        """Load time, resident size and usage of every model loaded so far."""
+        with self._lock:
+            entries = list(self._entries.values())
+        models = {}
+        for entry in entries:
+            details = entry.model.stats() if hasattr(entry.model, "stats") else None
+            models[entry.name] = {
+                "loaded": entry.model is not None,
+                "sessions": entry.users,
+                "load_time_s": round(entry.load_time, 3),
+                "rss_mb": round(entry.rss_bytes / 1024 / 1024, 1),
+                "loads": entry.loads,
+                "evictions": entry.evictions,
+                **(details or {}),
+            }
+        return {
+            "default_model": self.default_model,
+            "memory_budget_mb": self.memory_budget / 1024 / 1024 if self.memory_budget else None,
+            "loaded_rss_mb": round(
+                sum(e.rss_bytes for e in entries if e.model is not None) / 1024 / 1024, 1
+            ),
+            "models": models,
+        }
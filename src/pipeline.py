@@ -16,15 +16,22 @@ class Pipeline:
         print(f"Pipeline: Added step '{step.name}'")
         self.steps.append(step)
 
-    async def run(self, text: str, context: Dict[str, Any] = None) -> str:
+    async def run(self, text: str, context: Dict[str, Any] = None, after: str = None) -> str:
         """
         Pass the text through all registered steps in order.
+        With `after`, only the steps following the step of that name run (e.g. on a late result
+        of that step).
         """
         if context is None:
             context = {}
 
+        steps = self.steps
+        if after is not None:
+            names = [step.name for step in self.steps]
+            steps = self.steps[names.index(after) + 1 :] if after in names else []
+
         current_text = text
-        for step in self.steps:
+        for step in steps:
             try:
                 # Pass data to the step
                 current_text = await step.process(current_text, context)
@@ -0,0 +1,224 @@
+import asyncio
+import struct
+from dataclasses import dataclass
+from typing import List, Optional
+
+# --- Binary audio frames ---
+#
+# Every WebSocket binary message of a framed session (?protocol=framed) is one frame:
+#
+#   offset  size  field
+#   0       2     magic b"AF"
+#   2       1     version (1)
+#   3       1     sample format (FORMAT_*)
+#   4       1     channels
+#   5       1     flags (FLAG_*)
+#   6       4     sample rate (Hz)
+#   10      4     sequence number (starts at 0, +1 per frame)
+#   14      ...   payload (interleaved PCM samples, or one Opus packet)
+#
+# All integers are little-endian.
+
+MAGIC = b"AF"
+VERSION = 1
+HEADER = struct.Struct("<2sBBBBII")
+
+FORMAT_PCM_S16LE = 0
+FORMAT_PCM_F32LE = 1
+# Raw Opus packets (no Ogg container). Frames of every format are turned into 16 kHz mono
+# int16 PCM by `src.audio_codec.FrameDecoder`
+FORMAT_OPUS = 2
+FORMAT_NAMES = {FORMAT_PCM_S16LE: "pcm_s16le", FORMAT_PCM_F32LE: "pcm_f32le", FORMAT_OPUS: "opus"}
+# Bytes per sample and sample type of the PCM formats
+SAMPLE_SIZES = {FORMAT_PCM_S16LE: 2, FORMAT_PCM_F32LE: 4}
+SAMPLE_TYPES = {FORMAT_PCM_S16LE: "int16", FORMAT_PCM_F32LE: "float32"}
+
+# The client will not send more audio; the segment in progress should be closed
+FLAG_END_OF_STREAM = 0x01
+
+# Marker queued after the last frame of a stream
+END_OF_STREAM = object()
+
+
+class ProtocolError(ValueError):
+    """A frame that cannot be decoded or is not supported."""
+
+
+@dataclass
+class Frame:
+    sequence: int
+    payload: bytes
+    format: int = FORMAT_PCM_S16LE
+    sample_rate: int = 16000
+    channels: int = 1
+    flags: int = 0
+
+    @property
+    def end_of_stream(self) -> bool:
+        return bool(self.flags & FLAG_END_OF_STREAM)
+
+
+def encode_frame(frame: Frame) -> bytes:
+    return (
+        HEADER.pack(
+            MAGIC,
+            VERSION,
+            frame.format,
+            frame.channels,
+            frame.flags,
+            frame.sample_rate,
+            frame.sequence,
+        )
+        + frame.payload
+    )
+
+
+def decode_frame(message: bytes) -> Frame:
+    """
+    Parses a binary frame.
+
+    Raises:
+        ProtocolError: If the header is malformed, the version or format is unknown, or the
+            payload does not hold a whole number of samples.
+    """
+    if len(message) < HEADER.size:
+        raise ProtocolError(f"Frame too short ({len(message)} bytes)")
+    magic, version, sample_format, channels, flags, sample_rate, sequence = HEADER.unpack_from(
+        message
+    )
+    if magic != MAGIC:
+        raise ProtocolError("Bad frame magic")
+    if version != VERSION:
+        raise ProtocolError(f"Unsupported frame version {version} (expected {VERSION})")
+    if sample_format not in FORMAT_NAMES:
+        raise ProtocolError(f"Unsupported sample format {sample_format}")
+    if channels < 1:
+        raise ProtocolError("Frame declares no channel")
+
+    payload = message[HEADER.size :]
+    sample_size = SAMPLE_SIZES.get(sample_format)
+    if sample_size and len(payload) % (sample_size * channels):
+        raise ProtocolError("Payload does not hold a whole number of samples")
+    return Frame(sequence, payload, sample_format, sample_rate, channels, flags)
+
+
+# --- Flow control ---
+
+
+class FlowController:
+    """
+    Bounded queue of the audio a session received but has not processed yet, with
+    credit-based flow control.
+
+    The client may only send as many frames as it holds credits. It gets `max_pending`
+    credits when the session opens, and the server grants more as frames are processed, so a
+    well-behaved client never has more than `max_pending` frames in flight. When the queue
+    fills up anyway (inference falls behind), the server asks the client to `pause` and, once
+    it has drained, to `resume`. Frames of such credit-aware clients arriving while the queue
+    is full are dropped and reported with a `drop` message, so memory stays bounded in every
+    case. Clients that do not negotiate credits (raw PCM) use `put` instead, which waits for
+    room rather than dropping their audio.
+
+    Methods return the control messages (dicts) to send to the client.
+    """
+
+    # Queued by `close()` once the receiving side is gone
+    CLOSED = object()
+
+    def __init__(self, max_pending=64, pause_ratio=0.75, resume_ratio=0.25):
+        """
+        Args:
+            max_pending (int): Maximum number of frames waiting to be processed.
+            pause_ratio (float): Queue fill ratio from which the client is asked to pause.
+            resume_ratio (float): Queue fill ratio under which the client may resume.
+        """
+        self.max_pending = max_pending
+        self.pause_level = max(1, int(max_pending * pause_ratio))
+        self.resume_level = int(max_pending * resume_ratio)
+        self.credit_batch = max(1, max_pending // 4)
+
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.paused = False
+        self._consumed_since_grant = 0
+        self._expected_sequence = None
+
+        # Metrics
+        self.frames_received = 0
+        self.frames_dropped = 0
+        self.frames_lost = 0
+        self.backpressure_waits = 0
+
+    def initial_messages(self) -> List[dict]:
+        return [{"type": "credit", "credits": self.max_pending}]
+
+    def offer(self, item, sequence: Optional[int] = None) -> List[dict]:
+        """Queue a received frame (or END_OF_STREAM) without waiting."""
+        messages = []
+        if sequence is not None:
+            if self._expected_sequence is not None and sequence != self._expected_sequence:
+                # Frames lost or reordered on the client side
+                self.frames_lost += max(sequence - self._expected_sequence, 0)
+            self._expected_sequence = sequence + 1
+
+        if item is not END_OF_STREAM:
+            self.frames_received += 1
+            if self.queue.full():
+                self.frames_dropped += 1
+                # The frame used a credit: give it back with the next grant
+                self._consumed_since_grant += 1
+                messages.append({"type": "drop", "sequence": sequence})
+                return messages
+
+        if item is END_OF_STREAM and self.queue.full():
+            # Never lose the end of the stream: make room by dropping the oldest frame
+            self.queue.get_nowait()
+            self.frames_dropped += 1
+        self.queue.put_nowait(item)
+
+        if not self.paused and self.queue.qsize() >= self.pause_level:
+            self.paused = True
+            messages.append({"type": "pause", "pending": self.queue.qsize()})
+        return messages
+
+    async def put(self, item):
+        """
+        Queue a frame of a client without credits, waiting while the queue is full. The socket
+        is not read meanwhile, so TCP flow control slows the client down and no audio is lost.
+        """
+        self.frames_received += 1
+        if self.queue.full():
+            self.backpressure_waits += 1
+        await self.queue.put(item)
+
+    async def take(self):
+        """Wait for the next queued item. Returns the item and the messages to send."""
+        item = await self.queue.get()
+        messages = []
+
+        self._consumed_since_grant += 1
+        if self._consumed_since_grant >= self.credit_batch:
+            messages.append({"type": "credit", "credits": self._consumed_since_grant})
+            self._consumed_since_grant = 0
+
+        if self.paused and self.queue.qsize() <= self.resume_level:
+            self.paused = False
+            messages.append({"type": "resume", "pending": self.queue.qsize()})
+        return item, messages
+
+    def close(self):
+        """Wake up the consumer once no more frames will arrive (queued ones are kept)."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.frames_dropped += 1
+        self.queue.put_nowait(self.CLOSED)
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.queue.qsize(),
+            "max_pending": self.max_pending,
+            "paused": self.paused,
+            "frames_received": self.frames_received,
+            "frames_dropped": self.frames_dropped,
+            "frames_lost": self.frames_lost,
+            "backpressure_waits": self.backpressure_waits,
+        }
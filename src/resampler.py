@@ -0,0 +1,158 @@
+from math import gcd
+
+import numpy as np
+
+# Sample dtypes clients may declare, as little-endian NumPy dtypes
+PCM_DTYPES = {"int16": "<i2", "float32": "<f4"}
+
+
+def decode_pcm(data: bytes, dtype="int16", channels=1) -> np.ndarray:
+    """Interleaved PCM bytes to mono float32 samples in [-1, 1] (channels are averaged)."""
+    samples = np.frombuffer(data, dtype=PCM_DTYPES[dtype])
+    if dtype == "int16":
+        samples = samples.astype(np.float32) / 32768.0
+    else:
+        samples = samples.astype(np.float32, copy=False)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+    return samples
+
+
+def encode_pcm16(samples: np.ndarray) -> bytes:
+    """Float samples in [-1, 1] to int16 PCM bytes (clipped)."""
+    return np.clip(samples * 32768.0, -32768, 32767).astype("<i2").tobytes()
+
+
+class StreamingResampler:
+    """
+    Polyphase resampler for audio arriving in chunks of any size.
+
+    The rate ratio is reduced to L/M (e.g. 1/3 for 48 kHz to 16 kHz, 160/441 for 44.1 kHz).
+    A Kaiser-windowed sinc low-pass designed at the virtual L-times upsampled rate is split
+    into L phases, so each output sample costs a single dot product of `taps` input samples
+    and the zeros of the upsampled signal are never computed. The last input samples are kept
+    between chunks, so the output is the same however the input is split. Every chunk is
+    processed with one vectorized NumPy call.
+    """
+
+    def __init__(self, input_rate: int, output_rate=16000, zero_crossings=10, beta=5.0):
+        """
+        Args:
+            input_rate (int): Rate of the incoming samples.
+            output_rate (int): Rate of the produced samples.
+            zero_crossings (int): Filter half-length in zero crossings of the sinc (quality).
+            beta (float): Kaiser window parameter (stop-band attenuation).
+        """
+        if input_rate <= 0 or output_rate <= 0:
+            raise ValueError("Sample rates must be positive")
+        divisor = gcd(input_rate, output_rate)
+        self.up = output_rate // divisor
+        self.down = input_rate // divisor
+
+        # Prototype low-pass at the upsampled rate, cut at the lower of the two Nyquist rates
+        half_length = zero_crossings * max(self.up, self.down)
+        n = np.arange(-half_length, half_length + 1)
+        cutoff = 1.0 / max(self.up, self.down)
+        prototype = cutoff * np.sinc(cutoff * n) * np.kaiser(len(n), beta) * self.up
+
+        # phases[p, k] weighs input sample (i - k) for outputs of phase p
+        self.taps = -(-len(prototype) // self.up)
+        padded = np.zeros(self.taps * self.up)
+        padded[: len(prototype)] = prototype
+        phases = padded.reshape(self.taps, self.up).T
+        # Reversed so that a window of consecutive inputs (oldest first) is a plain dot product
+        self._phases = np.ascontiguousarray(phases[:, ::-1], dtype=np.float32)
+        self._delay = half_length
+
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)
+        self._input_count = 0
+        self._output_count = 0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """Resample the next chunk of float32 samples; returns every output sample ready."""
+        buffer = np.concatenate([self._history, samples.astype(np.float32, copy=False)])
+        # Absolute index of buffer[0] in the input stream
+        buffer_start = self._input_count - len(self._history)
+        self._input_count += len(samples)
+
+        # Output n is centred on upsampled position n * down; it needs input (position // up)
+        last = (self._input_count * self.up - 1 - self._delay) // self.down
+        n = np.arange(self._output_count, max(last + 1, self._output_count))
+        positions = n * self.down + self._delay
+        newest = positions // self.up - buffer_start
+        windows = np.lib.stride_tricks.sliding_window_view(buffer, self.taps)
+        output = np.einsum(
+            "ij,ij->i", windows[newest - self.taps + 1], self._phases[positions % self.up]
+        )
+
+        self._output_count += len(n)
+        self._history = buffer[len(buffer) - (self.taps - 1) :]
+        return output.astype(np.float32, copy=False)
+
+    def flush(self) -> np.ndarray:
+        """Output the samples still held back by the filter delay. Ends the stream."""
+        remaining = -(-self._input_count * self.up // self.down) - self._output_count
+        if remaining <= 0:
+            return np.empty(0, dtype=np.float32)
+        # The stream is followed by silence
+        return self.process(np.zeros(self._delay // self.up + 1, dtype=np.float32))[:remaining]
+
+
+class PcmConverter:
+    """
+    Converts the PCM a client declared (rate, channels, int16 or float32) into the 16 kHz mono
+    int16 stream `AudioProcessor` consumes: decode, downmix, then resample.
+    16 kHz mono int16 input is passed through untouched.
+    """
+
+    def __init__(self, sample_rate=16000, channels=1, dtype="int16", output_rate=16000):
+        """
+        Args:
+            sample_rate (int): Declared input rate.
+            channels (int): Declared number of interleaved channels.
+            dtype (str): Declared sample type, "int16" or "float32".
+            output_rate (int): Rate of the produced int16 mono PCM.
+
+        Raises:
+            ValueError: If the declared format is not supported.
+        """
+        if dtype not in PCM_DTYPES:
+            raise ValueError(
+                f"Unsupported sample type '{dtype}', expected one of {list(PCM_DTYPES)}"
+            )
+        if not 1 <= channels <= 8:
+            raise ValueError(f"Unsupported channel count {channels}")
+        if not 8000 <= sample_rate <= 192000:
+            raise ValueError(f"Unsupported sample rate {sample_rate} Hz")
+
+        self.channels = channels
+        self.dtype = dtype
+        # Declared (sample_rate, channels, dtype)
+        self.format = (sample_rate, channels, dtype)
+        self.passthrough = self.format == (output_rate, 1, "int16")
+        self.resampler = (
+            StreamingResampler(sample_rate, output_rate) if sample_rate != output_rate else None
+        )
+        # Bytes of an incomplete sample frame, completed by the next chunk
+        self._frame_bytes = np.dtype(PCM_DTYPES[dtype]).itemsize * channels
+        self._remainder = b""
+
+    def convert(self, data: bytes) -> bytes:
+        """Convert the next chunk; returns int16 mono PCM bytes (possibly empty)."""
+        if self._remainder:
+            data = self._remainder + data
+        complete = len(data) - len(data) % self._frame_bytes
+        self._remainder = data[complete:]
+        if self.passthrough:
+            return data[:complete] if self._remainder else data
+
+        samples = decode_pcm(data[:complete], self.dtype, self.channels)
+        if self.resampler:
+            samples = self.resampler.process(samples)
+        return encode_pcm16(samples)
+
+    def flush(self) -> bytes:
+        """Samples still held back by the resampler, at the end of the stream."""
+        if not self.resampler:
+            return b""
+        return encode_pcm16(self.resampler.flush())
@@ -0,0 +1,79 @@
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-capacity audio ring buffer addressed by absolute sample position.
+
+    The storage is mirrored (every sample is written twice, `capacity` apart), so any window
+    of up to `capacity` samples can be returned as a contiguous NumPy view without copying,
+    even when it wraps around the end of the ring. Memory use is fixed at construction.
+    """
+
+    def __init__(self, capacity: int, dtype=np.float32):
+        """
+        Args:
+            capacity (int): Number of most recent samples kept in the buffer.
+            dtype: NumPy dtype of the stored samples.
+        """
+        self.capacity = capacity
+        self.dtype = dtype
+        self._data = np.zeros(2 * capacity, dtype=dtype)
+        # Absolute position one past the last written sample
+        self.end = 0
+
+    @property
+    def start(self) -> int:
+        """Absolute position of the oldest sample still held in the buffer."""
+        return max(0, self.end - self.capacity)
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def write(self, samples: np.ndarray):
+        """Append samples, overwriting the oldest ones once the buffer is full."""
+        count = len(samples)
+        if count > self.capacity:
+            # Only the last `capacity` samples can be kept anyway
+            self.end += count - self.capacity
+            samples = samples[-self.capacity :]
+            count = self.capacity
+
+        position = self.end % self.capacity
+        first = min(count, self.capacity - position)
+        rest = count - first
+
+        for offset in (0, self.capacity):
+            self._data[offset + position : offset + position + first] = samples[:first]
+            if rest:
+                self._data[offset : offset + rest] = samples[first:]
+
+        self.end += count
+
+    def view(self, start: int, end: int = None) -> np.ndarray:
+        """
+        Contiguous view of the samples in [start, end) (absolute positions).
+        The view stays valid until the ring wraps over it; copy it to keep the data longer.
+        """
+        end = self.end if end is None else end
+        if start < self.start or end > self.end or start > end:
+            raise ValueError(
+                f"Window [{start}, {end}) is outside the buffered range [{self.start}, {self.end})"
+            )
+        offset = start % self.capacity
+        return self._data[offset : offset + (end - start)]
+
+    def resize(self, capacity: int):
+        """Reallocate the buffer with a new capacity, keeping the most recent samples."""
+        kept = self.view(max(self.start, self.end - capacity)).copy()
+        end = self.end
+
+        self.capacity = capacity
+        self._data = np.zeros(2 * capacity, dtype=self.dtype)
+        self.end = end - len(kept)
+        self.write(kept)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the buffer."""
+        return self._data.nbytes
@@ -0,0 +1,134 @@
+import asyncio
+import re
+from typing import List, Tuple
+
+import numpy as np
+
+from src.transcription import merge_chunk_results
+
+# Energy is measured on 10 ms frames when looking for a cut point
+CUT_FRAME_SIZE = 160
+
+
+def find_cut_point(audio: np.ndarray, search_start: int, search_end: int) -> int:
+    """
+    Returns the sample position of the quietest 10 ms frame within [search_start, search_end).
+    Cutting there is the least likely to split a word.
+    """
+    search_start = max(0, search_start)
+    search_end = min(len(audio), search_end)
+    num_frames = (search_end - search_start) // CUT_FRAME_SIZE
+    if num_frames < 1:
+        return search_end
+
+    frames = audio[search_start : search_start + num_frames * CUT_FRAME_SIZE].reshape(
+        num_frames, CUT_FRAME_SIZE
+    )
+    frames = frames.astype(np.float32, copy=False)
+    energies = np.einsum("ij,ij->i", frames, frames)
+    quietest = int(np.argmin(energies))
+    return search_start + quietest * CUT_FRAME_SIZE + CUT_FRAME_SIZE // 2
+
+
+def split_long_audio(
+    audio: np.ndarray, max_samples: int, search_samples: int, overlap_samples: int
+) -> List[Tuple[int, int]]:
+    """
+    Splits a long buffer into chunks of at most `max_samples`.
+
+    Each cut is placed at the quietest point of the last `search_samples` before the limit,
+    and the next chunk starts `overlap_samples` before the cut so no word is lost.
+
+    Returns:
+        List[Tuple[int, int]]: (start, end) sample bounds of every chunk.
+    """
+    # Keep room for progress between two cuts
+    search_samples = min(search_samples, max_samples // 2)
+    overlap_samples = min(overlap_samples, (max_samples - search_samples) // 2)
+
+    bounds = []
+    start = 0
+    while len(audio) - start > max_samples:
+        limit = start + max_samples
+        cut = find_cut_point(audio, limit - search_samples, limit)
+        bounds.append((start, cut))
+        start = cut - overlap_samples
+    bounds.append((start, len(audio)))
+    return bounds
+
+
+def normalize_word(word: str) -> str:
+    """Lowercase and strip punctuation so 'Hello,' and 'hello' count as the same word."""
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def remove_overlap(previous_text: str, text: str, max_overlap_words=8) -> str:
+    """
+    Drops the words at the start of `text` that repeat the end of `previous_text`
+    (the transcription of the audio both chunks share).
+    """
+    previous_words = [normalize_word(w) for w in previous_text.split()]
+    words = text.split()
+    normalized = [normalize_word(w) for w in words]
+
+    for size in range(min(max_overlap_words, len(previous_words), len(words)), 0, -1):
+        if previous_words[-size:] == normalized[:size]:
+            return " ".join(words[size:])
+    return text
+
+
+def stitch_transcripts(texts: List[str], max_overlap_words=8) -> str:
+    """Joins the transcriptions of consecutive overlapping chunks without repeating words."""
+    stitched = ""
+    for text in texts:
+        text = text.strip()
+        if stitched:
+            text = remove_overlap(stitched, text, max_overlap_words)
+        stitched = " ".join(t for t in (stitched, text) if t)
+    return stitched
+
+
+async def transcribe_chunked(
+    transcriber,
+    audio: np.ndarray,
+    max_duration=30.0,
+    search_duration=1.0,
+    overlap_duration=0.2,
+    sample_rate=16000,
+    detailed=False,
+    **options,
+):
+    """
+    Transcribes a buffer of any length.
+
+    Buffers longer than `max_duration` are split at low-energy points with a small overlap,
+    the chunks are decoded concurrently (on the inference executor behind `transcriber`),
+    and the texts are stitched back together with overlap de-duplication.
+
+    Returns:
+        The text, or with `detailed` a `TranscriptionResult` whose timestamps are relative to
+        the start of `audio`.
+    """
+    transcribe = transcriber.transcribe_detailed if detailed else transcriber.transcribe
+    max_samples = int(max_duration * sample_rate)
+    if max_samples <= 0 or len(audio) <= max_samples:
+        return await transcribe(audio, **options)
+
+    bounds = split_long_audio(
+        audio,
+        max_samples,
+        int(search_duration * sample_rate),
+        int(overlap_duration * sample_rate),
+    )
+    results = await asyncio.gather(
+        *(transcribe(audio[start:end], **options) for start, end in bounds)
+    )
+    if not detailed:
+        return stitch_transcripts(results)
+
+    return merge_chunk_results(
+        results,
+        [start / sample_rate for start, _ in bounds],
+        overlap_duration,
+        stitch_transcripts([result.text for result in results]),
+    )
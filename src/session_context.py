@@ -0,0 +1,75 @@
+import collections
+from typing import List, Optional
+
+
+class SessionContext:
+    """
+    Decoder context carried from one segment of a session to the next.
+
+    - The last committed words are given to Whisper as `initial_prompt`, so a short segment
+      is decoded as the continuation of the conversation instead of a cold start (which is
+      where most hallucinated restarts come from).
+    - Custom vocabulary supplied by the client is kept at the start of the prompt so names
+      and jargon are spelled as expected.
+    - When no language is configured, the language detected on the first confident segment
+      is reused for the rest of the session instead of detecting it on every segment.
+    """
+
+    def __init__(
+        self,
+        language: Optional[str] = None,
+        max_prompt_words=32,
+        vocabulary: Optional[List[str]] = None,
+        language_threshold=0.8,
+    ):
+        """
+        Args:
+            language (str, optional): Fixed language of the session. None to detect it.
+            max_prompt_words (int): Number of previous words kept in the prompt (0 disables).
+            vocabulary (List[str], optional): Words or phrases the decoder should expect.
+            language_threshold (float): Detection probability from which the language is
+                cached for the session.
+        """
+        self.language = language
+        self.max_prompt_words = max_prompt_words
+        self.vocabulary = [word.strip() for word in vocabulary or [] if word.strip()]
+        self.language_threshold = language_threshold
+
+        self._words = collections.deque(maxlen=max(max_prompt_words, 0))
+        # Metrics
+        self.language_detections = 0
+
+    def observe_language(self, language: str, probability: float) -> str:
+        """Record a detection result; confident results fix the language for the session."""
+        self.language_detections += 1
+        if probability >= self.language_threshold:
+            print(f"Session language detected: {language} ({probability:.2f})")
+            self.language = language
+        return language
+
+    @property
+    def prompt(self) -> Optional[str]:
+        """The `initial_prompt` for the next segment, or None if there is no context yet."""
+        parts = []
+        if self.vocabulary:
+            parts.append(", ".join(self.vocabulary) + ".")
+        if self._words:
+            parts.append(" ".join(self._words))
+        return " ".join(parts) or None
+
+    def decode_options(self, language: Optional[str] = None) -> dict:
+        """Options for the next decode (`language` overrides a language not known yet)."""
+        return {"language": self.language or language, "initial_prompt": self.prompt}
+
+    def commit(self, text: str):
+        """Add the final transcription of a segment to the context."""
+        if self.max_prompt_words > 0:
+            self._words.extend(text.split())
+
+    def stats(self) -> dict:
+        return {
+            "language": self.language,
+            "language_detections": self.language_detections,
+            "prompt_words": len(self._words),
+            "vocabulary": self.vocabulary,
+        }
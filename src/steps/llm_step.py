@@ -1,21 +1,58 @@
+import asyncio
 from typing import Any, Dict
 
 from src.interfaces import ProcessingStep
-from src.llm_service import LLMService
+from src.llm_batcher import CorrectionBatcher
+from src.llm_service import CircuitBreaker, CorrectionCache, LLMService
 
 
 class LLMCorrectionStep(ProcessingStep):
     """
     Wraps the LLMService into a pipeline step.
+
+    With a latency budget (`llm_budget_ms`), a correction that takes longer is not waited for:
+    the raw text goes on through the pipeline, and the correction is handed to the session's
+    `on_late_correction` callback (if any, called with the correction and the name of this step
+    so the steps after it can be applied before it is sent as a `replace` message) or abandoned.
+    Repeated budget overruns or failed requests open a circuit breaker that skips the LLM for
+    a cool-down.
     """
     def __init__(self, config):
+        cache = None
+        if config['llm_enabled'] and config.get('llm_cache_size', 0) > 0:
+            cache = CorrectionCache(
+                max_entries=config['llm_cache_size'],
+                ttl=config.get('llm_cache_ttl', 86400.0),
+                path=config.get('llm_cache_path') or None,
+            )
         self._llm_service = LLMService(
             base_url=config['llm_url'],
             api_key=config['llm_api_key'],
             model=config['llm_model'],
             system_prompt=None, # Will load default or from file internally if needed
-            enabled=config['llm_enabled']
+            enabled=config['llm_enabled'],
+            streaming=config.get('llm_streaming', False),
+            cache=cache,
+            timeout=config.get('llm_timeout')
+        )
+        # Seconds a segment may wait for its correction (0: no limit)
+        self.budget = config.get('llm_budget_ms', 0) / 1000.0
+        self.late_replace = config.get('llm_late_replace', True)
+        self.breaker = CircuitBreaker(
+            failure_threshold=config.get('llm_breaker_failures', 3),
+            cooldown=config.get('llm_breaker_cooldown', 30.0),
         )
+        self.timeouts = 0
+        self.errors = 0
+        self.skipped = 0
+        if config['llm_enabled'] and config.get('llm_batching', False):
+            self._llm_service.batcher = CorrectionBatcher(
+                self._llm_service,
+                mode=config.get('llm_batch_mode', "prompt"),
+                max_batch_size=config.get('llm_batch_max_size', 8),
+                max_wait_ms=config.get('llm_batch_max_wait_ms', 50),
+                max_concurrency=config.get('llm_max_concurrency', 2),
+            )
         # Manually load system prompt file if needed since we are re-instantiating
         # In a real refactor, we would pass the existing instance.
         import os
@@ -27,6 +64,16 @@ class LLMCorrectionStep(ProcessingStep):
     def name(self) -> str:
         return "llm_correction"
 
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._llm_service.stats(),
+            "budget_ms": self.budget * 1000.0,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "breaker": self.breaker.stats(),
+        }
+
     async def process(self, text: str, context: Dict[str, Any] = None) -> str:
         if not self._llm_service.enabled:
             return text
@@ -34,8 +81,69 @@ class LLMCorrectionStep(ProcessingStep):
         # We can also put the "Raw" text into context for other plugins
         if context is not None:
             context["raw_asr"] = text
+        if not text or not text.strip():
+            return text
+
+        context = context if context is not None else {}
+        # Streaming mode: corrected text is forwarded as it arrives to the session (if it wants it)
+        forward_delta = context.get("on_delta")
+
+        # Cached corrections are served even while the breaker is open; they are not LLM calls
+        cached = self._llm_service.cached_correction(text)
+        if cached is not None:
+            if self._llm_service.streaming and forward_delta is not None:
+                await forward_delta(cached)
+            print(f" [LLM Cached]: {cached}")
+            return cached
+
+        # A call let through while half open is the breaker's single trial
+        trial = self.breaker.state == "half_open"
+        if not self.breaker.allow():
+            self.skipped += 1
+            print(f" [LLM Skipped] (circuit open): {text}")
+            return text
 
         print(f" [Raw ASR]: {text}")
-        result = await self._llm_service.process_text(text)
+        expired = False
+        errors = []
+
+        async def on_delta(delta):
+            # Once the raw text went out, the correction only arrives as a whole
+            if not expired:
+                await forward_delta(delta)
+
+        correction = asyncio.ensure_future(
+            self._llm_service.request_correction(
+                text, on_delta=on_delta if forward_delta else None, on_error=errors.append
+            )
+        )
+        try:
+            done, _ = await asyncio.wait({correction}, timeout=self.budget or None)
+        except asyncio.CancelledError:
+            correction.cancel()
+            # Abandoned with the session: no outcome, the next call may be the trial
+            if trial:
+                self.breaker.release()
+            raise
+
+        if not done:
+            expired = True
+            self.timeouts += 1
+            self.breaker.record_failure()
+            on_late_correction = context.get("on_late_correction")
+            if self.late_replace and on_late_correction is not None:
+                on_late_correction(correction, self.name)
+            else:
+                correction.cancel()
+            print(f" [LLM Timeout] (over {self.budget * 1000:.0f} ms budget): {text}")
+            return text
+
+        result = correction.result()
+        if errors:
+            # The LLM failed and the raw text came back as a fallback
+            self.errors += 1
+            self.breaker.record_failure()
+            return result
+        self.breaker.record_success()
         print(f" [LLM Fix]: {result}")
         return result
@@ -0,0 +1,138 @@
+from typing import List, Optional
+
+import numpy as np
+
+from src.segmenter import normalize_word
+
+
+class LocalAgreement:
+    """
+    LocalAgreement-2 commit policy for incremental transcription.
+
+    A word is committed once two consecutive hypotheses agree on it. Committed words never
+    change afterwards; only the unstable tail following them may still be revised.
+    Hypotheses passed to `update` are expected to continue the committed text (i.e. they
+    only contain the words decoded after the committed prefix).
+    """
+
+    def __init__(self):
+        self.committed: List[str] = []
+        self._previous: List[str] = []
+
+    def update(self, hypothesis: List[str]) -> List[str]:
+        """
+        Compare a new hypothesis with the previous one and commit their common prefix.
+
+        Returns:
+            List[str]: The newly committed words.
+        """
+        agreed = []
+        for previous_word, word in zip(self._previous, hypothesis):
+            if normalize_word(previous_word) != normalize_word(word):
+                break
+            agreed.append(word)
+
+        self.committed.extend(agreed)
+        self._previous = hypothesis[len(agreed):]
+        return agreed
+
+    @property
+    def committed_text(self) -> str:
+        return " ".join(self.committed)
+
+    @property
+    def unstable_text(self) -> str:
+        return " ".join(self._previous)
+
+    def reset(self):
+        self.committed = []
+        self._previous = []
+
+
+class StreamingDecoder:
+    """
+    Produces partial transcripts for the segment that is currently being recorded.
+
+    Every `partial_interval` seconds of new audio, the growing buffer is re-decoded with the
+    committed text passed as the decoder prefix, so Whisper only generates the tail that
+    is not committed yet. A `LocalAgreement` policy decides which words become stable.
+    """
+
+    def __init__(self, transcriber, partial_interval=1.0, sample_rate=16000, **decode_options):
+        """
+        Args:
+            transcriber: Object exposing `async transcribe(audio, **options) -> str`.
+            partial_interval (float): Seconds of new audio between two partial decodes.
+            sample_rate (int): Sample rate of the buffered audio.
+            **decode_options: Options forwarded to every decode (e.g. language).
+        """
+        self.transcriber = transcriber
+        self.partial_interval_samples = int(partial_interval * sample_rate)
+        self.decode_options = decode_options
+        self.agreement = LocalAgreement()
+        self._last_decoded_samples = 0
+
+    async def partial(self, buffered_audio: Optional[np.ndarray]) -> Optional[dict]:
+        """
+        Re-decode the in-progress segment if enough new audio arrived since the last pass.
+
+        Returns:
+            dict: A `partial` message, or None if no decode was due.
+        """
+        if buffered_audio is None:
+            return None
+        if len(buffered_audio) - self._last_decoded_samples < self.partial_interval_samples:
+            return None
+
+        self._last_decoded_samples = len(buffered_audio)
+        tail = await self.transcriber.transcribe(
+            buffered_audio, prefix=self.agreement.committed_text or None, **self.decode_options
+        )
+        self.agreement.update(tail.split())
+
+        return {
+            "type": "partial",
+            "text": " ".join(
+                t for t in (self.agreement.committed_text, self.agreement.unstable_text) if t
+            ),
+            "committed": self.agreement.committed_text,
+            "unstable": self.agreement.unstable_text,
+        }
+
+    def close_segment(self) -> str:
+        """
+        Reset the state for the next segment once the current one closed.
+
+        Returns:
+            str: The words committed for the closed segment, to pass to `final`.
+        """
+        committed = self.agreement.committed_text
+        self.agreement.reset()
+        self._last_decoded_samples = 0
+        return committed
+
+    async def final(self, audio_segment: np.ndarray, detailed=False, committed=None, **options):
+        """
+        Decode the closed segment, keeping the committed words unchanged.
+
+        Args:
+            committed (str, optional): The prefix returned by `close_segment`, when the next
+                segment may already be decoding. By default the segment is closed here.
+
+        Returns:
+            The text, or with `detailed` a `TranscriptionResult` (its segments and word
+            timestamps cover the words decoded after the committed prefix).
+        """
+        if committed is None:
+            committed = self.close_segment()
+        transcribe = (
+            self.transcriber.transcribe_detailed if detailed else self.transcriber.transcribe
+        )
+        tail = await transcribe(
+            audio_segment, prefix=committed or None, **{**self.decode_options, **options}
+        )
+
+        if detailed:
+            tail.text = " ".join(t for t in (committed, tail.text.strip()) if t)
+            return tail
+        return " ".join(t for t in (committed, tail.strip()) if t)
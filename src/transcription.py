@@ -0,0 +1,123 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+@dataclass
+class WordResult:
+    start: float
+    end: float
+    word: str
+    probability: float
+
+
+@dataclass
+class SegmentResult:
+    start: float
+    end: float
+    text: str
+    avg_logprob: float
+    no_speech_prob: float
+    words: List[WordResult] = field(default_factory=list)
+
+
+@dataclass
+class TranscriptionResult:
+    """Text of a decode with its Whisper segments (timestamps in seconds) and language."""
+
+    text: str
+    segments: List[SegmentResult] = field(default_factory=list)
+    language: Optional[str] = None
+    language_probability: Optional[float] = None
+
+    def shifted(self, offset: float) -> "TranscriptionResult":
+        """The same result with every timestamp moved by `offset` seconds."""
+        return TranscriptionResult(
+            text=self.text,
+            segments=[
+                SegmentResult(
+                    start=segment.start + offset,
+                    end=segment.end + offset,
+                    text=segment.text,
+                    avg_logprob=segment.avg_logprob,
+                    no_speech_prob=segment.no_speech_prob,
+                    words=[
+                        WordResult(w.start + offset, w.end + offset, w.word, w.probability)
+                        for w in segment.words
+                    ],
+                )
+                for segment in self.segments
+            ],
+            language=self.language,
+            language_probability=self.language_probability,
+        )
+
+    def to_dict(self) -> dict:
+        """JSON-friendly form (rounded timestamps and scores)."""
+        return {
+            "text": self.text,
+            "language": self.language,
+            "language_probability": _round(self.language_probability),
+            "segments": [
+                {
+                    "start": _round(segment.start),
+                    "end": _round(segment.end),
+                    "text": segment.text,
+                    "avg_logprob": _round(segment.avg_logprob),
+                    "no_speech_prob": _round(segment.no_speech_prob),
+                    "words": [
+                        {
+                            "start": _round(word.start),
+                            "end": _round(word.end),
+                            "word": word.word,
+                            "probability": _round(word.probability),
+                        }
+                        for word in segment.words
+                    ],
+                }
+                for segment in self.segments
+            ],
+        }
+
+
+def _round(value, digits=3):
+    return None if value is None else round(float(value), digits)
+
+
+def segment_from_whisper(segment, offset=0.0) -> SegmentResult:
+    """Converts a faster-whisper `Segment`, shifting its timestamps by `offset` seconds."""
+    return SegmentResult(
+        start=segment.start + offset,
+        end=segment.end + offset,
+        text=segment.text.strip(),
+        avg_logprob=segment.avg_logprob,
+        no_speech_prob=segment.no_speech_prob,
+        words=[
+            WordResult(word.start + offset, word.end + offset, word.word, word.probability)
+            for word in segment.words or []
+        ],
+    )
+
+
+def merge_chunk_results(
+    results: List[TranscriptionResult], starts: List[float], overlap: float, text: str
+) -> TranscriptionResult:
+    """
+    Combines the results of consecutive overlapping chunks of one buffer.
+
+    Timestamps are moved to the buffer timeline, and segments that lie entirely inside the
+    audio a chunk shares with the previous one are dropped. `text` is the stitched text.
+    """
+    segments = []
+    for index, (result, start) in enumerate(zip(results, starts)):
+        for segment in result.shifted(start).segments:
+            if index > 0 and segment.end <= start + overlap:
+                continue
+            segments.append(segment)
+
+    first = results[0] if results else TranscriptionResult("")
+    return TranscriptionResult(
+        text=text,
+        segments=segments,
+        language=first.language,
+        language_probability=first.language_probability,
+    )
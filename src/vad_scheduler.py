@@ -0,0 +1,98 @@
+import asyncio
+import collections
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from src.audio_processor import VadBackend
+
+
+@dataclass
+class _VadJob:
+    backend: VadBackend
+    audio_chunk: np.ndarray
+    future: asyncio.Future = field(repr=False)
+
+
+class VadScheduler:
+    """
+    Scores the incoming chunks of all sessions together.
+
+    Sessions submit their chunk and await the decision. Once per tick, every pending chunk is
+    gathered and scored with one `is_speech_batch` call per backend class (a single vectorized
+    NumPy call for the RMS detector), instead of one small call per chunk and per session.
+    Each session then advances its own `AudioProcessor` state machine with the result.
+    """
+
+    def __init__(self, tick_ms=0):
+        """
+        Args:
+            tick_ms (float): How long to wait for other sessions once a chunk is pending.
+                With 0, the scheduler only yields once to the event loop, which already
+                collects every session that is ready at the same time.
+        """
+        self.tick = tick_ms / 1000.0
+
+        self._queue = asyncio.Queue()
+        self._tick_task = None
+
+        # Metrics
+        self.ticks_total = 0
+        self.chunks_total = 0
+
+    async def is_silent(self, backend: VadBackend, audio_chunk: np.ndarray) -> bool:
+        """Queue a chunk (int16 samples) for the next tick and wait for its decision."""
+        if self._tick_task is None or self._tick_task.done():
+            self._tick_task = asyncio.create_task(self._tick_loop())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_VadJob(backend, audio_chunk, future))
+        return not await future
+
+    async def _tick_loop(self):
+        while True:
+            jobs = [await self._queue.get()]
+            await asyncio.sleep(self.tick)
+            while not self._queue.empty():
+                jobs.append(self._queue.get_nowait())
+
+            self.ticks_total += 1
+            self.chunks_total += len(jobs)
+
+            groups = collections.defaultdict(list)
+            for job in jobs:
+                groups[type(job.backend)].append(job)
+
+            for backend_class, group in groups.items():
+                await self._score(backend_class, group)
+
+    async def _score(self, backend_class, jobs):
+        backends = [job.backend for job in jobs]
+        chunks = [job.audio_chunk for job in jobs]
+        try:
+            if backend_class.offload:
+                decisions = await asyncio.to_thread(
+                    backend_class.is_speech_batch, backends, chunks
+                )
+            else:
+                decisions = backend_class.is_speech_batch(backends, chunks)
+        except Exception as e:
+            for job in jobs:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            return
+
+        for job, decision in zip(jobs, decisions):
+            if not job.future.done():
+                job.future.set_result(decision)
+
+    def stats(self) -> dict:
+        """Achieved batching of VAD evaluations so far."""
+        return {
+            "tick_ms": self.tick * 1000.0,
+            "ticks": self.ticks_total,
+            "chunks": self.chunks_total,
+            "mean_chunks_per_tick": (
+                self.chunks_total / self.ticks_total if self.ticks_total else 0.0
+            ),
+        }
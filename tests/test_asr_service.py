@@ -1,6 +1,7 @@
 import os
 import sys
 import unittest
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
 import numpy as np
@@ -8,7 +9,7 @@ import numpy as np
 # Ensure src can be imported
 sys.path.append(os.getcwd())
 
-from src.asr_service import ASRService
+from src.asr_service import ASRService, _PromptedBatchedPipeline
 
 
 class TestASRService(unittest.TestCase):
@@ -18,7 +19,7 @@ class TestASRService(unittest.TestCase):
         service = ASRService(model_size="tiny", device="cpu", compute_type="int8")
 
         MockWhisperModel.assert_called_once_with(
-            "tiny", device="cpu", compute_type="int8"
+            "tiny", device="cpu", compute_type="int8", num_workers=1
         )
         self.assertIsNotNone(service.model)
 
@@ -52,6 +53,55 @@ class TestASRService(unittest.TestCase):
         # Check result text (ASRService should strip whitespace)
         self.assertEqual(result, "Hello world")
 
+    @patch("src.asr_service.WhisperModel")
+    def test_warmup_decodes_synthetic_audio_at_load(self, MockWhisperModel):
+        """Test that the warm-up decodes one synthetic segment per configured length."""
+        mock_instance = MockWhisperModel.return_value
+        mock_instance.transcribe.return_value = ([], None)
+
+        service = ASRService(warmup_durations=[1.0, 2.5])
+
+        lengths = [len(call.args[0]) for call in mock_instance.transcribe.call_args_list]
+        self.assertEqual(lengths, [16000, 40000])
+        self.assertGreater(np.abs(mock_instance.transcribe.call_args.args[0]).max(), 0)
+        self.assertGreater(service.warmup_time, 0)
+
+    @patch("src.asr_service.WhisperModel")
+    def test_no_warmup_by_default(self, MockWhisperModel):
+        ASRService()
+
+        MockWhisperModel.return_value.transcribe.assert_not_called()
+
+    @patch("src.asr_service.WhisperModel")
+    def test_decoding_options_are_forwarded(self, MockWhisperModel):
+        """Test that profile options reach faster-whisper."""
+        mock_instance = MockWhisperModel.return_value
+        mock_instance.transcribe.return_value = ([], None)
+        service = ASRService()
+
+        service.transcribe_audio(
+            np.zeros(16000, dtype=np.float32),
+            beam_size=1,
+            best_of=1,
+            temperature=(0.0,),
+            condition_on_previous_text=False,
+        )
+
+        kwargs = mock_instance.transcribe.call_args.kwargs
+        self.assertEqual(kwargs["beam_size"], 1)
+        self.assertEqual(kwargs["best_of"], 1)
+        self.assertEqual(kwargs["temperature"], [0.0])
+        self.assertFalse(kwargs["condition_on_previous_text"])
+
+    @patch("src.asr_service.WhisperModel")
+    def test_detect_language(self, MockWhisperModel):
+        MockWhisperModel.return_value.detect_language.return_value = ("fr", 0.97, [])
+        service = ASRService()
+
+        language, probability = service.detect_language(np.zeros(16000, dtype=np.float32))
+
+        self.assertEqual((language, probability), ("fr", 0.97))
+
     @patch("src.asr_service.WhisperModel")
     def test_transcribe_empty_result(self, MockWhisperModel):
         """Test when model returns no segments."""
@@ -64,6 +114,105 @@ class TestASRService(unittest.TestCase):
         result = service.transcribe_audio(dummy_audio)
         self.assertEqual(result, "")
 
+    @patch("src.asr_service._PromptedBatchedPipeline")
+    @patch("src.asr_service.WhisperModel")
+    def test_transcribe_batch_routes_segments(self, MockWhisperModel, MockPipeline):
+        """Each decoded clip is returned to the input segment it came from."""
+        first = MagicMock(start=0.0, text=" First ", avg_logprob=-0.2, no_speech_prob=0.0)
+        second = MagicMock(start=1.0, text=" Second", avg_logprob=-0.3, no_speech_prob=0.0)
+        MockPipeline.return_value.transcribe.return_value = ([first, second], None)
+
+        service = ASRService()
+        audios = [np.zeros(16000, dtype=np.float32), np.zeros(8000, dtype=np.float32)]
+        result = service.transcribe_batch(audios, language="en")
+
+        self.assertEqual(result, ["First", "Second"])
+        args, kwargs = MockPipeline.return_value.transcribe.call_args
+        self.assertEqual(len(args[0]), 24000)
+        self.assertEqual(
+            kwargs["clip_timestamps"], [{"start": 0.0, "end": 1.0}, {"start": 1.0, "end": 1.5}]
+        )
+        self.assertEqual(kwargs["batch_size"], 2)
+
+    @patch("src.asr_service._PromptedBatchedPipeline")
+    @patch("src.asr_service.WhisperModel")
+    def test_transcribe_batch_passes_prompts_per_segment(self, MockWhisperModel, MockPipeline):
+        """Each clip gets the prompt and prefix of the segment it belongs to."""
+        MockPipeline.return_value.transcribe.return_value = ([], None)
+
+        service = ASRService()
+        audios = [np.zeros(16000, dtype=np.float32), np.zeros(8000, dtype=np.float32)]
+        service.transcribe_batch(audios, language="en", prefix=["hello", None])
+
+        MockPipeline.return_value.clip_prompts.assert_called_once_with(
+            [(None, "hello"), (None, None)]
+        )
+
+
+    @patch("src.asr_service._PromptedBatchedPipeline")
+    @patch("src.asr_service.WhisperModel")
+    def test_failed_batched_decodes_fall_back_to_higher_temperatures(
+        self, MockWhisperModel, MockPipeline
+    ):
+        """Segments failing the quality checks are decoded again alone, like unbatched."""
+        good = MagicMock(start=0.0, text=" Good", avg_logprob=-0.2, no_speech_prob=0.0)
+        unlikely = MagicMock(start=1.0, text=" Noise", avg_logprob=-1.5, no_speech_prob=0.1)
+        MockPipeline.return_value.transcribe.return_value = ([good, unlikely], None)
+        retried = MagicMock(start=0.0, text=" Better", avg_logprob=-0.4, no_speech_prob=0.0)
+        MockWhisperModel.return_value.transcribe.return_value = ([retried], None)
+
+        service = ASRService()
+        audios = [np.zeros(16000, dtype=np.float32), np.zeros(8000, dtype=np.float32)]
+        result = service.transcribe_batch(
+            audios, language="en", temperature=[0.0, 0.4, 0.8], initial_prompt=["a", "b"]
+        )
+        greedy = service.transcribe_batch(audios, language="en", temperature=[0.0])
+
+        self.assertEqual(result, ["Good", "Better"])
+        self.assertEqual(greedy, ["Good", "Noise"])
+        MockWhisperModel.return_value.transcribe.assert_called_once()
+        kwargs = MockWhisperModel.return_value.transcribe.call_args.kwargs
+        self.assertEqual(kwargs["temperature"], [0.4, 0.8])
+        self.assertEqual(kwargs["initial_prompt"], "b")
+
+
+class TestPromptedBatchedPipeline(unittest.TestCase):
+    def test_every_clip_is_decoded_with_its_own_prompt(self):
+        model = MagicMock()
+        model.max_length = 448
+        model.get_prompt.side_effect = lambda tokenizer, previous_tokens, prefix=None, **kw: (
+            [*previous_tokens, 50258] + ([len(prefix)] if prefix else [])
+        )
+        model.model.generate.side_effect = lambda features, prompts, **kw: [
+            SimpleNamespace(sequences_ids=[[1, 2]], scores=[-1.0], no_speech_prob=0.1)
+            for _ in prompts
+        ]
+        tokenizer = MagicMock()
+        tokenizer.encode.side_effect = lambda text: [len(text)]
+        options = SimpleNamespace(
+            without_timestamps=True,
+            hotwords=None,
+            max_new_tokens=None,
+            multilingual=False,
+            beam_size=5,
+            patience=1,
+            length_penalty=1,
+            suppress_blank=True,
+            suppress_tokens=[-1],
+            temperatures=[0.0],
+            repetition_penalty=1,
+            no_repeat_ngram_size=0,
+        )
+        pipeline = _PromptedBatchedPipeline(model=model)
+
+        with pipeline.clip_prompts([("context", None), (None, "hi"), (None, None)]):
+            _, first = pipeline.generate_segment_batched(np.zeros((2, 80, 10)), tokenizer, options)
+            _, second = pipeline.generate_segment_batched(np.zeros((1, 80, 10)), tokenizer, options)
+
+        prompts = [call.args[1] for call in model.model.generate.call_args_list]
+        self.assertEqual(prompts, [[[7, 50258], [50258, 2]], [[50258]]])
+        self.assertEqual(len(first) + len(second), 3)
+
 
 if __name__ == "__main__":
     unittest.main()
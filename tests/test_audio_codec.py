@@ -0,0 +1,77 @@
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.audio_codec import FrameDecoder, OpusDecoder, OpusEncoder, supported_formats
+from src.protocol import FORMAT_OPUS, FORMAT_PCM_F32LE, Frame, ProtocolError
+
+
+def tone(num_samples, frequency=440, sample_rate=16000):
+    t = np.arange(num_samples) / sample_rate
+    return (8000 * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+
+
+class TestOpus(unittest.TestCase):
+    def test_roundtrip_keeps_duration_and_energy(self):
+        audio = tone(16000)
+        encoder = OpusEncoder()
+        packets = [
+            p for i in range(0, len(audio), 1024) for p in encoder.encode(audio[i : i + 1024])
+        ]
+        # 20 ms packets, far smaller than the PCM
+        self.assertEqual(len(packets), 50)
+        self.assertLess(sum(map(len, packets)), len(audio.tobytes()) / 8)
+
+        decoder = OpusDecoder()
+        decoded = np.frombuffer(b"".join(decoder.decode(p) for p in packets), dtype=np.int16)
+        self.assertAlmostEqual(len(decoded), len(audio), delta=320)
+        rms = np.sqrt(np.mean(decoded[1600:].astype(np.float32) ** 2))
+        self.assertAlmostEqual(rms, 8000 / np.sqrt(2), delta=1000)
+
+    def test_invalid_packet_is_a_protocol_error(self):
+        with self.assertRaises(ProtocolError):
+            OpusDecoder().decode(b"\xff" * 3)
+
+    def test_opus_is_advertised(self):
+        self.assertEqual(supported_formats(), ["pcm_s16le", "pcm_f32le", "opus"])
+
+
+class TestFrameDecoder(unittest.TestCase):
+    def test_opus_frames_are_decoded_on_the_pool(self):
+        packets = OpusEncoder().encode(tone(1600))
+
+        async def run(pool):
+            decoder = FrameDecoder(pool)
+            return [
+                await decoder.decode(Frame(i, p, format=FORMAT_OPUS))
+                for i, p in enumerate(packets)
+            ]
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="test-decode") as pool:
+            pcm = asyncio.run(run(pool))
+        self.assertEqual(len(pcm), len(packets))
+        self.assertGreater(len(b"".join(pcm)), 0)
+
+    def test_pcm_frames_are_converted_inline(self):
+        pcm = tone(160).tobytes()
+        self.assertEqual(asyncio.run(FrameDecoder().decode(Frame(0, pcm))), pcm)
+
+    def test_pcm_frames_at_other_rates_are_resampled(self):
+        samples = np.zeros(4800 * 2, dtype=np.float32).tobytes()
+        frame = Frame(0, samples, format=FORMAT_PCM_F32LE, sample_rate=48000, channels=2)
+
+        async def run():
+            decoder = FrameDecoder()
+            return await decoder.decode(frame) + decoder.flush()
+
+        self.assertEqual(len(asyncio.run(run())), 1600 * 2)
+
+    def test_unsupported_pcm_rate_is_rejected(self):
+        with self.assertRaises(ProtocolError):
+            asyncio.run(FrameDecoder().decode(Frame(0, b"\x00\x00", sample_rate=1000)))
+
+
+if __name__ == "__main__":
+    unittest.main()
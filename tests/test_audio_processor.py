@@ -2,7 +2,15 @@ import unittest
 
 import numpy as np
 
-from src.audio_processor import AudioProcessor, VadState
+from src.audio_processor import (
+    AdaptiveRmsVad,
+    AudioProcessor,
+    RmsVad,
+    SileroVad,
+    VadBackend,
+    VadState,
+    create_vad_backend,
+)
 
 
 class TestAudioProcessor(unittest.TestCase):
@@ -70,12 +78,8 @@ class TestAudioProcessor(unittest.TestCase):
         self.assertIsNone(result)
         self.assertEqual(self.processor.state, VadState.COOLDOWN)
 
-        # Second silent chunk -> Wait (time based)
-        # We might need to sleep slightly to ensure time.time() difference is enough
-        import time
-
-        time.sleep(0.15)
-
+        # Second silent chunk -> 2048 samples (0.128s) of silence > 0.1s pause.
+        # Timing follows the sample clock, so no waiting is needed.
         result = self.processor.process(silent_bytes)
 
         # Now it should be done
@@ -109,6 +113,143 @@ class TestAudioProcessor(unittest.TestCase):
         self.assertIsNotNone(result)
         self.assertEqual(self.processor.state, VadState.IDLE)
 
+    def test_segmentation_independent_of_arrival_rate(self):
+        """Replaying audio faster than real time still closes segments on silence."""
+        processor = AudioProcessor(
+            sample_rate=self.sample_rate,
+            silence_threshold=100,
+            silence_pause_duration=1.0,
+            max_accumulate_duration=10,
+        )
+        loud_bytes = self.create_audio_chunk(5000, 1600)  # 0.1s
+        silent_bytes = self.create_audio_chunk(0, 1600)
+
+        results = [processor.process(loud_bytes) for _ in range(10)]
+        # 1.0s of silence is not strictly longer than the pause yet
+        results += [processor.process(silent_bytes) for _ in range(10)]
+        self.assertTrue(all(r is None for r in results))
+
+        result = processor.process(silent_bytes)
+        self.assertIsNotNone(result)
+        self.assertEqual(len(result), 21 * 1600)
+        self.assertAlmostEqual(processor.stream_time, 2.1)
+
+    def test_custom_vad_backend(self):
+        """Segmentation follows whatever backend is plugged in."""
+
+        class ScriptedVad(VadBackend):
+            def __init__(self, decisions):
+                self.decisions = list(decisions)
+
+            @property
+            def name(self):
+                return "scripted"
+
+            def is_speech(self, audio_chunk):
+                return self.decisions.pop(0)
+
+        processor = AudioProcessor(
+            silence_pause_duration=0.1,
+            vad_backend=ScriptedVad([True, True, False, False]),
+        )
+        # Amplitude is irrelevant: the scripted backend decides
+        chunk = self.create_audio_chunk(0)
+        results = [processor.process(chunk) for _ in range(4)]
+
+        self.assertEqual(results[:3], [None, None, None])
+        self.assertEqual(len(results[3]), 4 * 1024)
+
+    def test_create_vad_backend(self):
+        backend = create_vad_backend("rms", silence_threshold=300)
+        self.assertIsInstance(backend, RmsVad)
+        self.assertEqual(backend.threshold, 300)
+
+        with self.assertRaises(ValueError):
+            create_vad_backend("unknown")
+
+    def test_adaptive_threshold_follows_noise_floor(self):
+        """A noisy microphone raises the thresholds instead of being taken for speech."""
+        rng = np.random.default_rng(0)
+        backend = AdaptiveRmsVad(initial_threshold=200, start_ratio=3.0, stop_ratio=2.0)
+
+        def noise(level):
+            return (rng.standard_normal(1024) * level).astype(np.int16)
+
+        # Background noise around 300 RMS would count as speech with a fixed threshold of 200
+        decisions = [backend.is_speech(noise(300)) for _ in range(40)]
+        self.assertFalse(any(decisions[10:]))
+        self.assertAlmostEqual(backend.noise_floor, 300, delta=30)
+
+        # Speech well above the floor starts a segment
+        self.assertTrue(backend.is_speech(noise(1200)))
+        # Hysteresis: a dip between the stop and start thresholds keeps the speech state
+        self.assertTrue(backend.is_speech(noise(750)))
+        self.assertFalse(backend.is_speech(noise(300)))
+        self.assertFalse(backend.is_speech(noise(750)))
+
+        stats = backend.stats()
+        self.assertEqual(stats["backend"], "adaptive")
+        self.assertGreater(stats["start_threshold"], stats["stop_threshold"])
+
+    def test_stats(self):
+        self.processor.process(self.create_audio_chunk(5000))
+        stats = self.processor.stats()
+
+        self.assertEqual(stats["state"], "SPEAKING")
+        self.assertEqual(stats["vad"], {"backend": "rms", "threshold": 100})
+        self.assertAlmostEqual(stats["stream_time"], 0.064)
+
+    def test_silero_backend_rejects_silence(self):
+        backend = SileroVad(threshold=0.5)
+        silent_chunk = np.frombuffer(self.create_audio_chunk(0, 1000), dtype=np.int16)
+
+        self.assertFalse(backend.is_speech(silent_chunk))
+        # Samples that do not fill a 512-sample window are kept for the next chunk
+        self.assertEqual(len(backend.state.pending), 1000 - 512)
+
+    def test_long_speech_is_cut_at_quiet_point_with_overlap(self):
+        processor = AudioProcessor(
+            sample_rate=self.sample_rate,
+            silence_threshold=100,
+            max_accumulate_duration=1.0,
+            cut_search_duration=0.5,
+            cut_overlap_duration=0.1,
+        )
+        chunk = np.full(1600, 5000, dtype=np.int16)
+        dip = chunk.copy()
+        dip[800:960] = 0  # quiet 10 ms inside an otherwise loud chunk
+
+        results = [processor.process(c.tobytes()) for c in [chunk] * 7 + [dip] + [chunk] * 2]
+
+        segment = results[-1]
+        self.assertTrue(all(r is None for r in results[:-1]))
+        # Cut in the middle of the dip, 7 * 1600 + 880 samples in
+        self.assertEqual(len(segment), 12080)
+        self.assertEqual(processor.last_segment_overlap, 0)
+        # Still speaking: the rest of the audio, plus the overlap, starts the next segment
+        self.assertEqual(processor.state, VadState.SPEAKING)
+        self.assertEqual(len(processor.main_buffer), 16000 - 12080 + 1600)
+
+        for _ in range(20):
+            segment = processor.process(np.zeros(1600, dtype=np.int16).tobytes())
+            if segment is not None:
+                break
+        self.assertEqual(processor.last_segment_overlap, 1600)
+
+    def test_peek_segment(self):
+        """The segment in progress can be read without being consumed."""
+        self.assertIsNone(self.processor.peek_segment())
+
+        loud_bytes = self.create_audio_chunk(5000)
+        self.processor.process(loud_bytes)
+        self.processor.process(loud_bytes)
+
+        peeked = self.processor.peek_segment()
+        self.assertEqual(peeked.dtype, np.float32)
+        self.assertEqual(len(peeked), 2048)
+        self.assertEqual(self.processor.state, VadState.SPEAKING)
+        self.assertEqual(len(self.processor.peek_segment()), 2048)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,156 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from src.batch_scheduler import BatchScheduler
+from src.inference_executor import InferenceExecutor
+from src.transcription import TranscriptionResult
+
+
+class TestBatchScheduler(unittest.TestCase):
+    def setUp(self):
+        self.asr_service = MagicMock()
+        self.asr_service.transcribe_batch.side_effect = lambda audios, **kw: [
+            f"segment {int(audio[0])}" for audio in audios
+        ]
+        self.executor = InferenceExecutor(self.asr_service, num_workers=1)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def segment(self, marker):
+        return np.full(1600, marker, dtype=np.float32)
+
+    def test_concurrent_segments_are_batched_and_routed_back(self):
+        scheduler = BatchScheduler(
+            self.asr_service, self.executor, max_batch_size=8, max_wait_ms=50
+        )
+
+        async def scenario():
+            return await asyncio.gather(
+                *(scheduler.transcribe(self.segment(i), language="en") for i in range(3))
+            )
+
+        results = asyncio.run(scenario())
+
+        self.assertEqual(results, ["segment 0", "segment 1", "segment 2"])
+        self.asr_service.transcribe_batch.assert_called_once()
+        self.assertEqual(scheduler.stats()["batches"], 1)
+        self.assertEqual(scheduler.stats()["mean_batch_size"], 3)
+
+    def test_max_batch_size_is_respected(self):
+        scheduler = BatchScheduler(
+            self.asr_service, self.executor, max_batch_size=2, max_wait_ms=50
+        )
+
+        async def scenario():
+            return await asyncio.gather(
+                *(scheduler.transcribe(self.segment(i), language="en") for i in range(5))
+            )
+
+        results = asyncio.run(scenario())
+
+        self.assertEqual(results, [f"segment {i}" for i in range(5)])
+        self.assertEqual(scheduler.stats()["batch_size_histogram"], {1: 1, 2: 2})
+
+    def test_incompatible_options_are_not_mixed(self):
+        scheduler = BatchScheduler(
+            self.asr_service, self.executor, max_batch_size=8, max_wait_ms=50
+        )
+
+        async def scenario():
+            return await asyncio.gather(
+                scheduler.transcribe(self.segment(0), language="en"),
+                scheduler.transcribe(self.segment(1), language="fr"),
+                scheduler.transcribe(self.segment(2), language="en"),
+            )
+
+        results = asyncio.run(scenario())
+
+        self.assertEqual(results, ["segment 0", "segment 1", "segment 2"])
+        languages = sorted(
+            call.kwargs["language"] for call in self.asr_service.transcribe_batch.call_args_list
+        )
+        self.assertEqual(languages, ["en", "fr"])
+
+    def test_prefixed_requests_are_batched_with_one_prefix_per_segment(self):
+        scheduler = BatchScheduler(
+            self.asr_service, self.executor, max_batch_size=8, max_wait_ms=50
+        )
+
+        async def scenario():
+            return await asyncio.gather(
+                scheduler.transcribe(self.segment(0), language="en", prefix="hello"),
+                scheduler.transcribe(self.segment(1), language="en"),
+            )
+
+        results = asyncio.run(scenario())
+
+        self.assertEqual(results, ["segment 0", "segment 1"])
+        self.asr_service.transcribe_batch.assert_called_once()
+        kwargs = self.asr_service.transcribe_batch.call_args.kwargs
+        self.assertEqual(kwargs["prefix"], ["hello", None])
+
+    def test_sessions_with_different_prompts_are_batched_together(self):
+        scheduler = BatchScheduler(
+            self.asr_service, self.executor, max_batch_size=8, max_wait_ms=50
+        )
+
+        async def scenario():
+            return await asyncio.gather(
+                scheduler.transcribe(self.segment(0), language="en", initial_prompt="one two"),
+                scheduler.transcribe(self.segment(1), language="en", initial_prompt="three"),
+                scheduler.transcribe(self.segment(2), language="en", initial_prompt=None),
+            )
+
+        results = asyncio.run(scenario())
+
+        self.assertEqual(results, ["segment 0", "segment 1", "segment 2"])
+        self.asr_service.transcribe_batch.assert_called_once()
+        kwargs = self.asr_service.transcribe_batch.call_args.kwargs
+        self.assertEqual(kwargs["initial_prompt"], ["one two", "three", None])
+        self.assertNotIn("prefix", kwargs)
+
+    def test_detailed_requests_are_batched_separately(self):
+        self.asr_service.transcribe_batch_detailed.side_effect = lambda audios, **kw: [
+            TranscriptionResult(f"detailed {int(audio[0])}") for audio in audios
+        ]
+        scheduler = BatchScheduler(
+            self.asr_service, self.executor, max_batch_size=8, max_wait_ms=50
+        )
+
+        async def scenario():
+            return await asyncio.gather(
+                scheduler.transcribe(self.segment(0), language="en"),
+                scheduler.transcribe_detailed(self.segment(1), language="en"),
+                scheduler.transcribe_detailed(self.segment(2), language="en"),
+            )
+
+        results = asyncio.run(scenario())
+
+        self.assertEqual(results[0], "segment 0")
+        self.assertEqual([r.text for r in results[1:]], ["detailed 1", "detailed 2"])
+        self.asr_service.transcribe_batch_detailed.assert_called_once()
+
+    def test_errors_are_propagated_to_every_caller(self):
+        self.asr_service.transcribe_batch.side_effect = RuntimeError("decode failed")
+        scheduler = BatchScheduler(
+            self.asr_service, self.executor, max_batch_size=8, max_wait_ms=20
+        )
+
+        async def scenario():
+            return await asyncio.gather(
+                scheduler.transcribe(self.segment(0)),
+                scheduler.transcribe(self.segment(1)),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(scenario())
+
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from src.decoding_profiles import get_profile, load_profiles
+
+
+class TestDecodingProfiles(unittest.TestCase):
+    def test_builtin_profiles(self):
+        profiles = load_profiles()
+
+        self.assertEqual(set(profiles), {"fast", "balanced", "accurate"})
+        self.assertEqual(profiles["fast"]["beam_size"], 1)
+        self.assertFalse(profiles["fast"]["vad_filter"])
+        self.assertTrue(profiles["accurate"]["vad_filter"])
+
+    def test_global_vad_filter_applies_to_profiles_without_one(self):
+        profiles = load_profiles(vad_filter=False)
+
+        self.assertFalse(profiles["balanced"]["vad_filter"])
+        self.assertTrue(profiles["accurate"]["vad_filter"])
+
+    def test_config_overrides_and_adds_profiles(self):
+        profiles = load_profiles(
+            {
+                "balanced": {"beam_size": 3},
+                "dictation": {"beam_size": 2, "temperature": 0.0},
+            }
+        )
+
+        self.assertEqual(profiles["balanced"]["beam_size"], 3)
+        self.assertEqual(profiles["balanced"]["best_of"], 5)
+        self.assertEqual(
+            profiles["dictation"], {"beam_size": 2, "temperature": 0.0, "vad_filter": True}
+        )
+
+    def test_unknown_options_and_profiles_are_rejected(self):
+        with self.assertRaises(ValueError):
+            load_profiles({"fast": {"beam": 1}})
+        with self.assertRaises(ValueError):
+            get_profile(load_profiles(), "turbo")
+
+    def test_get_profile_returns_a_copy(self):
+        profiles = load_profiles()
+        get_profile(profiles, "fast")["beam_size"] = 10
+
+        self.assertEqual(profiles["fast"]["beam_size"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,242 @@
+import asyncio
+import io
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import soundfile as sf
+
+from src.audio_processor import AudioProcessor
+from src.file_transcriber import FileTranscriber, resolve_input_path, segment_audio_file
+from src.model_registry import ModelRegistry, ModelStack
+from src.pipeline import Pipeline
+
+
+class FakeTranscriber:
+    def __init__(self):
+        self.calls = []
+
+    async def transcribe(self, audio, **options):
+        self.calls.append((len(audio), options))
+        return f"segment {len(self.calls)}"
+
+
+class ConcurrencyTranscriber:
+    """Records how many segments are decoded at the same time."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+
+    async def transcribe(self, audio, **options):
+        self.calls += 1
+        call = self.calls
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        # Later segments finish first: results must still come out in file order
+        await asyncio.sleep(0.05 / call)
+        self.in_flight -= 1
+        return f"segment {call}"
+
+
+class UpperStep:
+    name = "upper"
+
+    async def process(self, text, context):
+        return text.upper()
+
+
+def make_registry(transcriber):
+    return ModelRegistry(lambda name: ModelStack(None, None, transcriber), default_model="tiny")
+
+
+def make_processor():
+    return AudioProcessor(
+        sample_rate=16000,
+        silence_threshold=100,
+        silence_pause_duration=0.2,
+        max_accumulate_duration=5.0,
+        history_buffer_chunks=2,
+    )
+
+
+def make_wav(pattern, sample_rate=16000, channels=1):
+    """WAV file with (seconds, amplitude) sections."""
+    audio = np.concatenate(
+        [
+            np.full(int(seconds * sample_rate), amplitude, dtype=np.int16)
+            for seconds, amplitude in pattern
+        ]
+    )
+    if channels > 1:
+        audio = np.repeat(audio[:, None], channels, axis=1)
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, sample_rate, format="WAV", subtype="PCM_16")
+    buffer.seek(0)
+    return buffer
+
+
+class TestFileTranscriber(unittest.TestCase):
+    def test_segments_have_file_timestamps(self):
+        source = make_wav([(0.5, 0), (1.0, 1000), (0.5, 0), (1.0, 1000), (0.5, 0)])
+
+        segments, duration = segment_audio_file(source, make_processor())
+
+        self.assertAlmostEqual(duration, 3.5, places=1)
+        self.assertEqual(len(segments), 2)
+        self.assertLess(segments[0].start, 0.5)
+        self.assertGreater(segments[0].end, 1.5)
+        self.assertLess(segments[1].start, 2.0)
+        self.assertGreater(segments[1].end, 3.0)
+        for segment in segments:
+            self.assertEqual(len(segment.audio), round((segment.end - segment.start) * 16000))
+
+    def test_speech_at_end_of_file_is_flushed(self):
+        source = make_wav([(0.5, 0), (1.0, 1000)], channels=2)
+
+        segments, _ = segment_audio_file(source, make_processor())
+
+        self.assertEqual(len(segments), 1)
+        self.assertAlmostEqual(segments[0].end, 1.5, places=2)
+
+    def test_other_sample_rates_are_resampled(self):
+        source = make_wav([(0.5, 0), (1.0, 1000), (0.5, 0)], sample_rate=44100, channels=2)
+
+        segments, duration = segment_audio_file(source, make_processor())
+
+        self.assertAlmostEqual(duration, 2.0, places=1)
+        self.assertEqual(len(segments), 1)
+        self.assertLess(segments[0].start, 0.5)
+        self.assertGreater(segments[0].end, 1.5)
+        self.assertEqual(
+            len(segments[0].audio), round((segments[0].end - segments[0].start) * 16000)
+        )
+
+    def test_rejects_unsupported_sample_rates(self):
+        source = make_wav([(0.5, 1000)], sample_rate=4000)
+
+        with self.assertRaises(ValueError):
+            segment_audio_file(source, make_processor())
+
+    def test_transcribe_runs_pipeline_on_every_segment(self):
+        transcriber = FakeTranscriber()
+        pipeline = Pipeline()
+        pipeline.add_step(UpperStep())
+        file_transcriber = FileTranscriber(
+            make_registry(transcriber), pipeline, make_processor, language="en"
+        )
+        source = make_wav([(0.5, 0), (1.0, 1000), (0.5, 0), (1.0, 1000), (0.5, 0)])
+
+        result = asyncio.run(file_transcriber.transcribe(source))
+
+        self.assertEqual(result["text"], "SEGMENT 1 SEGMENT 2")
+        self.assertEqual([s["raw_text"] for s in result["segments"]], ["segment 1", "segment 2"])
+        self.assertEqual(result["language"], "en")
+        self.assertEqual(result["model"], "tiny")
+        self.assertTrue(all(options["language"] == "en" for _, options in transcriber.calls))
+
+    def test_segments_are_decoded_with_bounded_concurrency_in_order(self):
+        transcriber = ConcurrencyTranscriber()
+        file_transcriber = FileTranscriber(
+            make_registry(transcriber), Pipeline(), make_processor, max_concurrency=2
+        )
+        source = make_wav([(0.5, 0), (1.0, 1000)] * 5 + [(0.5, 0)])
+
+        result = asyncio.run(file_transcriber.transcribe(source))
+
+        self.assertEqual(transcriber.max_in_flight, 2)
+        self.assertEqual(
+            [s["raw_text"] for s in result["segments"]], [f"segment {i}" for i in range(1, 6)]
+        )
+        self.assertAlmostEqual(result["duration"], 8.0, places=1)
+
+    def test_job_reports_result(self):
+        file_transcriber = FileTranscriber(
+            make_registry(FakeTranscriber()), Pipeline(), make_processor
+        )
+        source = make_wav([(0.5, 0), (1.0, 1000), (0.5, 0)])
+
+        async def run():
+            job = file_transcriber.submit_job(source)
+            self.assertIs(file_transcriber.get_job(job.id), job)
+            while job.status in ("queued", "running"):
+                await asyncio.sleep(0.01)
+            return job
+
+        job = asyncio.run(run())
+
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.segments_done, job.segments_total)
+        self.assertEqual(job.to_dict()["result"]["text"], "segment 1")
+
+    def test_failed_job_keeps_error(self):
+        file_transcriber = FileTranscriber(
+            make_registry(FakeTranscriber()), Pipeline(), make_processor
+        )
+
+        async def run():
+            job = file_transcriber.submit_job(io.BytesIO(b"not audio"))
+            while job.status in ("queued", "running"):
+                await asyncio.sleep(0.01)
+            return job
+
+        job = asyncio.run(run())
+
+        self.assertEqual(job.status, "failed")
+        self.assertTrue(job.error)
+
+    def test_finished_jobs_are_evicted(self):
+        file_transcriber = FileTranscriber(
+            make_registry(FakeTranscriber()), Pipeline(), make_processor, max_finished_jobs=2
+        )
+
+        async def run():
+            jobs = []
+            for _ in range(3):
+                job = file_transcriber.submit_job(io.BytesIO(b"not audio"))
+                while job.status in ("queued", "running"):
+                    await asyncio.sleep(0.01)
+                jobs.append(job)
+            return jobs
+
+        jobs = asyncio.run(run())
+
+        self.assertIsNone(file_transcriber.get_job(jobs[0].id))
+        self.assertIs(file_transcriber.get_job(jobs[2].id), jobs[2])
+        self.assertEqual(len(file_transcriber.jobs), 2)
+
+        file_transcriber.job_ttl = 0
+        jobs[1].finished_at -= 1
+        jobs[2].finished_at -= 1
+        self.assertIsNone(file_transcriber.get_job(jobs[2].id))
+        self.assertEqual(file_transcriber.jobs, {})
+
+
+class TestResolveInputPath(unittest.TestCase):
+    def test_paths_inside_the_input_directory_are_resolved(self):
+        with tempfile.TemporaryDirectory() as input_dir:
+            root = os.path.realpath(input_dir)
+            self.assertEqual(
+                resolve_input_path(input_dir, "a.wav"), os.path.join(root, "a.wav")
+            )
+            self.assertEqual(
+                resolve_input_path(input_dir, os.path.join(root, "sub", "b.wav")),
+                os.path.join(root, "sub", "b.wav"),
+            )
+
+    def test_paths_outside_the_input_directory_are_rejected(self):
+        with tempfile.TemporaryDirectory() as input_dir:
+            os.symlink("/etc", os.path.join(input_dir, "link"))
+            for path in ("../secret.wav", "/etc/passwd", "link/passwd"):
+                with self.assertRaises(ValueError):
+                    resolve_input_path(input_dir, path)
+
+    def test_no_input_directory_disables_server_files(self):
+        with self.assertRaises(ValueError):
+            resolve_input_path("", "a.wav")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from src.inference_executor import InferenceExecutor
+
+
+class TestInferenceExecutor(unittest.TestCase):
+    def test_transcribe_runs_on_worker_thread(self):
+        """The blocking ASR call must not run on the event loop thread."""
+        calls = []
+
+        def fake_transcribe(audio, **kwargs):
+            calls.append((threading.current_thread().name, kwargs))
+            return "hello"
+
+        service = MagicMock()
+        service.transcribe_audio.side_effect = fake_transcribe
+        executor = InferenceExecutor(service, num_workers=1)
+
+        audio = np.zeros(16000, dtype=np.float32)
+        result = asyncio.run(executor.transcribe(audio, language="en"))
+        executor.shutdown()
+
+        self.assertEqual(result, "hello")
+        thread_name, kwargs = calls[0]
+        self.assertTrue(thread_name.startswith("asr-worker"))
+        self.assertEqual(kwargs["language"], "en")
+
+    def test_event_loop_stays_responsive(self):
+        """A slow decode must not stall other coroutines."""
+        service = MagicMock()
+        service.transcribe_audio.side_effect = lambda audio, **kw: time.sleep(0.3) or "slow"
+        executor = InferenceExecutor(service, num_workers=1)
+
+        async def scenario():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            ticker_task = asyncio.create_task(ticker())
+            result = await executor.transcribe(np.zeros(10, dtype=np.float32))
+            ticker_task.cancel()
+            return result, ticks
+
+        result, ticks = asyncio.run(scenario())
+        executor.shutdown()
+
+        self.assertEqual(result, "slow")
+        self.assertGreater(ticks, 5)
+
+    def test_stats_report_queue_and_workers(self):
+        """Jobs beyond the worker count wait in the queue and are reported as pending."""
+        release = threading.Event()
+        executor = InferenceExecutor(MagicMock(), num_workers=2, max_queue_size=3)
+
+        async def scenario():
+            jobs = [asyncio.create_task(executor.submit(release.wait)) for _ in range(5)]
+            await asyncio.sleep(0.05)
+            snapshot = executor.stats()
+            release.set()
+            await asyncio.gather(*jobs)
+            return snapshot
+
+        snapshot = asyncio.run(scenario())
+        executor.shutdown()
+
+        self.assertEqual(snapshot["pending"], 5)
+        self.assertEqual(snapshot["running"], 2)
+        self.assertEqual(executor.stats()["pending"], 0)
+
+    def test_queue_size_never_below_worker_count(self):
+        executor = InferenceExecutor(MagicMock(), num_workers=4, max_queue_size=2)
+        executor.shutdown()
+        self.assertEqual(executor.max_queue_size, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
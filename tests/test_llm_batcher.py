@@ -0,0 +1,108 @@
+import asyncio
+import unittest
+
+from src.llm_batcher import CorrectionBatcher
+
+
+class FakeLLMService:
+    def __init__(self, split=True, delay=0.01):
+        self.split = split
+        self.delay = delay
+        self.batch_calls = []
+        self.single_calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _request(self):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+
+    async def correct(self, text, on_delta=None):
+        self.single_calls.append(text)
+        await self._request()
+        return text.capitalize() + "."
+
+    async def correct_batch(self, texts):
+        self.batch_calls.append(list(texts))
+        await self._request()
+        if not self.split:
+            raise ValueError("Batched answer does not hold the corrections")
+        return [text.capitalize() + "." for text in texts]
+
+
+class TestCorrectionBatcher(unittest.TestCase):
+    def correct_all(self, batcher, texts):
+        async def scenario():
+            return await asyncio.gather(*(batcher.correct(text) for text in texts))
+
+        return asyncio.run(scenario())
+
+    def test_concurrent_texts_share_one_request(self):
+        service = FakeLLMService()
+        batcher = CorrectionBatcher(service, max_batch_size=8, max_wait_ms=50)
+
+        results = self.correct_all(batcher, ["yes", "next line", "okay"])
+
+        self.assertEqual(results, ["Yes.", "Next line.", "Okay."])
+        self.assertEqual(service.batch_calls, [["yes", "next line", "okay"]])
+        self.assertEqual(service.single_calls, [])
+        self.assertEqual(batcher.stats()["requests"], 1)
+
+    def test_single_text_uses_a_plain_request(self):
+        service = FakeLLMService()
+        batcher = CorrectionBatcher(service, max_wait_ms=10)
+
+        self.assertEqual(self.correct_all(batcher, ["yes"]), ["Yes."])
+        self.assertEqual(service.batch_calls, [])
+        self.assertEqual(service.single_calls, ["yes"])
+
+    def test_unsplittable_answer_falls_back_to_single_requests(self):
+        service = FakeLLMService(split=False)
+        batcher = CorrectionBatcher(service, max_wait_ms=50)
+
+        results = self.correct_all(batcher, ["yes", "okay"])
+
+        self.assertEqual(results, ["Yes.", "Okay."])
+        self.assertEqual(sorted(service.single_calls), ["okay", "yes"])
+        self.assertEqual(batcher.stats()["split_failures"], 1)
+
+    def test_parallel_mode_caps_concurrency(self):
+        service = FakeLLMService()
+        batcher = CorrectionBatcher(
+            service, mode="parallel", max_batch_size=8, max_wait_ms=50, max_concurrency=2
+        )
+
+        texts = [f"text {i}" for i in range(6)]
+        results = self.correct_all(batcher, texts)
+
+        self.assertEqual(results, [f"Text {i}." for i in range(6)])
+        self.assertEqual(service.batch_calls, [])
+        self.assertEqual(service.max_in_flight, 2)
+        self.assertEqual(batcher.stats()["batch_size_histogram"], {6: 1})
+
+    def test_request_errors_reach_every_caller(self):
+        service = FakeLLMService()
+
+        async def failing_batch(texts):
+            raise ConnectionError("LLM down")
+
+        service.correct_batch = failing_batch
+        batcher = CorrectionBatcher(service, max_wait_ms=50)
+
+        async def scenario():
+            return await asyncio.gather(
+                *(batcher.correct(text) for text in ("yes", "okay")), return_exceptions=True
+            )
+
+        results = asyncio.run(scenario())
+        self.assertTrue(all(isinstance(result, ConnectionError) for result in results))
+
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            CorrectionBatcher(FakeLLMService(), mode="fastest")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,30 @@
+import asyncio
+import os
+import tempfile
 import unittest
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, patch
 
-from src.llm_service import LLMService
+from src.llm_service import (
+    CircuitBreaker,
+    CorrectionCache,
+    LLMService,
+    TextStreamExtractor,
+    clean_llm_output,
+)
+from src.steps.llm_step import LLMCorrectionStep
+
+
+def stream_chunks(*tokens, error=None):
+    """Async iterator shaped like the chunks of a streamed chat completion."""
+
+    async def chunks():
+        for token in tokens:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+        if error is not None:
+            raise error
+
+    return chunks()
 
 
 class TestLLMService(unittest.TestCase):
@@ -46,10 +69,328 @@ class TestLLMService(unittest.TestCase):
         import asyncio
 
         original = "Original text"
-        result = asyncio.run(service.process_text(original))
+        errors = []
+        result = asyncio.run(service.process_text(original, on_error=errors.append))
 
-        # Should fallback to original text
+        # Should fallback to original text, and report the failure
         self.assertEqual(result, original)
+        self.assertEqual([str(e) for e in errors], ["API Error"])
+
+    @patch("src.llm_service.AsyncOpenAI")
+    def test_streaming_forwards_corrected_text(self, MockOpenAI):
+        """In streaming mode, the text inside the tags is forwarded as tokens arrive."""
+        mock_client = MockOpenAI.return_value
+        sentence = "This first sentence is long enough to not be a header."
+        tokens = ["Voici le texte corrigé :\n", "[[TE", "XT]]", sentence]
+        tokens += [" Then", " more", ".[[", "TEXT]]"]
+        mock_client.chat.completions.create = AsyncMock(return_value=stream_chunks(*tokens))
+
+        deltas = []
+
+        async def on_delta(delta):
+            deltas.append(delta)
+
+        service = LLMService(enabled=True, streaming=True)
+        import asyncio
+
+        result = asyncio.run(service.process_text("this first sentence", on_delta=on_delta))
+
+        self.assertEqual(result, sentence + " Then more.")
+        self.assertEqual(deltas, [sentence, " Then", " more", "."])
+        self.assertTrue(mock_client.chat.completions.create.call_args.kwargs["stream"])
+
+    @patch("src.llm_service.AsyncOpenAI")
+    def test_streaming_fallback_on_error(self, MockOpenAI):
+        """A stream failing midway falls back to the original text."""
+        mock_client = MockOpenAI.return_value
+        mock_client.chat.completions.create = AsyncMock(
+            return_value=stream_chunks("[[TEXT]]Hel", error=Exception("Stream Error"))
+        )
+
+        service = LLMService(enabled=True, streaming=True)
+        import asyncio
+
+        result = asyncio.run(service.process_text("hello", on_delta=AsyncMock()))
+
+        self.assertEqual(result, "hello")
+
+
+    @patch("src.llm_service.AsyncOpenAI")
+    def test_repeated_input_is_served_from_cache(self, MockOpenAI):
+        """A repeat (up to case and spacing) does not call the LLM again."""
+        mock_client = MockOpenAI.return_value
+        mock_response = AsyncMock()
+        mock_response.choices = [AsyncMock(message=AsyncMock(content="[[TEXT]]Okay.[[TEXT]]"))]
+        mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+
+        service = LLMService(enabled=True, cache=CorrectionCache())
+        import asyncio
+
+        results = [asyncio.run(service.process_text(text)) for text in ("okay", " Okay ")]
+
+        self.assertEqual(results, ["Okay.", "Okay."])
+        mock_client.chat.completions.create.assert_called_once()
+        self.assertEqual(service.stats()["cache"]["hits"], 1)
+        self.assertEqual(service.stats()["cache"]["misses"], 1)
+
+    @patch("src.llm_service.AsyncOpenAI")
+    def test_fallbacks_are_not_cached(self, MockOpenAI):
+        mock_client = MockOpenAI.return_value
+        mock_client.chat.completions.create = AsyncMock(side_effect=Exception("API Error"))
+
+        cache = CorrectionCache()
+        service = LLMService(enabled=True, cache=cache)
+        import asyncio
+
+        asyncio.run(service.process_text("okay"))
+
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+    @patch("src.llm_service.AsyncOpenAI")
+    def test_correct_batch_splits_the_answer(self, MockOpenAI):
+        """A batched answer is split back into one cleaned correction per text."""
+        mock_client = MockOpenAI.return_value
+        mock_response = AsyncMock()
+        content = '[[TEXT]]["Yes.", "[[TEXT]]Next line.[[TEXT]]"][[TEXT]]'
+        mock_response.choices = [AsyncMock(message=AsyncMock(content=content))]
+        mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+
+        service = LLMService(enabled=True)
+        result = asyncio.run(service.correct_batch(["yes", "next line"]))
+
+        self.assertEqual(result, ["Yes.", "Next line."])
+        user_message = mock_client.chat.completions.create.call_args.kwargs["messages"][1]
+        self.assertIn('["yes", "next line"]', user_message["content"])
+
+    @patch("src.llm_service.AsyncOpenAI")
+    def test_correct_batch_rejects_unsplittable_answer(self, MockOpenAI):
+        mock_client = MockOpenAI.return_value
+        mock_response = AsyncMock()
+        mock_response.choices = [AsyncMock(message=AsyncMock(content='["Yes. Next line."]'))]
+        mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+
+        service = LLMService(enabled=True)
+        with self.assertRaises(ValueError):
+            asyncio.run(service.correct_batch(["yes", "next line"]))
+
+class TestCorrectionCache(unittest.TestCase):
+    def test_key_depends_on_model_and_prompt(self):
+        key = CorrectionCache.key("Okay", "llama3", "prompt")
+        self.assertEqual(key, CorrectionCache.key(" okay  ", "llama3", "prompt"))
+        self.assertNotEqual(key, CorrectionCache.key("okay", "mistral", "prompt"))
+        self.assertNotEqual(key, CorrectionCache.key("okay", "llama3", "other prompt"))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = CorrectionCache(max_entries=2)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        cache.get("a")
+        cache.put("c", "C")
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "A")
+        self.assertEqual(cache.get("c"), "C")
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_entries_expire(self):
+        cache = CorrectionCache(ttl=60)
+        with patch("src.llm_service.time.time", return_value=1000.0):
+            cache.put("a", "A")
+        with patch("src.llm_service.time.time", return_value=1059.0):
+            self.assertEqual(cache.get("a"), "A")
+        with patch("src.llm_service.time.time", return_value=1061.0):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_entries_persist_across_restarts(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "corrections.db")
+            cache = CorrectionCache(max_entries=2, path=path)
+            for key in ("a", "b", "c"):
+                cache.put(key, key.upper())
+            cache.close()
+
+            reloaded = CorrectionCache(max_entries=2, path=path)
+            self.assertIsNone(reloaded.get("a"))
+            self.assertEqual(reloaded.get("b"), "B")
+            self.assertEqual(reloaded.get("c"), "C")
+            reloaded.close()
+
+class TestTextStreamExtractor(unittest.TestCase):
+    ANSWERS = [
+        "[[TEXT]]Hello, world.[[TEXT]]",
+        "Here is the corrected text:\n[[TEXT]]Hello [world].[[TEXT]] Hope it helps!",
+        "[[TEXT]]Corrected transcription:\nLine one.\nLine two.[[TEXT]]",
+        "[[Hello world]]",
+        "[[]] Hello world. [[]]",
+        "Hello world, no tags at all in this answer, which goes on for quite a while.",
+        "Output:\nHello world, without tags either but with a header line to remove.",
+    ]
+
+    def extract(self, tokens):
+        extractor = TextStreamExtractor()
+        deltas = [extractor.feed(token) for token in tokens]
+        deltas.append(extractor.finish())
+        return "".join(deltas)
+
+    def test_matches_clean_llm_output(self):
+        """Fed at once or character by character, the stream gives the complete answer's text."""
+        for answer in self.ANSWERS:
+            with self.subTest(answer=answer):
+                self.assertEqual(self.extract([answer]), clean_llm_output(answer))
+                self.assertEqual(self.extract(list(answer)), clean_llm_output(answer))
+
+    def test_text_is_forwarded_before_the_end(self):
+        """Text is released as soon as it cannot be part of a tag or header."""
+        extractor = TextStreamExtractor()
+        self.assertEqual(extractor.feed("[[TEXT]]"), "")
+        sentence = "This first sentence is long enough to not be a header."
+        self.assertEqual(extractor.feed(sentence), sentence)
+        self.assertEqual(extractor.feed(" Then ["), " Then")
+        self.assertEqual(extractor.feed("[TEXT]] trailing chatter"), "")
+        self.assertEqual(extractor.finish(), "")
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_repeated_failures_then_tries_once(self):
+        breaker = CircuitBreaker(failure_threshold=2, cooldown=30)
+        with patch("src.llm_service.time.monotonic", return_value=100.0):
+            breaker.record_failure()
+            self.assertTrue(breaker.allow())
+            breaker.record_failure()
+            self.assertEqual(breaker.state, "open")
+            self.assertFalse(breaker.allow())
+
+        with patch("src.llm_service.time.monotonic", return_value=131.0):
+            self.assertTrue(breaker.allow())
+            # Only one trial while it is in flight
+            self.assertFalse(breaker.allow())
+            breaker.record_failure()
+            self.assertFalse(breaker.allow())
+
+        with patch("src.llm_service.time.monotonic", return_value=162.0):
+            self.assertTrue(breaker.allow())
+            breaker.record_success()
+            self.assertEqual(breaker.state, "closed")
+            self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.stats()["trips"], 2)
+
+
+class TestLLMCorrectionStep(unittest.TestCase):
+    CONFIG = {
+        "llm_enabled": True,
+        "llm_url": "http://localhost:11434/v1",
+        "llm_api_key": "ollama",
+        "llm_model": "llama3",
+        "llm_cache_size": 0,
+        "llm_budget_ms": 50,
+        "llm_breaker_failures": 2,
+        "llm_breaker_cooldown": 30,
+    }
+
+    def make_step(self, delay, fail=False, cache_size=0):
+        requests = []
+
+        async def request_correction(text, on_delta=None, on_error=None):
+            requests.append(text)
+            await asyncio.sleep(delay)
+            if fail:
+                on_error(RuntimeError("LLM unreachable"))
+                return text
+            return text.capitalize() + "."
+
+        with patch("src.llm_service.AsyncOpenAI"):
+            step = LLMCorrectionStep({**self.CONFIG, "llm_cache_size": cache_size})
+        step._llm_service.request_correction = request_correction
+        step.requests = requests
+        return step
+
+    def test_correction_within_budget(self):
+        step = self.make_step(delay=0)
+        self.assertEqual(asyncio.run(step.process("hello", {})), "Hello.")
+        self.assertEqual(step.stats()["timeouts"], 0)
+
+    def test_late_correction_is_handed_to_the_session(self):
+        step = self.make_step(delay=0.2)
+
+        async def run():
+            late = []
+            context = {"on_late_correction": lambda correction, step: late.append(correction)}
+            result = await step.process("hello", context)
+            return result, await late[0]
+
+        result, late_result = asyncio.run(run())
+        self.assertEqual(result, "hello")
+        self.assertEqual(late_result, "Hello.")
+
+    def test_repeated_timeouts_skip_the_llm(self):
+        step = self.make_step(delay=0.2)
+
+        async def run():
+            return [await step.process(text, {}) for text in ("one", "two", "three")]
+
+        self.assertEqual(asyncio.run(run()), ["one", "two", "three"])
+        stats = step.stats()
+        self.assertEqual((stats["timeouts"], stats["skipped"]), (2, 1))
+        self.assertEqual(stats["breaker"]["state"], "open")
+
+    def test_failed_requests_open_the_breaker(self):
+        step = self.make_step(delay=0, fail=True)
+
+        async def run():
+            return [await step.process(text, {}) for text in ("one", "two", "three")]
+
+        self.assertEqual(asyncio.run(run()), ["one", "two", "three"])
+        stats = step.stats()
+        self.assertEqual((stats["errors"], stats["timeouts"], stats["skipped"]), (2, 0, 1))
+        self.assertEqual(stats["breaker"]["state"], "open")
+
+    def test_cached_corrections_are_served_while_the_breaker_is_open(self):
+        step = self.make_step(delay=0, cache_size=8)
+        service = step._llm_service
+        key = CorrectionCache.key("okay", service.model, service.system_prompt)
+        service.cache.put(key, "Okay.")
+        step.breaker.record_failure()
+        step.breaker.record_failure()
+
+        self.assertEqual(asyncio.run(step.process("okay", {})), "Okay.")
+        self.assertEqual(asyncio.run(step.process("other", {})), "other")
+        self.assertEqual(step.requests, [])
+        self.assertEqual(step.stats()["skipped"], 1)
+
+    def test_cache_hit_does_not_use_the_half_open_trial(self):
+        step = self.make_step(delay=0, cache_size=8)
+        service = step._llm_service
+        key = CorrectionCache.key("okay", service.model, service.system_prompt)
+        service.cache.put(key, "Okay.")
+        step.breaker.record_failure()
+        step.breaker.record_failure()
+        step.breaker._opened_at -= step.breaker.cooldown
+
+        self.assertEqual(asyncio.run(step.process("okay", {})), "Okay.")
+        self.assertEqual(step.breaker.state, "half_open")
+        self.assertEqual(asyncio.run(step.process("other", {})), "Other.")
+        self.assertEqual(step.requests, ["other"])
+        self.assertEqual(step.breaker.state, "closed")
+
+    def test_cancelled_trial_releases_the_breaker(self):
+        step = self.make_step(delay=1)
+        step.breaker.record_failure()
+        step.breaker.record_failure()
+        step.breaker._opened_at -= step.breaker.cooldown
+
+        async def run():
+            trial = asyncio.ensure_future(step.process("hello", {}))
+            await asyncio.sleep(0.01)
+            trial.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await trial
+
+        asyncio.run(run())
+        self.assertEqual(step.breaker.state, "half_open")
+        self.assertTrue(step.breaker.allow())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,474 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+import src.main as main
+from src.audio_codec import OpusEncoder
+from src.interfaces import ProcessingStep
+from src.protocol import FLAG_END_OF_STREAM, FORMAT_OPUS, Frame, encode_frame
+from src.transcription import SegmentResult, TranscriptionResult, WordResult
+
+
+class FakeTranscriber:
+    async def transcribe(self, audio, **options):
+        return "hello"
+
+    async def transcribe_detailed(self, audio, **options):
+        word = WordResult(0.1, 0.4, " hello", 0.95)
+        words = [word] if options.get("word_timestamps") else []
+        segment = SegmentResult(0.1, 0.4, "hello", -0.25, 0.02, words)
+        return TranscriptionResult("hello", [segment], language="fr", language_probability=0.99)
+
+
+class CountingTranscriber:
+    def __init__(self):
+        self.calls = 0
+
+    async def transcribe(self, audio, **options):
+        self.calls += 1
+        return f"segment {self.calls}"
+
+
+class WaitForNextSegmentStep(ProcessingStep):
+    """Holds the first text until the next segment was transcribed meanwhile."""
+
+    def __init__(self, transcriber):
+        self.transcriber = transcriber
+        self.overlapped = None
+
+    @property
+    def name(self):
+        return "wait_for_next_segment"
+
+    async def process(self, text, context=None):
+        if self.overlapped is None:
+            for _ in range(100):
+                if self.transcriber.calls >= 2:
+                    break
+                await asyncio.sleep(0.02)
+            self.overlapped = self.transcriber.calls >= 2
+        return text
+
+
+class StreamingCorrectionStep(ProcessingStep):
+    """Forwards its correction in two pieces, like the LLM step in streaming mode."""
+
+    @property
+    def name(self):
+        return "streaming_correction"
+
+    async def process(self, text, context=None):
+        for delta in ("Hello", " there."):
+            await context["on_delta"](delta)
+        return "Hello there."
+
+
+class LateCorrectionStep(ProcessingStep):
+    """Misses its latency budget: lets the raw text through and corrects it afterwards."""
+
+    @property
+    def name(self):
+        return "late_correction"
+
+    async def process(self, text, context=None):
+        async def correct():
+            await asyncio.sleep(0.05)
+            return "Hello."
+
+        context["on_late_correction"](asyncio.ensure_future(correct()), self.name)
+        return text
+
+
+class CensorStep(ProcessingStep):
+    """A plugin running after the LLM step."""
+
+    @property
+    def name(self):
+        return "censor"
+
+    async def process(self, text, context=None):
+        return text.replace("Hello", "****").replace("hello", "****")
+
+
+class HeldCorrectionStep(ProcessingStep):
+    """Holds every text until the test releases it."""
+
+    def __init__(self):
+        self.holding = False
+        self.release = threading.Event()
+
+    @property
+    def name(self):
+        return "held_correction"
+
+    async def process(self, text, context=None):
+        self.holding = True
+        while not self.release.is_set():
+            await asyncio.sleep(0.01)
+        return text
+
+
+class HoldAwareTranscriber:
+    """Tells whether a text was decoded while the step held a previous segment."""
+
+    def __init__(self, step):
+        self.step = step
+
+    async def transcribe(self, audio, **options):
+        return "held" if self.step.holding and not self.step.release.is_set() else "hello"
+
+
+class TestDefaultConfig(unittest.TestCase):
+    def test_segments_are_only_split_when_chunks_decode_concurrently(self):
+        cases = [
+            ({"ASR_WORKERS": "1", "BATCHING_ENABLED": "false"}, 0.0),
+            ({"ASR_WORKERS": "2", "BATCHING_ENABLED": "false"}, 6.0),
+            ({"ASR_WORKERS": "1", "BATCHING_ENABLED": "true"}, 6.0),
+            ({"ASR_WORKERS": "1", "PARALLEL_CHUNK_DURATION": "4"}, 4.0),
+        ]
+        for env, duration in cases:
+            with self.subTest(env=env), patch.dict(os.environ, env):
+                self.assertEqual(main.get_config()["parallel_chunk_duration"], duration)
+
+
+class TestServerStartup(unittest.TestCase):
+    def setUp(self):
+        self.original_loader = main.model_registry.loader
+        self.loads = []
+
+        def loader(name):
+            time.sleep(0.2)
+            self.loads.append(name)
+            return SimpleNamespace(transcriber=FakeTranscriber())
+
+        main.model_registry.loader = loader
+        main.startup_state.update(status="starting", error=None, startup_time_s=None)
+
+    def tearDown(self):
+        main.model_registry.loader = self.original_loader
+        main.model_registry.close()
+        main.text_pipeline.steps.clear()
+
+    def test_import_does_not_load_heavy_modules(self):
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, src.main; "
+                "print(','.join(m for m in ('torch', 'faster_whisper', 'openai') "
+                "if m in sys.modules))",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_readyz_reports_ready_once_model_is_loaded(self):
+        with TestClient(main.app) as client:
+            response = client.get("/readyz")
+            self.assertEqual(response.status_code, 503)
+            self.assertIn(response.json()["status"], ("starting", "loading"))
+
+            for _ in range(100):
+                response = client.get("/readyz")
+                if response.status_code == 200:
+                    break
+                time.sleep(0.02)
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["status"], "ready")
+            self.assertEqual(client.get("/healthz").status_code, 200)
+            self.assertEqual(self.loads, [main.config["model_size"]])
+
+    def wait_until_ready(self, client):
+        for _ in range(100):
+            if client.get("/readyz").status_code == 200:
+                return
+            time.sleep(0.02)
+        self.fail("server never became ready")
+
+    def speak_then_pause(self, ws):
+        loud = np.full(1024, 1000, dtype=np.int16).tobytes()
+        silence = np.zeros(1024, dtype=np.int16).tobytes()
+        for _ in range(8):
+            ws.send_bytes(loud)
+        for _ in range(20):
+            ws.send_bytes(silence)
+
+    def test_plain_protocol_sends_bare_text(self):
+        with TestClient(main.app) as client:
+            self.wait_until_ready(client)
+            with client.websocket_connect("/ws/asr") as ws:
+                self.speak_then_pause(ws)
+                self.assertEqual(ws.receive_text(), "hello")
+
+    def test_next_segment_is_transcribed_while_text_pipeline_runs(self):
+        transcriber = CountingTranscriber()
+        step = WaitForNextSegmentStep(transcriber)
+        main.model_registry.loader = lambda name: SimpleNamespace(transcriber=transcriber)
+        main.text_pipeline.add_step(step)
+
+        with TestClient(main.app) as client:
+            self.wait_until_ready(client)
+            with client.websocket_connect("/ws/asr") as ws:
+                self.speak_then_pause(ws)
+                self.speak_then_pause(ws)
+                texts = [ws.receive_text(), ws.receive_text()]
+
+        self.assertTrue(step.overlapped)
+        self.assertEqual(texts, ["segment 1", "segment 2"])
+
+    def test_declared_raw_format_is_resampled(self):
+        loud = np.full(3072, 0.05, dtype=np.float32).tobytes()
+        silence = np.zeros(3072, dtype=np.float32).tobytes()
+        with TestClient(main.app) as client:
+            self.wait_until_ready(client)
+            with client.websocket_connect("/ws/asr?sample_rate=48000&dtype=float32") as ws:
+                for _ in range(8):
+                    ws.send_bytes(loud)
+                for _ in range(20):
+                    ws.send_bytes(silence)
+                self.assertEqual(ws.receive_text(), "hello")
+
+    def test_detailed_protocol_sends_timestamps_and_timings(self):
+        with TestClient(main.app) as client:
+            self.wait_until_ready(client)
+            with client.websocket_connect("/ws/asr?detail=true") as ws:
+                self.speak_then_pause(ws)
+                message = ws.receive_json()
+
+        self.assertEqual(message["type"], "final")
+        self.assertEqual(message["text"], "hello")
+        self.assertEqual(message["raw_text"], "hello")
+        self.assertEqual(message["language"], "fr")
+        self.assertLess(message["start"], message["end"])
+        segment = message["segments"][0]
+        self.assertAlmostEqual(segment["start"], message["start"] + 0.1, places=3)
+        self.assertEqual(segment["avg_logprob"], -0.25)
+        self.assertEqual(segment["no_speech_prob"], 0.02)
+        self.assertEqual(segment["words"][0]["word"], " hello")
+        self.assertEqual(
+            set(message["timings"]), {"vad_ms", "asr_ms", "pipeline_ms", "total_ms"}
+        )
+
+    def test_streaming_protocol_forwards_corrections_before_final(self):
+        main.text_pipeline.add_step(StreamingCorrectionStep())
+        with TestClient(main.app) as client:
+            self.wait_until_ready(client)
+            with client.websocket_connect("/ws/asr?stream=true") as ws:
+                self.speak_then_pause(ws)
+                messages = []
+                while not messages or messages[-1]["type"] != "final":
+                    message = ws.receive_json()
+                    if message["type"] != "partial":
+                        messages.append(message)
+
+        self.assertEqual(
+            messages,
+            [
+                {"type": "correction", "segment": 0, "delta": "Hello"},
+                {"type": "correction", "segment": 0, "delta": " there."},
+                {"type": "final", "segment": 0, "text": "Hello there."},
+            ],
+        )
+
+    def test_partials_are_sent_while_previous_final_is_pending(self):
+        step = HeldCorrectionStep()
+        transcriber = HoldAwareTranscriber(step)
+        main.model_registry.loader = lambda name: SimpleNamespace(transcriber=transcriber)
+        main.text_pipeline.add_step(step)
+        loud = np.full(1024, 1000, dtype=np.int16).tobytes()
+        with TestClient(main.app) as client:
+            self.wait_until_ready(client)
+            with client.websocket_connect("/ws/asr?stream=true") as ws:
+                self.speak_then_pause(ws)
+                # The next segment: one partial interval of speech
+                for _ in range(20):
+                    ws.send_bytes(loud)
+                # Released after a while, so the final still comes if partials wait for it
+                timer = threading.Timer(1.0, step.release.set)
+                timer.start()
+                messages = [ws.receive_json()]
+                while messages[-1]["type"] != "final":
+                    messages.append(ws.receive_json())
+                timer.cancel()
+
+        # Partials of the next segment come before the final of the first one
+        self.assertIn(
+            {"type": "partial", "text": "held", "committed": "", "unstable": "held", "segment": 1},
+            messages,
+        )
+        self.assertEqual(messages[-1], {"type": "final", "segment": 0, "text": "hello"})
+
+    def test_late_correction_replaces_final(self):
+        main.text_pipeline.add_step(LateCorrectionStep())
+        with TestClient(main.app) as client:
+            self.wait_until_ready(client)
+            with client.websocket_connect("/ws/asr?stream=true") as ws:
+                self.speak_then_pause(ws)
+                messages = []
+                while not messages or messages[-1]["type"] != "replace":
+                    message = ws.receive_json()
+                    if message["type"] != "partial":
+                        messages.append(message)
+
+        self.assertEqual(
+            messages,
+            [
+                {"type": "final", "segment": 0, "text": "hello"},
+                {"type": "replace", "segment": 0, "text": "Hello."},
+            ],
+        )
+
+    def test_late_correction_goes_through_the_following_steps(self):
+        main.text_pipeline.add_step(LateCorrectionStep())
+        main.text_pipeline.add_step(CensorStep())
+        with TestClient(main.app) as client:
+            self.wait_until_ready(client)
+            with client.websocket_connect("/ws/asr?stream=true") as ws:
+                self.speak_then_pause(ws)
+                messages = []
+                while not messages or messages[-1]["type"] != "replace":
+                    message = ws.receive_json()
+                    if message["type"] != "partial":
+                        messages.append(message)
+
+        self.assertEqual(
+            messages,
+            [
+                {"type": "final", "segment": 0, "text": "****"},
+                {"type": "replace", "segment": 0, "text": "****."},
+            ],
+        )
+
+    def test_framed_protocol_grants_credits_and_flushes_at_end_of_stream(self):
+        loud = np.full(1024, 1000, dtype=np.int16).tobytes()
+        with TestClient(main.app) as client:
+            self.wait_until_ready(client)
+            with client.websocket_connect("/ws/asr?protocol=framed") as ws:
+                hello = ws.receive_json()
+                credit = ws.receive_json()
+                for sequence in range(8):
+                    flags = FLAG_END_OF_STREAM if sequence == 7 else 0
+                    ws.send_bytes(encode_frame(Frame(sequence, loud, flags=flags)))
+                message = ws.receive_json()
+
+        self.assertEqual(hello["type"], "hello")
+        self.assertIn("opus", hello["formats"])
+        self.assertEqual(credit, {"type": "credit", "credits": main.config["max_pending_frames"]})
+        self.assertEqual(message, {"type": "final", "segment": 0, "text": "hello"})
+
+    def test_framed_protocol_decodes_opus(self):
+        tone = (3000 * np.sin(2 * np.pi * 440 * np.arange(8192) / 16000)).astype(np.int16)
+        encoder = OpusEncoder()
+        packets = [p for i in range(0, len(tone), 1024) for p in encoder.encode(tone[i : i + 1024])]
+        with TestClient(main.app) as client:
+            self.wait_until_ready(client)
+            with client.websocket_connect("/ws/asr?protocol=framed") as ws:
+                ws.receive_json()
+                ws.receive_json()
+                for sequence, packet in enumerate(packets):
+                    flags = FLAG_END_OF_STREAM if sequence == len(packets) - 1 else 0
+                    ws.send_bytes(
+                        encode_frame(Frame(sequence, packet, format=FORMAT_OPUS, flags=flags))
+                    )
+                message = ws.receive_json()
+                while message["type"] == "credit":
+                    message = ws.receive_json()
+
+        self.assertEqual(message, {"type": "final", "segment": 0, "text": "hello"})
+
+    def test_framed_protocol_rejects_malformed_frames(self):
+        with TestClient(main.app) as client:
+            self.wait_until_ready(client)
+            with client.websocket_connect("/ws/asr?protocol=framed") as ws:
+                ws.receive_json()
+                ws.receive_json()
+                ws.send_bytes(b"not a frame")
+                message = ws.receive_json()
+
+        self.assertEqual(message["type"], "error")
+
+    def test_transcribe_rejects_oversized_uploads(self):
+        with TestClient(main.app) as client:
+            self.wait_until_ready(client)
+            max_upload_mb = main.config["max_upload_mb"]
+            main.config["max_upload_mb"] = 1 / 1024
+            try:
+                response = client.post("/v1/transcribe", content=b"\0" * 2048)
+            finally:
+                main.config["max_upload_mb"] = max_upload_mb
+
+        self.assertEqual(response.status_code, 413)
+
+    def test_transcribe_rejects_paths_outside_the_input_directory(self):
+        with TestClient(main.app) as client:
+            self.wait_until_ready(client)
+            main.config["input_dir"] = ""
+            disabled = client.post("/v1/transcribe", params={"path": "a.wav"})
+            main.config["input_dir"] = os.path.dirname(__file__)
+            try:
+                outside = client.post("/v1/transcribe", params={"path": "/etc/passwd"})
+                missing = client.post("/v1/transcribe", params={"path": "missing.wav"})
+            finally:
+                main.config["input_dir"] = ""
+
+        self.assertEqual(disabled.status_code, 403)
+        self.assertEqual(outside.status_code, 403)
+        self.assertEqual(missing.status_code, 404)
+
+    def test_failed_model_load_closes_the_session(self):
+        default_loader = main.model_registry.loader
+
+        def loader(name):
+            if name == "tiny":
+                raise RuntimeError("download failed")
+            return default_loader(name)
+
+        main.model_registry.loader = loader
+        available_models = main.model_registry.available_models
+        main.model_registry.available_models = available_models + ["tiny"]
+        try:
+            with TestClient(main.app) as client:
+                self.wait_until_ready(client)
+                with client.websocket_connect("/ws/asr?model=tiny") as ws:
+                    with self.assertRaises(WebSocketDisconnect) as closed:
+                        ws.receive_text()
+            stats = main.model_registry.stats()["models"]
+        finally:
+            main.model_registry.available_models = available_models
+
+        self.assertEqual(closed.exception.code, 1011)
+        self.assertEqual(stats["tiny"]["sessions"], 0)
+        self.assertEqual(main.active_sessions, {})
+
+    def test_readyz_reports_failed_load(self):
+        def failing_loader(name):
+            raise RuntimeError("no model")
+
+        main.model_registry.loader = failing_loader
+        with TestClient(main.app) as client:
+            for _ in range(100):
+                body = client.get("/readyz").json()
+                if body["status"] != "loading":
+                    break
+                time.sleep(0.02)
+
+            self.assertEqual(body["status"], "failed")
+            self.assertEqual(body["error"], "no model")
+            self.assertEqual(client.get("/healthz").status_code, 503)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from src.model_registry import DEFAULT_MEMORY_BUDGET_MB, ModelRegistry
+
+MB = 1024 * 1024
+
+
+class FakeModel:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.loaded = []
+        # Every load grows the measured RSS by 100 MB
+        self.rss = 0
+        rss_patch = patch("src.model_registry.current_rss_bytes", side_effect=lambda: self.rss)
+        rss_patch.start()
+        self.addCleanup(rss_patch.stop)
+
+    def loader(self, name):
+        self.loaded.append(name)
+        self.rss += 100 * MB
+        return FakeModel(name)
+
+    def registry(self, budget_mb=0):
+        return ModelRegistry(
+            self.loader,
+            default_model="small",
+            available_models=["tiny", "small", "medium"],
+            memory_budget_mb=budget_mb,
+        )
+
+    def test_models_load_lazily_once(self):
+        registry = self.registry()
+
+        async def scenario():
+            models = await asyncio.gather(*(registry.acquire("tiny") for _ in range(3)))
+            return models
+
+        models = asyncio.run(scenario())
+
+        self.assertEqual(self.loaded, ["tiny"])
+        self.assertTrue(all(model is models[0] for model in models))
+        stats = registry.stats()["models"]["tiny"]
+        self.assertEqual(stats["sessions"], 3)
+        self.assertEqual(stats["rss_mb"], 100)
+        self.assertEqual(stats["loads"], 1)
+
+    def test_default_and_unknown_models(self):
+        registry = self.registry()
+
+        self.assertEqual(registry.resolve(None), "small")
+        with self.assertRaises(ValueError):
+            registry.resolve("large-v9")
+
+    def test_only_default_model_is_available_by_default(self):
+        registry = ModelRegistry(self.loader, default_model="small")
+
+        self.assertEqual(registry.resolve("small"), "small")
+        with self.assertRaises(ValueError):
+            registry.resolve("tiny")
+        self.assertEqual(registry.memory_budget, DEFAULT_MEMORY_BUDGET_MB * MB)
+
+    def test_idle_models_are_evicted_lru_beyond_budget(self):
+        registry = self.registry(budget_mb=250)
+        tiny = registry.load("tiny")
+        small = registry.load("small")
+        # Use tiny again so small becomes the least recently used
+        asyncio.run(registry.acquire("tiny"))
+        registry.release("tiny")
+
+        medium = registry.load("medium")
+
+        self.assertTrue(small.closed)
+        self.assertFalse(tiny.closed)
+        self.assertFalse(medium.closed)
+        stats = registry.stats()
+        self.assertFalse(stats["models"]["small"]["loaded"])
+        self.assertEqual(stats["models"]["small"]["evictions"], 1)
+        self.assertEqual(stats["loaded_rss_mb"], 200)
+
+    def test_models_in_use_are_not_evicted(self):
+        registry = self.registry(budget_mb=150)
+
+        async def scenario():
+            tiny = await registry.acquire("tiny")
+            small = await registry.acquire("small")
+            return tiny, small
+
+        tiny, small = asyncio.run(scenario())
+
+        self.assertFalse(tiny.closed)
+        self.assertFalse(small.closed)
+
+        registry.release("tiny")
+        registry.load("medium")
+
+        self.assertTrue(tiny.closed)
+        self.assertFalse(small.closed)
+
+    def test_evicted_model_is_reloaded_on_next_use(self):
+        registry = self.registry(budget_mb=100)
+        registry.load("tiny")
+        registry.load("small")
+
+        async def scenario():
+            async with registry.use("tiny") as model:
+                return model
+
+        model = asyncio.run(scenario())
+
+        self.assertEqual(model.name, "tiny")
+        self.assertEqual(self.loaded, ["tiny", "small", "tiny"])
+        self.assertEqual(registry.stats()["models"]["tiny"]["loads"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
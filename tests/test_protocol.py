@@ -0,0 +1,119 @@
+import asyncio
+import unittest
+
+import numpy as np
+
+from src.protocol import (
+    END_OF_STREAM,
+    FLAG_END_OF_STREAM,
+    FORMAT_PCM_F32LE,
+    FlowController,
+    Frame,
+    ProtocolError,
+    decode_frame,
+    encode_frame,
+)
+
+
+class TestFrames(unittest.TestCase):
+    def test_roundtrip(self):
+        payload = np.arange(4, dtype=np.int16).tobytes()
+        frame = decode_frame(encode_frame(Frame(7, payload, flags=FLAG_END_OF_STREAM)))
+
+        self.assertEqual(frame.sequence, 7)
+        self.assertEqual(frame.sample_rate, 16000)
+        self.assertTrue(frame.end_of_stream)
+        self.assertEqual(frame.payload, payload)
+
+    def test_format_fields_roundtrip(self):
+        payload = np.zeros(8, dtype=np.float32).tobytes()
+        message = encode_frame(
+            Frame(1, payload, format=FORMAT_PCM_F32LE, sample_rate=48000, channels=2)
+        )
+        frame = decode_frame(message)
+
+        self.assertEqual(
+            (frame.format, frame.sample_rate, frame.channels), (FORMAT_PCM_F32LE, 48000, 2)
+        )
+        with self.assertRaises(ProtocolError):
+            decode_frame(message[:-2])
+
+    def test_malformed_frames_are_rejected(self):
+        valid = encode_frame(Frame(0, b"\x00\x00"))
+        for message in (b"AF", b"XX" + valid[2:], valid[:2] + b"\x09" + valid[3:], valid + b"\x00"):
+            with self.assertRaises(ProtocolError):
+                decode_frame(message)
+
+
+class TestFlowController(unittest.TestCase):
+    def test_credits_are_granted_as_frames_are_processed(self):
+        async def run():
+            flow = FlowController(max_pending=8)
+            for sequence in range(2):
+                flow.offer(b"", sequence)
+            grants = []
+            for _ in range(2):
+                _, messages = await flow.take()
+                grants += messages
+            return flow, grants
+
+        flow, grants = asyncio.run(run())
+        self.assertEqual(flow.initial_messages(), [{"type": "credit", "credits": 8}])
+        self.assertEqual(grants, [{"type": "credit", "credits": 2}])
+
+    def test_pause_drop_and_resume(self):
+        async def run():
+            flow = FlowController(max_pending=4, pause_ratio=0.5, resume_ratio=0.25)
+            messages = [flow.offer(b"", sequence) for sequence in range(5)]
+            taken = []
+            for _ in range(3):
+                taken += (await flow.take())[1]
+            return flow, messages, taken
+
+        flow, messages, taken = asyncio.run(run())
+        self.assertEqual(messages[1], [{"type": "pause", "pending": 2}])
+        self.assertEqual(messages[4], [{"type": "drop", "sequence": 4}])
+        self.assertIn({"type": "resume", "pending": 1}, taken)
+        self.assertEqual(flow.stats()["frames_dropped"], 1)
+        self.assertFalse(flow.paused)
+
+    def test_put_waits_for_room_instead_of_dropping(self):
+        async def run():
+            flow = FlowController(max_pending=2)
+            await flow.put(b"1")
+            await flow.put(b"2")
+            blocked = asyncio.ensure_future(flow.put(b"3"))
+            await asyncio.sleep(0.01)
+            waiting = not blocked.done()
+            taken = [(await flow.take())[0]]
+            await blocked
+            taken += [(await flow.take())[0] for _ in range(2)]
+            return flow, waiting, taken
+
+        flow, waiting, taken = asyncio.run(run())
+
+        self.assertTrue(waiting)
+        self.assertEqual(taken, [b"1", b"2", b"3"])
+        self.assertEqual(flow.frames_dropped, 0)
+        self.assertEqual(flow.backpressure_waits, 1)
+
+    def test_end_of_stream_is_never_dropped(self):
+        async def run():
+            flow = FlowController(max_pending=2)
+            flow.offer(b"a", 0)
+            flow.offer(b"b", 1)
+            flow.offer(END_OF_STREAM)
+            flow.close()
+            return [(await flow.take())[0] for _ in range(2)]
+
+        self.assertEqual(asyncio.run(run()), [END_OF_STREAM, FlowController.CLOSED])
+
+    def test_sequence_gaps_count_lost_frames(self):
+        flow = FlowController()
+        for sequence in (0, 1, 4):
+            flow.offer(b"", sequence)
+        self.assertEqual(flow.frames_lost, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+
+from src.resampler import PcmConverter, StreamingResampler
+
+
+def sine(frequency, sample_rate, seconds=1.0, amplitude=0.5):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+def resample_in_chunks(resampler, samples, chunk_size):
+    chunks = [
+        resampler.process(samples[i : i + chunk_size])
+        for i in range(0, len(samples), chunk_size)
+    ]
+    return np.concatenate(chunks + [resampler.flush()])
+
+
+class TestStreamingResampler(unittest.TestCase):
+    def test_common_rates_keep_duration_and_signal(self):
+        for rate in (8000, 22050, 44100, 48000):
+            with self.subTest(rate=rate):
+                output = resample_in_chunks(StreamingResampler(rate), sine(440, rate), 4096)
+
+                self.assertEqual(len(output), 16000)
+                expected = sine(440, 16000)
+                np.testing.assert_allclose(output[100:-100], expected[100:-100], atol=2e-3)
+
+    def test_output_does_not_depend_on_chunking(self):
+        samples = sine(1000, 44100)
+        whole = resample_in_chunks(StreamingResampler(44100), samples, len(samples))
+        split = resample_in_chunks(StreamingResampler(44100), samples, 333)
+
+        np.testing.assert_allclose(whole, split, atol=1e-6)
+
+    def test_frequencies_above_target_nyquist_are_removed(self):
+        output = StreamingResampler(48000).process(sine(10000, 48000))
+
+        self.assertLess(np.sqrt(np.mean(output[100:] ** 2)), 5e-3)
+
+
+class TestPcmConverter(unittest.TestCase):
+    def test_16k_mono_int16_is_passed_through(self):
+        converter = PcmConverter()
+        data = np.arange(100, dtype=np.int16).tobytes()
+
+        self.assertTrue(converter.passthrough)
+        self.assertIs(converter.convert(data), data)
+
+    def test_float_stereo_is_downmixed_to_int16(self):
+        samples = np.array([[0.5, 0.25], [-1.0, -1.0]], dtype=np.float32)
+        pcm = PcmConverter(channels=2, dtype="float32").convert(samples.tobytes())
+
+        np.testing.assert_array_equal(np.frombuffer(pcm, dtype=np.int16), [12288, -32768])
+
+    def test_partial_samples_are_kept_for_the_next_chunk(self):
+        converter = PcmConverter(sample_rate=48000, channels=2)
+        data = np.zeros(4800 * 2, dtype=np.int16).tobytes()
+
+        first = converter.convert(data[:1001])
+        second = converter.convert(data[1001:])
+
+        self.assertEqual(len(first + second + converter.flush()), 1600 * 2)
+
+    def test_invalid_formats_are_rejected(self):
+        for options in ({"dtype": "int8"}, {"channels": 0}, {"sample_rate": 1000}):
+            with self.subTest(**options), self.assertRaises(ValueError):
+                PcmConverter(**options)
+
+
+if __name__ == "__main__":
+    unittest.main()
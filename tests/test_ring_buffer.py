@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+
+from src.ring_buffer import RingBuffer
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_write_and_view(self):
+        ring = RingBuffer(8)
+        ring.write(np.arange(5, dtype=np.float32))
+
+        self.assertEqual(len(ring), 5)
+        np.testing.assert_array_equal(ring.view(0), np.arange(5))
+        np.testing.assert_array_equal(ring.view(1, 3), [1, 2])
+
+    def test_wrapped_window_is_contiguous_view(self):
+        ring = RingBuffer(8)
+        ring.write(np.arange(6, dtype=np.float32))
+        ring.write(np.arange(6, 12, dtype=np.float32))
+
+        self.assertEqual(ring.start, 4)
+        window = ring.view(4)
+        np.testing.assert_array_equal(window, np.arange(4, 12))
+        # A view, not a copy
+        self.assertFalse(window.flags["OWNDATA"])
+
+    def test_overwritten_window_is_rejected(self):
+        ring = RingBuffer(4)
+        ring.write(np.arange(10, dtype=np.float32))
+
+        np.testing.assert_array_equal(ring.view(6), [6, 7, 8, 9])
+        with self.assertRaises(ValueError):
+            ring.view(5)
+
+    def test_resize_keeps_recent_samples(self):
+        ring = RingBuffer(4)
+        ring.write(np.arange(6, dtype=np.float32))
+        ring.resize(8)
+        ring.write(np.arange(6, 10, dtype=np.float32))
+
+        self.assertEqual(ring.capacity, 8)
+        np.testing.assert_array_equal(ring.view(2), np.arange(2, 10))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import asyncio
+import unittest
+
+import numpy as np
+
+from src.segmenter import (
+    find_cut_point,
+    remove_overlap,
+    split_long_audio,
+    stitch_transcripts,
+    transcribe_chunked,
+)
+from src.transcription import SegmentResult, TranscriptionResult
+
+
+class FakeTranscriber:
+    def __init__(self):
+        self.lengths = []
+
+    async def transcribe(self, audio, **options):
+        self.lengths.append(len(audio))
+        return f"chunk{len(self.lengths)}"
+
+    async def transcribe_detailed(self, audio, **options):
+        text = await self.transcribe(audio, **options)
+        duration = len(audio) / 16000
+        return TranscriptionResult(
+            text, [SegmentResult(0.0, duration, text, avg_logprob=-0.1, no_speech_prob=0.0)]
+        )
+
+
+class TestSegmenter(unittest.TestCase):
+    def loud(self, samples):
+        return np.full(samples, 0.5, dtype=np.float32)
+
+    def test_find_cut_point_picks_quietest_frame(self):
+        audio = self.loud(16000)
+        audio[8960:9120] = 0.0
+
+        cut = find_cut_point(audio, 8000, 12000)
+
+        self.assertEqual(cut, 9040)
+
+    def test_split_long_audio_cuts_at_pauses_with_overlap(self):
+        audio = self.loud(40000)
+        audio[14400:14560] = 0.0  # pause shortly before the 16000 limit
+        audio[26960:27120] = 0.0
+
+        bounds = split_long_audio(
+            audio, max_samples=16000, search_samples=3200, overlap_samples=800
+        )
+
+        self.assertEqual(bounds, [(0, 14480), (13680, 27040), (26240, 40000)])
+        self.assertTrue(all(end - start <= 16000 for start, end in bounds))
+
+    def test_remove_overlap(self):
+        self.assertEqual(remove_overlap("we will meet on Monday", "monday, at noon"), "at noon")
+        self.assertEqual(remove_overlap("hello there", "general Kenobi"), "general Kenobi")
+        self.assertEqual(
+            stitch_transcripts(["the quick brown", "Brown fox jumps", "jumps over"]),
+            "the quick brown fox jumps over",
+        )
+
+    def test_transcribe_chunked_decodes_chunks_concurrently(self):
+        transcriber = FakeTranscriber()
+        audio = self.loud(16000 * 25)
+
+        short = asyncio.run(
+            transcribe_chunked(transcriber, audio[:16000], max_duration=10)
+        )
+        self.assertEqual(short, "chunk1")
+
+        text = asyncio.run(
+            transcribe_chunked(transcriber, audio, max_duration=10, overlap_duration=0.2)
+        )
+        self.assertEqual(text, "chunk2 chunk3 chunk4")
+        self.assertTrue(all(length <= 160000 for length in transcriber.lengths))
+
+    def test_transcribe_chunked_detailed_uses_buffer_timeline(self):
+        transcriber = FakeTranscriber()
+        audio = self.loud(16000 * 25)
+
+        result = asyncio.run(
+            transcribe_chunked(
+                transcriber, audio, max_duration=10, overlap_duration=0.2, detailed=True
+            )
+        )
+
+        self.assertEqual(result.text, "chunk1 chunk2 chunk3")
+        starts = [segment.start for segment in result.segments]
+        self.assertEqual(starts[0], 0.0)
+        self.assertTrue(all(a < b for a, b in zip(starts, starts[1:])))
+        self.assertAlmostEqual(result.segments[-1].end, 25.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
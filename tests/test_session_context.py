@@ -0,0 +1,54 @@
+import unittest
+
+from src.session_context import SessionContext
+
+
+class TestSessionContext(unittest.TestCase):
+    def test_no_prompt_before_first_segment(self):
+        context = SessionContext(language="en")
+
+        self.assertEqual(context.decode_options(), {"language": "en", "initial_prompt": None})
+
+    def test_prompt_keeps_last_words(self):
+        context = SessionContext(language="en", max_prompt_words=4)
+
+        context.commit("one two three")
+        context.commit("four five six")
+
+        self.assertEqual(context.prompt, "three four five six")
+
+    def test_vocabulary_starts_the_prompt(self):
+        context = SessionContext(max_prompt_words=2, vocabulary=["Kubernetes", " FastAPI ", ""])
+
+        self.assertEqual(context.prompt, "Kubernetes, FastAPI.")
+        context.commit("deploy it now")
+        self.assertEqual(context.prompt, "Kubernetes, FastAPI. it now")
+
+    def test_context_words_can_be_disabled(self):
+        context = SessionContext(max_prompt_words=0)
+
+        context.commit("hello there")
+
+        self.assertIsNone(context.prompt)
+
+    def test_language_is_cached_after_confident_detection(self):
+        context = SessionContext(language_threshold=0.8)
+
+        self.assertEqual(context.observe_language("fr", 0.5), "fr")
+        self.assertIsNone(context.language)
+        self.assertEqual(context.decode_options("fr")["language"], "fr")
+
+        context.observe_language("fr", 0.95)
+
+        self.assertEqual(context.language, "fr")
+        self.assertEqual(context.decode_options()["language"], "fr")
+        self.assertEqual(context.stats()["language_detections"], 2)
+
+    def test_configured_language_wins(self):
+        context = SessionContext(language="en")
+
+        self.assertEqual(context.decode_options("de")["language"], "en")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import asyncio
+import unittest
+
+import numpy as np
+
+from src.streaming import LocalAgreement, StreamingDecoder
+from src.transcription import TranscriptionResult
+
+
+class FakeTranscriber:
+    """Returns scripted hypotheses and records the options of every call."""
+
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+        self.calls = []
+
+    async def transcribe(self, audio, **options):
+        self.calls.append(options)
+        return self.outputs.pop(0)
+
+    async def transcribe_detailed(self, audio, **options):
+        return TranscriptionResult(await self.transcribe(audio, **options), language="en")
+
+
+class TestLocalAgreement(unittest.TestCase):
+    def test_commits_common_prefix_of_two_hypotheses(self):
+        agreement = LocalAgreement()
+
+        self.assertEqual(agreement.update(["hello", "word"]), [])
+        self.assertEqual(agreement.committed_text, "")
+        self.assertEqual(agreement.unstable_text, "hello word")
+
+        self.assertEqual(agreement.update(["Hello,", "world", "how"]), ["Hello,"])
+        self.assertEqual(agreement.committed_text, "Hello,")
+        self.assertEqual(agreement.unstable_text, "world how")
+
+    def test_committed_words_never_change(self):
+        agreement = LocalAgreement()
+        agreement.update(["one", "two"])
+        agreement.update(["one", "two", "three"])
+
+        # Later hypotheses only continue the committed prefix
+        agreement.update(["free"])
+        self.assertEqual(agreement.committed_text, "one two")
+
+        agreement.reset()
+        self.assertEqual(agreement.committed_text, "")
+
+
+class TestStreamingDecoder(unittest.TestCase):
+    def test_partials_reuse_committed_prefix(self):
+        transcriber = FakeTranscriber(["hello there", "hello there my", "my friend", "friend"])
+        decoder = StreamingDecoder(transcriber, partial_interval=0.5, language="en")
+
+        async def scenario():
+            messages = []
+            for seconds in (0.25, 0.5, 1.0, 1.5):
+                messages.append(await decoder.partial(np.zeros(int(seconds * 16000), np.float32)))
+            final = await decoder.final(np.zeros(24000, np.float32), vad_filter=True)
+            return messages, final
+
+        messages, final = asyncio.run(scenario())
+
+        # Not enough audio yet for the first call
+        self.assertIsNone(messages[0])
+        self.assertEqual(messages[1]["committed"], "")
+        self.assertEqual(messages[2]["committed"], "hello there")
+        self.assertEqual(messages[3]["committed"], "hello there my")
+        self.assertEqual(messages[3]["text"], "hello there my friend")
+
+        # The committed text is sent as the decoder prefix
+        self.assertIsNone(transcriber.calls[0]["prefix"])
+        self.assertEqual(transcriber.calls[2]["prefix"], "hello there")
+        self.assertEqual(transcriber.calls[3]["prefix"], "hello there my")
+        self.assertTrue(transcriber.calls[3]["vad_filter"])
+        self.assertEqual(transcriber.calls[3]["language"], "en")
+
+        self.assertEqual(final, "hello there my friend")
+        self.assertEqual(decoder.agreement.committed_text, "")
+
+    def test_detailed_final_keeps_committed_prefix(self):
+        transcriber = FakeTranscriber(["hello there", "hello there", " friend "])
+        decoder = StreamingDecoder(transcriber, partial_interval=0.5)
+
+        async def scenario():
+            for seconds in (0.5, 1.0):
+                await decoder.partial(np.zeros(int(seconds * 16000), np.float32))
+            return await decoder.final(np.zeros(24000, np.float32), detailed=True)
+
+        result = asyncio.run(scenario())
+
+        self.assertEqual(result.text, "hello there friend")
+        self.assertEqual(result.language, "en")
+        self.assertEqual(transcriber.calls[2]["prefix"], "hello there")
+
+    def test_closed_segment_decodes_while_next_one_starts(self):
+        transcriber = FakeTranscriber(["hello there", "hello there", "next", "friend"])
+        decoder = StreamingDecoder(transcriber, partial_interval=0.5)
+
+        async def scenario():
+            for seconds in (0.5, 1.0):
+                await decoder.partial(np.zeros(int(seconds * 16000), np.float32))
+            committed = decoder.close_segment()
+            # The next segment starts from scratch before the final decode of the first one
+            partial = await decoder.partial(np.zeros(8000, np.float32))
+            final = await decoder.final(np.zeros(24000, np.float32), committed=committed)
+            return partial, final
+
+        partial, final = asyncio.run(scenario())
+
+        self.assertEqual(partial["text"], "next")
+        self.assertIsNone(transcriber.calls[2]["prefix"])
+        self.assertEqual(final, "hello there friend")
+        self.assertEqual(transcriber.calls[3]["prefix"], "hello there")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from src.transcription import (
+    SegmentResult,
+    TranscriptionResult,
+    WordResult,
+    merge_chunk_results,
+)
+
+
+def segment(start, end, text):
+    return SegmentResult(
+        start=start,
+        end=end,
+        text=text,
+        avg_logprob=-0.2,
+        no_speech_prob=0.01,
+        words=[WordResult(start, end, text, 0.9)],
+    )
+
+
+class TestTranscriptionResult(unittest.TestCase):
+    def test_shifted_moves_segments_and_words(self):
+        result = TranscriptionResult("hi", [segment(0.5, 1.0, "hi")], language="en")
+
+        shifted = result.shifted(10.0)
+
+        self.assertEqual((shifted.segments[0].start, shifted.segments[0].end), (10.5, 11.0))
+        self.assertEqual(shifted.segments[0].words[0].start, 10.5)
+        self.assertEqual(result.segments[0].start, 0.5)
+
+    def test_to_dict(self):
+        result = TranscriptionResult(
+            "hi", [segment(0.12345, 1.0, "hi")], language="en", language_probability=0.98765
+        )
+
+        data = result.to_dict()
+
+        self.assertEqual(data["language_probability"], 0.988)
+        self.assertEqual(data["segments"][0]["start"], 0.123)
+        self.assertEqual(data["segments"][0]["no_speech_prob"], 0.01)
+        self.assertEqual(
+            data["segments"][0]["words"],
+            [{"start": 0.123, "end": 1.0, "word": "hi", "probability": 0.9}],
+        )
+
+    def test_merge_chunk_results_drops_segments_inside_overlap(self):
+        first = TranscriptionResult("a b", [segment(0.0, 1.0, "a"), segment(1.0, 2.0, "b")])
+        # The second chunk starts at 1.8 s and shares 0.2 s with the first one
+        second = TranscriptionResult("b c", [segment(0.0, 0.2, "b"), segment(0.2, 1.0, "c")])
+
+        merged = merge_chunk_results([first, second], [0.0, 1.8], 0.2, "a b c")
+
+        self.assertEqual(merged.text, "a b c")
+        self.assertEqual([s.text for s in merged.segments], ["a", "b", "c"])
+        self.assertEqual((merged.segments[2].start, merged.segments[2].end), (2.0, 2.8))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from src.audio_processor import RmsVad
+from src.vad_scheduler import VadScheduler
+
+
+class TestVadScheduler(unittest.TestCase):
+    def chunk(self, amplitude, size=1024):
+        return np.full(size, amplitude, dtype=np.int16)
+
+    def test_sessions_are_scored_in_one_batch(self):
+        scheduler = VadScheduler()
+        backends = [RmsVad(threshold=100) for _ in range(4)]
+        chunks = [self.chunk(0), self.chunk(5000), self.chunk(50, 512), self.chunk(500, 2048)]
+
+        async def scenario():
+            return await asyncio.gather(
+                *(scheduler.is_silent(b, c) for b, c in zip(backends, chunks))
+            )
+
+        with patch.object(RmsVad, "is_speech_batch", wraps=RmsVad.is_speech_batch) as batch:
+            results = asyncio.run(scenario())
+
+        self.assertEqual(results, [True, False, True, False])
+        batch.assert_called_once()
+        self.assertEqual(scheduler.stats()["ticks"], 1)
+        self.assertEqual(scheduler.stats()["mean_chunks_per_tick"], 4)
+
+    def test_batch_matches_single_evaluation(self):
+        rng = np.random.default_rng(0)
+        backends = [RmsVad(threshold=t) for t in (50, 200, 800)]
+        chunks = [(rng.standard_normal(n) * 300).astype(np.int16) for n in (1024, 700, 1600)]
+
+        batched = RmsVad.is_speech_batch(backends, chunks)
+        single = [b.is_speech(c) for b, c in zip(backends, chunks)]
+
+        self.assertEqual(batched, single)
+
+
+if __name__ == "__main__":
+    unittest.main()